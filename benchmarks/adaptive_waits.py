@@ -0,0 +1,72 @@
+"""
+条件等待与固定等待的耗时对比（基于真实上传的追踪记录）
+
+快手、视频号、小红书、百家号的上传器在上传结束时调用 log_wait_stats(logger, self.tracer)，把本次上传中
+条件等待的次数、超时次数、实际用时和被替换掉的固定等待时长写进上传追踪文件（kind 为 upload 的记录的
+meta.waits）。本脚本从追踪文件汇总每个平台每次上传的条件等待用时 p50 / p95、原固定等待和平均节省。
+
+数据来源可以是真实上传产生的 logs/upload_trace.jsonl，也可以是离线回放基准（benchmarks/replay_uploaders.py，
+驱动真实上传器访问本地模拟的创作者中心）输出的追踪文件。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.adaptive_waits                      # 统计 logs/ 下真实上传的追踪记录
+    python -m benchmarks.replay_uploaders --platforms kuaishou tencent xiaohongshu --uploads 5
+    python -m benchmarks.adaptive_waits /tmp/sau-replay-xxxx/upload_trace.jsonl
+"""
+import argparse
+from pathlib import Path
+from typing import Optional
+
+from utils.tracing import TRACE_FILE, load_spans, percentile
+
+
+def wait_report(spans: list, platform: Optional[str] = None, include_failed: bool = False) -> list:
+    """按平台汇总每次上传的条件等待统计；默认只统计成功的上传"""
+    per_platform = {}
+    for span in spans:
+        waits = (span.get("meta") or {}).get("waits")
+        if span.get("kind") != "upload" or not waits or (platform and span.get("platform") != platform):
+            continue
+        if not include_failed and span.get("status") != "ok":
+            continue
+        per_platform.setdefault(span["platform"], []).append(waits)
+    rows = []
+    for name, uploads in sorted(per_platform.items()):
+        waited = sorted(item["waited_ms"] / 1000 for item in uploads)
+        replaced = sum(item["replaced_ms"] for item in uploads) / 1000
+        rows.append({
+            "platform": name,
+            "uploads": len(uploads),
+            "waits": sum(item["count"] for item in uploads),
+            "timeouts": sum(item.get("timeouts", 0) for item in uploads),
+            "fixed_seconds": round(replaced / len(uploads), 2),
+            "p50_seconds": round(percentile(waited, 0.5), 2),
+            "p95_seconds": round(percentile(waited, 0.95), 2),
+            "saved_seconds": round((replaced - sum(waited)) / len(uploads), 2),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare condition-based waits with the fixed sleeps they replaced, "
+                                                 "using the wait stats recorded in upload trace files.")
+    parser.add_argument('files', nargs='*', type=Path,
+                        help=f'Trace files, defaults to {TRACE_FILE.name} and its rotated file under logs/')
+    parser.add_argument('--platform', help='Only report this platform')
+    parser.add_argument('--include-failed', action='store_true', help='Also count uploads that raised an error')
+    args = parser.parse_args()
+    files = args.files or sorted(TRACE_FILE.parent.glob(f"{TRACE_FILE.name}*"))
+    rows = wait_report(load_spans(files), platform=args.platform, include_failed=args.include_failed)
+    if not rows:
+        print("No uploads with wait stats found.")
+        return
+    print(f"{'platform':<12} {'uploads':>7} {'waits':>6} {'timeouts':>8} {'fixed(s)':>9} "
+          f"{'p50(s)':>8} {'p95(s)':>8} {'saved(s)':>9}")
+    for row in rows:
+        print(f"{row['platform']:<12} {row['uploads']:>7} {row['waits']:>6} {row['timeouts']:>8} "
+              f"{row['fixed_seconds']:>9.2f} {row['p50_seconds']:>8.2f} {row['p95_seconds']:>8.2f} "
+              f"{row['saved_seconds']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
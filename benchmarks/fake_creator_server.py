@@ -0,0 +1,182 @@
+"""
+本地模拟的创作者中心
+
+用 aiohttp 提供抖音、快手、视频号、小红书上传页面的最小化版本（benchmarks/fake_sites/），页面结构和上传器用到的
+选择器、跳转地址、分片上传 / 发布接口的 URL 特征与线上一致，上传器代码不需要做任何修改：
+浏览器上下文通过 route_to_fake_server() 把这些平台域名的请求转发到本地服务，页面地址栏里仍然是线上地址。
+
+服务端模拟的行为：
+- 分片上传：每片延迟 chunk_latency 秒，按 chunk_failure_rate 的概率返回 500
+- 上传提交：延迟 transcode_delay 秒（模拟转码）
+- 发布：延迟 publish_latency 秒，按 publish_failure_rate 的概率返回失败
+
+请求路径为 /<线上域名><线上路径>，页面发出的接口请求都带 fake=chunk / commit / publish 参数用于区分。
+"""
+import argparse
+import asyncio
+import json
+import random
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from aiohttp import web
+from playwright.async_api import BrowserContext, Route
+
+SITES_DIR = Path(__file__).parent / "fake_sites"
+
+# 线上域名 -> {路径: 页面文件}
+PAGES = {
+    "creator.douyin.com": {
+        "/creator-micro/content/upload": "douyin.html",
+        "/creator-micro/content/manage": "done.html",
+    },
+    "cp.kuaishou.com": {
+        "/article/publish/video": "kuaishou.html",
+        "/article/manage/video": "done.html",
+    },
+    "channels.weixin.qq.com": {
+        "/platform/post/create": "tencent.html",
+        "/platform/post/list": "done.html",
+    },
+    "creator.xiaohongshu.com": {
+        "/publish/publish": "xiaohongshu.html",
+        "/publish/success": "done.html",
+    },
+}
+
+# 只有接口请求、没有页面的域名
+API_HOSTS = ("vod.bytedanceapi.com", "upload.kuaishouzt.com", "ros-upload.xiaohongshu.com")
+
+FAKE_HOSTS = set(PAGES) | set(API_HOSTS)
+
+
+class FakeCreatorServer(object):
+    def __init__(self, chunk_size=1024 * 1024, chunk_latency=0.2, chunk_failure_rate=0.0, transcode_delay=0.5,
+                 publish_latency=0.3, publish_failure_rate=0.0, seed: Optional[int] = None):
+        self.chunk_size = chunk_size
+        self.chunk_latency = chunk_latency
+        self.chunk_failure_rate = chunk_failure_rate
+        self.transcode_delay = transcode_delay
+        self.publish_latency = publish_latency
+        self.publish_failure_rate = publish_failure_rate
+        self.random = random.Random(seed)
+        self.stats = {"pages": 0, "chunks": 0, "failed_chunks": 0, "bytes": 0, "commits": 0, "publishes": 0,
+                      "failed_publishes": 0}
+        self.base_url = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=self.chunk_size * 2)
+        app.router.add_route("*", "/{host}/{path:.*}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        host = request.match_info["host"]
+        path = "/" + request.match_info["path"]
+        if request.method == "OPTIONS":
+            response = web.Response()
+        elif path == "/__fake__/common.js":
+            response = web.FileResponse(SITES_DIR / "common.js")
+        elif request.method == "GET":
+            response = self.page(host, path)
+        else:
+            action = request.query.get("fake")
+            if action == "chunk":
+                response = await self.chunk(request)
+            elif action == "commit":
+                response = await self.commit(request)
+            elif action == "publish":
+                response = await self.publish(request)
+            else:
+                response = web.json_response({"status_code": 0})
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Headers"] = "*"
+        return response
+
+    def page(self, host: str, path: str) -> web.Response:
+        name = PAGES.get(host, {}).get(path)
+        if name is None:
+            raise web.HTTPNotFound()
+        self.stats["pages"] += 1
+        html = (SITES_DIR / name).read_text(encoding="utf-8")
+        html = html.replace("/*FAKE_CONFIG*/", json.dumps({"chunk_size": self.chunk_size}))
+        return web.Response(text=html, content_type="text/html")
+
+    async def chunk(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        await asyncio.sleep(self.chunk_latency)
+        if self.random.random() < self.chunk_failure_rate:
+            self.stats["failed_chunks"] += 1
+            return web.json_response({"status_code": 500, "status_msg": "模拟分片上传失败"}, status=500)
+        self.stats["chunks"] += 1
+        self.stats["bytes"] += len(body)
+        return web.json_response({"status_code": 0})
+
+    async def commit(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.transcode_delay)
+        self.stats["commits"] += 1
+        # 抖音的 CommitUploadInner 返回 VOD 格式，其它平台只看 status_code
+        return web.json_response({"status_code": 0, "ResponseMetadata": {"Action": "CommitUploadInner"}, "Result": {}})
+
+    async def publish(self, request: web.Request) -> web.Response:
+        await request.read()
+        await asyncio.sleep(self.publish_latency)
+        if self.random.random() < self.publish_failure_rate:
+            self.stats["failed_publishes"] += 1
+            return web.json_response({"status_code": 8, "status_msg": "模拟发布失败，请稍后重试"})
+        self.stats["publishes"] += 1
+        return web.json_response({"status_code": 0})
+
+
+async def route_to_fake_server(context: BrowserContext, base_url: str):
+    """把上下文中对各平台域名的请求转发到本地模拟服务，其它外部请求一律拦截"""
+    async def handle(route: Route):
+        url = urlsplit(route.request.url)
+        if url.hostname not in FAKE_HOSTS:
+            await route.abort()
+            return
+        target = f"{base_url}/{url.hostname}{url.path or '/'}" + (f"?{url.query}" if url.query else "")
+        try:
+            response = await route.fetch(url=target)
+        except Exception:
+            await route.abort()
+            return
+        await route.fulfill(response=response)
+
+    await context.route("**/*", handle)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Serve offline copies of the creator upload pages.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunk-latency", type=float, default=0.2)
+    parser.add_argument("--chunk-failure-rate", type=float, default=0.0)
+    parser.add_argument("--publish-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeCreatorServer(chunk_latency=args.chunk_latency, chunk_failure_rate=args.chunk_failure_rate,
+                               publish_failure_rate=args.publish_failure_rate)
+    base_url = await server.start(port=args.port)
+    print(f"fake creator sites on {base_url}, e.g. {base_url}/creator.douyin.com/creator-micro/content/upload")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
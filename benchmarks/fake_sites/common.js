@@ -0,0 +1,45 @@
+// 各模拟页面共用的上传逻辑，window.FAKE_CONFIG 由 fake_creator_server 注入
+const FAKE = window.FAKE_CONFIG;
+
+function $(selector) {
+  return document.querySelector(selector);
+}
+
+function show(selector, visible = true) {
+  $(selector).hidden = !visible;
+}
+
+// 按 chunk_size 把文件切片后逐片 POST 到 urlFor(序号, 总片数) 返回的地址。
+// retries 为单片失败后的重试次数（模拟上传组件自带的重试），全部失败时返回 false。
+// 切片不带 Content-Type，跨域请求也不会触发 CORS 预检。
+async function uploadChunks(file, urlFor, onProgress, retries = 0) {
+  const total = Math.max(1, Math.ceil(file.size / FAKE.chunk_size));
+  for (let index = 0; index < total; index++) {
+    const chunk = file.slice(index * FAKE.chunk_size, (index + 1) * FAKE.chunk_size);
+    let attempt = 0;
+    while (true) {
+      const ok = await fetch(urlFor(index + 1, total), {method: "POST", body: chunk}).then(r => r.ok, () => false);
+      if (ok) break;
+      if (attempt++ >= retries) return false;
+    }
+    onProgress(index + 1, total);
+  }
+  return true;
+}
+
+async function postJson(url, data = {}) {
+  try {
+    const response = await fetch(url, {method: "POST", body: JSON.stringify(data)});
+    return await response.json();
+  } catch (e) {
+    return {status_code: -1, status_msg: String(e)};
+  }
+}
+
+function percent(done, total) {
+  return Math.floor(done / total * 100) + "%";
+}
+
+function uploadId() {
+  return Math.random().toString(16).slice(2);
+}
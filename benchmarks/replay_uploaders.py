@@ -0,0 +1,190 @@
+"""
+离线回放基准：用本地模拟的创作者中心（benchmarks/fake_creator_server.py）驱动真实的上传器类
+
+DouYinVideo、KSVideo、TencentVideo、XiaoHongShuVideo 原样运行，只是浏览器池借出的上下文会把平台域名的
+请求转发到本地服务，全程不访问外网。每个平台依次跑 --uploads 次上传（--concurrency 个并发），输出成功率、
+吞吐量、单次上传耗时 p50 / p95，以及 utils/tracing.py 统计的各阶段耗时。
+
+结果可以用 --output 保存为 JSON，下次用 --baseline 对比，检查上传流程的性能回退。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.replay_uploaders --uploads 4 --concurrency 2
+    python -m benchmarks.replay_uploaders --platforms douyin kuaishou --chunk-failure-rate 0.1 --schedule
+    python -m benchmarks.replay_uploaders --output new.json --baseline old.json
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import utils.diagnostics as diagnostics
+import utils.tracing as tracing
+from benchmarks.fake_creator_server import FakeCreatorServer, route_to_fake_server
+from uploader.douyin_uploader.main import DouYinVideo
+from uploader.ks_uploader.main import KSVideo
+from uploader.tencent_uploader.main import TencentVideo
+from uploader.xiaohongshu_uploader.main import XiaoHongShuVideo
+from utils.base_social_media import SOCIAL_MEDIA_DOUYIN, SOCIAL_MEDIA_KUAISHOU, SOCIAL_MEDIA_TENCENT, \
+    SOCIAL_MEDIA_XIAOHONGSHU
+from utils.browser_pool import BrowserPool
+from utils.launch_profiles import profile_names
+from utils.publish_log import publish_log
+from utils.rate_limit import upload_rate_limiter
+from utils.tracing import percentile, phase_stats
+from utils.upload_progress import upload_metrics
+
+UPLOADERS = {
+    SOCIAL_MEDIA_DOUYIN: DouYinVideo,
+    SOCIAL_MEDIA_KUAISHOU: KSVideo,
+    SOCIAL_MEDIA_TENCENT: TencentVideo,
+    SOCIAL_MEDIA_XIAOHONGSHU: XiaoHongShuVideo,
+}
+
+
+class ReplayBrowserPool(BrowserPool):
+    """借出的每个上下文都把平台请求转发到本地模拟服务"""
+
+    def __init__(self, base_url: str, max_size: int):
+        super().__init__(max_size=max_size, persistent_profiles=False)
+        self.base_url = base_url
+
+    async def new_context(self, launch_options: dict = None, browser_type: str = "chromium", **context_options):
+        context = await super().new_context(launch_options, browser_type=browser_type, **context_options)
+        await route_to_fake_server(context, self.base_url)
+        return context
+
+
+def prepare_files(workdir: Path, video_mb: float) -> Path:
+    video = workdir / "replay.mp4"
+    with open(video, "wb") as f:
+        f.write(bytes(int(video_mb * 1024 * 1024)))
+    (workdir / "cookies").mkdir(exist_ok=True)
+    return video
+
+
+async def run_one(platform: str, index: int, video: Path, workdir: Path, pool: BrowserPool, args) -> dict:
+    account_file = workdir / "cookies" / f"{platform}_replay{index}.json"
+    account_file.write_text(json.dumps({"cookies": [], "origins": []}), encoding="utf-8")
+    publish_date = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1) \
+        if args.schedule else 0
+    app = UPLOADERS[platform](f"离线回放测试{index}", str(video), ["离线回放", "基准测试"], publish_date,
+                              str(account_file), browser_pool=pool, launch_profile=args.launch_profile,
+                              allow_duplicate=True)
+    app.headless = not args.headed
+    # 默认用 Playwright 自带的 Chromium，不受 conf.LOCAL_CHROME_PATH 影响，结果可以在不同机器间对比
+    app.local_executable_path = args.chrome_path or None
+    start = time.monotonic()
+    try:
+        await asyncio.wait_for(app.main(), timeout=args.timeout)
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, f"{type(e).__name__}: {e}"
+    return {"ok": ok, "seconds": time.monotonic() - start, "error": error}
+
+
+async def run_platform(platform: str, video: Path, workdir: Path, pool: BrowserPool, args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(index):
+        async with semaphore:
+            return await run_one(platform, index, video, workdir, pool, args)
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(limited(index) for index in range(args.uploads)))
+    wall = time.monotonic() - start
+    durations = sorted(result["seconds"] for result in results if result["ok"])
+    succeeded = len(durations)
+    sent = sum(item["bytes_sent"] for item in upload_metrics.snapshot() if item["platform"] == platform)
+    return {
+        "uploads": len(results),
+        "succeeded": succeeded,
+        "errors": [result["error"] for result in results if not result["ok"]],
+        "wall_seconds": round(wall, 2),
+        "uploads_per_minute": round(succeeded / wall * 60, 2) if wall else 0.0,
+        "upload_mb_per_second": round(sent / 1024 / 1024 / wall, 2) if wall else 0.0,
+        "p50_seconds": round(percentile(durations, 0.5), 2),
+        "p95_seconds": round(percentile(durations, 0.95), 2),
+        "phases": [row for row in phase_stats.snapshot() if row["platform"] == platform],
+    }
+
+
+def print_report(results: dict, baseline: dict = None):
+    for platform, result in results["platforms"].items():
+        line = (f"{platform:<12} ok={result['succeeded']}/{result['uploads']} "
+                f"{result['uploads_per_minute']:.2f} uploads/min {result['upload_mb_per_second']:.2f} MB/s "
+                f"p50={result['p50_seconds']:.2f}s p95={result['p95_seconds']:.2f}s")
+        before = (baseline or {}).get("platforms", {}).get(platform)
+        if before and before["p50_seconds"]:
+            change = (result["p50_seconds"] - before["p50_seconds"]) / before["p50_seconds"] * 100
+            line += f" (p50 {change:+.1f}% vs baseline)"
+        print(line)
+        for phase in result["phases"]:
+            print(f"    {phase['phase']:<12} p50={phase['p50_ms'] / 1000:.2f}s p95={phase['p95_ms'] / 1000:.2f}s")
+        for error in result["errors"]:
+            print(f"    failed: {error}")
+    print(f"server: {results['server']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the uploaders against local fake creator sites.")
+    parser.add_argument("--platforms", nargs="+", choices=list(UPLOADERS), default=list(UPLOADERS))
+    parser.add_argument("--uploads", type=int, default=3, help="uploads per platform")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent uploads per platform")
+    parser.add_argument("--video-mb", type=float, default=4, help="size of the generated video file")
+    parser.add_argument("--chunk-mb", type=float, default=1, help="chunk size used by the fake pages")
+    parser.add_argument("--chunk-latency", type=float, default=0.2, help="seconds per chunk request")
+    parser.add_argument("--chunk-failure-rate", type=float, default=0.0)
+    parser.add_argument("--transcode-delay", type=float, default=0.5, help="seconds before the upload commit returns")
+    parser.add_argument("--publish-latency", type=float, default=0.3)
+    parser.add_argument("--publish-failure-rate", type=float, default=0.0)
+    parser.add_argument("--schedule", action="store_true", help="exercise the scheduled publish path")
+    parser.add_argument("--headed", action="store_true", help="show the browser windows")
+    parser.add_argument("--launch-profile", choices=profile_names(), default=None,
+                        help="browser launch profile, see utils/launch_profiles.py")
+    parser.add_argument("--chrome-path", default="", help="browser executable, defaults to Playwright's chromium")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds before an upload counts as failed")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the simulated failures")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare p50 against a previous --output file")
+    args = parser.parse_args()
+    # 本地回放不需要限速，也不要把回放账号写进共用的令牌桶
+    upload_rate_limiter.platform_limits = {}
+    upload_rate_limiter.account_limits = {}
+
+    workdir = Path(tempfile.mkdtemp(prefix="sau-replay-"))
+    # 基准数据写到临时目录，不混进 logs/ 下真实上传的追踪记录，失败现场也不占用真实上传的 DIAGNOSTICS_MAX_DUMPS
+    tracing.TRACE_FILE = workdir / "upload_trace.jsonl"
+    diagnostics.DIAGNOSTICS_DIR = workdir / "diagnostics"
+    # 回放每次都上传同一个素材，发布记录写到临时库，既不被去重跳过，也不混进真实的 publish_log
+    publish_log.db_path = workdir / "database.db"
+    publish_log._ready = False
+    video = prepare_files(workdir, args.video_mb)
+    server = FakeCreatorServer(chunk_size=int(args.chunk_mb * 1024 * 1024), chunk_latency=args.chunk_latency,
+                               chunk_failure_rate=args.chunk_failure_rate, transcode_delay=args.transcode_delay,
+                               publish_latency=args.publish_latency,
+                               publish_failure_rate=args.publish_failure_rate, seed=args.seed)
+    base_url = await server.start()
+    pool = ReplayBrowserPool(base_url, max_size=max(args.concurrency, 1))
+    results = {"config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+               "platforms": {}}
+    try:
+        for platform in args.platforms:
+            results["platforms"][platform] = await run_platform(platform, video, workdir, pool, args)
+    finally:
+        await pool.close()
+        await server.close()
+    results["server"] = server.stats
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+    print_report(results, baseline)
+    print(f"trace file: {tracing.TRACE_FILE} (python cli_main.py trace-report {tracing.TRACE_FILE}, "
+          f"python -m benchmarks.adaptive_waits {tracing.TRACE_FILE})")
+    if args.output:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
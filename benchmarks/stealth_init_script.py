@@ -0,0 +1,101 @@
+"""
+stealth.min.js 注入方式的微基准
+
+对比三种方式创建上下文并注入 stealth 脚本的耗时：
+- path:   每个上下文都用 add_init_script(path=...)，每次读盘并经 Playwright 管道重新发送
+- cached: 每个上下文都用内存中缓存的脚本内容（set_init_script 当前做法）
+- reused: 同一个常驻上下文只注册一次，之后只新建页面（持久化 Profile 的情况）
+
+用法（在项目根目录执行）:
+    python -m benchmarks.stealth_init_script -n 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from conf import BASE_DIR, LOCAL_CHROME_PATH
+from utils.base_social_media import get_stealth_script, set_init_script
+
+STEALTH_JS_PATH = Path(BASE_DIR / "utils/stealth.min.js")
+
+
+def report(name, samples):
+    samples_ms = [s * 1000 for s in samples]
+    print(f"{name:<8} n={len(samples_ms):<4} mean={statistics.mean(samples_ms):8.2f}ms "
+          f"p50={statistics.median(samples_ms):8.2f}ms max={max(samples_ms):8.2f}ms")
+
+
+async def bench_path(browser, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        context = await browser.new_context()
+        await context.add_init_script(path=STEALTH_JS_PATH)
+        page = await context.new_page()
+        samples.append(time.perf_counter() - start)
+        await page.close()
+        await context.close()
+    return samples
+
+
+async def bench_cached(browser, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        context = await browser.new_context()
+        await context.add_init_script(script=get_stealth_script())
+        page = await context.new_page()
+        samples.append(time.perf_counter() - start)
+        await page.close()
+        await context.close()
+    return samples
+
+
+async def bench_reused(browser, rounds):
+    samples = []
+    context = await browser.new_context()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await set_init_script(context)
+        page = await context.new_page()
+        samples.append(time.perf_counter() - start)
+        await page.close()
+    await context.close()
+    return samples
+
+
+def bench_disk_read(rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        STEALTH_JS_PATH.read_text(encoding="utf-8")
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark stealth init script injection.")
+    parser.add_argument("-n", "--rounds", type=int, default=30, help="contexts created per mode")
+    args = parser.parse_args()
+
+    report("disk", bench_disk_read(args.rounds))
+    get_stealth_script()  # 预热缓存，只统计注入本身
+    async with async_playwright() as playwright:
+        launch_options = {'headless': True}
+        if LOCAL_CHROME_PATH:
+            launch_options['executable_path'] = LOCAL_CHROME_PATH
+        browser = await playwright.chromium.launch(**launch_options)
+        # 先跑一轮预热，避免首个上下文的冷启动影响结果
+        await bench_cached(browser, 2)
+        report("path", await bench_path(browser, args.rounds))
+        report("cached", await bench_cached(browser, args.rounds))
+        report("reused", await bench_reused(browser, args.rounds))
+        await browser.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,18 +1,26 @@
 import argparse
 import asyncio
+import sys
 from datetime import datetime
 from os.path import exists
 from pathlib import Path
 
-from conf import BASE_DIR
+from playwright.async_api import async_playwright
+
+from conf import BASE_DIR, LOCAL_CHROME_HEADLESS
 from uploader.douyin_uploader.main import douyin_setup, DouYinVideo
 from uploader.ks_uploader.main import ks_setup, KSVideo
 from uploader.tencent_uploader.main import weixin_setup, TencentVideo
 from uploader.tk_uploader.main_chrome import tiktok_setup, TiktokVideo
 from utils.base_social_media import get_supported_social_media, get_cli_action, SOCIAL_MEDIA_DOUYIN, \
     SOCIAL_MEDIA_TENCENT, SOCIAL_MEDIA_TIKTOK, SOCIAL_MEDIA_KUAISHOU
+from utils.browser_server import serve_browser
 from utils.constant import TencentZoneTypes
+from utils.launch_profiles import profile_names
+from utils.login_guard import CookieInvalidError
+from utils.rate_limit import upload_rate_limiter
 from utils.files_times import get_title_and_hashtags
+from utils.tracing import TRACE_FILE, load_spans, phase_report
 
 
 def parse_schedule(schedule_raw):
@@ -23,7 +31,67 @@ def parse_schedule(schedule_raw):
     return schedule
 
 
+async def serve_browser_main(argv):
+    parser = argparse.ArgumentParser(prog="cli_main.py serve-browser",
+                                     description="Start a long-lived browser that later upload/login runs connect to.")
+    parser.add_argument('--headless', dest='headless', action='store_true', default=LOCAL_CHROME_HEADLESS,
+                        help='Run the browser headless (login runs will then launch their own headed browser)')
+    parser.add_argument('--headed', dest='headless', action='store_false', help='Run the browser with a window')
+    parser.add_argument('-p', '--port', type=int, default=0, help='Remote debugging port, 0 picks a free port')
+    parser.add_argument('--launch-profile', choices=profile_names(), default=None,
+                        help='Append the Chromium args of this launch profile (see utils/launch_profiles.py)')
+    args = parser.parse_args(argv)
+    async with async_playwright() as playwright:
+        await serve_browser(playwright, headless=args.headless, port=args.port, launch_profile=args.launch_profile)
+
+
+def trace_report_main(argv):
+    parser = argparse.ArgumentParser(prog="cli_main.py trace-report",
+                                     description="Print p50/p95 duration of each upload phase per platform.")
+    parser.add_argument('files', nargs='*', type=Path,
+                        help=f'Trace files, defaults to {TRACE_FILE.name} and its rotated file under logs/')
+    parser.add_argument('--platform', help='Only report this platform')
+    parser.add_argument('--include-failed', action='store_true', help='Also count uploads that raised an error')
+    args = parser.parse_args(argv)
+    files = args.files or sorted(TRACE_FILE.parent.glob(f"{TRACE_FILE.name}*"))
+    rows = phase_report(load_spans(files), platform=args.platform, include_failed=args.include_failed)
+    if not rows:
+        print("No upload traces found.")
+        return
+    print(f"{'platform':<12} {'phase':<12} {'count':>6} {'p50(s)':>9} {'p95(s)':>9}")
+    for row in rows:
+        print(f"{row['platform']:<12} {row['phase']:<12} {row['count']:>6} "
+              f"{row['p50_ms'] / 1000:>9.2f} {row['p95_ms'] / 1000:>9.2f}")
+
+
+def rate_limits_main(argv):
+    parser = argparse.ArgumentParser(prog="cli_main.py rate-limits",
+                                     description="Print upload rate-limit buckets and accumulated wait time.")
+    parser.add_argument('--platform', help='Only show this platform')
+    args = parser.parse_args(argv)
+    rows = upload_rate_limiter.snapshot(args.platform)
+    if not rows:
+        print("No rate-limited uploads yet.")
+        return
+    print(f"{'bucket':<36} {'rate/h':>7} {'burst':>5} {'tokens':>7} {'uploads':>7} {'waited':>6} "
+          f"{'avg(s)':>8} {'max(s)':>8}")
+    for row in rows:
+        print(f"{row['key']:<36} {row['rate_per_hour'] or '-':>7} {row['burst'] or '-':>5} {row['tokens']:>7} "
+              f"{row['acquired']:>7} {row['waited']:>6} {row['avg_wait_seconds']:>8} {row['max_wait_seconds']:>8}")
+
+
 async def main():
+    # serve-browser、trace-report、rate-limits 与平台、账号无关，单独解析
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve-browser':
+        await serve_browser_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'trace-report':
+        trace_report_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'rate-limits':
+        rate_limits_main(sys.argv[2:])
+        return
+
     # 主解析器
     parser = argparse.ArgumentParser(description="Upload video to multiple social-media.")
     parser.add_argument("platform", metavar='platform', choices=get_supported_social_media(), help="Choose social-media platform: douyin tencent tiktok kuaishou")
@@ -42,6 +110,12 @@ async def main():
             action_parser.add_argument("-pt", "--publish_type", type=int, choices=[0, 1],
                                        help="0 for immediate, 1 for scheduled", default=0)
             action_parser.add_argument('-t', '--schedule', help='Schedule UTC time in %Y-%m-%d %H:%M format')
+            action_parser.add_argument('--precheck', action='store_true',
+                                       help='Validate the cookie in a separate browser before uploading')
+            action_parser.add_argument('--launch-profile', choices=profile_names(), default=None,
+                                       help='Browser launch profile, e.g. minimal-memory (see utils/launch_profiles.py)')
+            action_parser.add_argument('--allow-duplicate', action='store_true',
+                                       help='Upload even if this account already published the same content')
 
     # 解析命令行参数
     args = parser.parse_args()
@@ -78,24 +152,38 @@ async def main():
             publish_date = parse_schedule(args.schedule)
 
         if args.platform == SOCIAL_MEDIA_DOUYIN:
-            await douyin_setup(account_file, handle=False)
-            app = DouYinVideo(title, video_file, tags, publish_date, account_file)
+            setup, handle = douyin_setup, False
+            app = DouYinVideo(title, video_file, tags, publish_date, account_file, launch_profile=args.launch_profile,
+                              allow_duplicate=args.allow_duplicate)
         elif args.platform == SOCIAL_MEDIA_TIKTOK:
-            await tiktok_setup(account_file, handle=True)
-            app = TiktokVideo(title, video_file, tags, publish_date, account_file)
+            setup, handle = tiktok_setup, True
+            app = TiktokVideo(title, video_file, tags, publish_date, account_file, launch_profile=args.launch_profile,
+                              allow_duplicate=args.allow_duplicate)
         elif args.platform == SOCIAL_MEDIA_TENCENT:
-            await weixin_setup(account_file, handle=True)
+            setup, handle = weixin_setup, True
             category = TencentZoneTypes.LIFESTYLE.value  # 标记原创需要否则不需要传
-            app = TencentVideo(title, video_file, tags, publish_date, account_file, category)
+            app = TencentVideo(title, video_file, tags, publish_date, account_file, category,
+                               launch_profile=args.launch_profile, allow_duplicate=args.allow_duplicate)
         elif args.platform == SOCIAL_MEDIA_KUAISHOU:
-            await ks_setup(account_file, handle=True)
-            app = KSVideo(title, video_file, tags, publish_date, account_file)
+            setup, handle = ks_setup, True
+            app = KSVideo(title, video_file, tags, publish_date, account_file, launch_profile=args.launch_profile,
+                          allow_duplicate=args.allow_duplicate)
         else:
             print("Wrong platform, please check your input")
             exit()
 
-        await app.main()
-
+        # 默认由上传页面自己检测登录态，省去单独校验 cookie 的那次浏览器启动
+        if args.precheck or not account_file.exists():
+            await setup(account_file, handle=handle)
+        try:
+            await app.main()
+        except CookieInvalidError as e:
+            print(e)
+            # cookie 失效：按原来的方式走一遍 setup（需要时打开浏览器重新登录），成功后重试一次；
+            # 不能重新登录时以非 0 状态退出，定时任务才能发现上传失败
+            if not handle or not await setup(account_file, handle=True):
+                sys.exit(1)
+            await app.main()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -36,3 +36,107 @@ setup_playwright_browsers()
 XHS_SERVER = "http://127.0.0.1:11901"
 LOCAL_CHROME_PATH = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"   # Mac Chrome 路径
 LOCAL_CHROME_HEADLESS = False  # 登录时需要可见窗口输入验证码，设为 False
+
+# 浏览器池：常驻的 Chromium 实例数上限、空闲多久（秒）后关闭、单个实例最多服务多少个上下文后重启
+BROWSER_POOL_MAX_SIZE = 2
+BROWSER_POOL_IDLE_TIMEOUT = 600
+BROWSER_POOL_MAX_USES = 50
+
+# 按账号持久化浏览器 Profile（保留 HTTP 缓存 / Service Worker），以及同时常驻的 Profile 数量和总内存上限（MB）
+BROWSER_PERSISTENT_PROFILES = False
+BROWSER_PROFILE_MAX_OPEN = 4
+BROWSER_PROFILE_MAX_MEMORY_MB = 4096
+# 一个账号 Profile 被借出超过多少秒仍未归还时视为泄漏，强制关闭后重新打开，避免同一账号的上传一直等待
+BROWSER_PROFILE_LEASE_TIMEOUT = 7200
+
+# 校验 cookie 时拦截图片、视频、字体和埋点请求（各平台策略见 utils/resource_policy.py）
+VALIDATION_BLOCK_RESOURCES = True
+
+# 校验 cookie 时先用 HTTP 接口快速判断，结果不确定才启动浏览器；请求超时时间（秒）
+COOKIE_HTTP_FASTPATH = True
+COOKIE_HTTP_TIMEOUT = 5
+
+# 批量校验账号 cookie（/getValidAccounts）时的最大并发数，需要浏览器校验的账号共用一个浏览器实例
+COOKIE_CHECK_CONCURRENCY = 5
+
+# 账号 cookie 校验结果的缓存时间（秒），以及距离过期多少秒内在后台提前重新校验
+COOKIE_CHECK_TTL = 1800
+COOKIE_REVALIDATE_BEFORE = 300
+
+# 抖音上传通过监听网络请求判断上传 / 发布结果（False 时回退到轮询页面元素）
+UPLOAD_WATCH_NETWORK = True
+
+# 记录上传各阶段耗时到 logs/upload_trace.jsonl（False 时只在进程内汇总，见 /uploadPhaseStats）
+UPLOAD_TRACE_FILE_ENABLED = True
+
+# 浏览器启动配置名（内置 default / minimal-memory / headless-shell / headed-debug，见 utils/launch_profiles.py），
+# 以及新增或覆盖的配置，例如 {"small-window": {"base": "minimal-memory", "viewport": {"width": 1024, "height": 768}}}
+BROWSER_LAUNCH_PROFILE = "default"
+BROWSER_LAUNCH_PROFILES = {}
+
+# 上传失败时保存现场到 logs/diagnostics/：上传过程中在内存里保留最近几个阶段切换时的视口截图
+# （0 表示不截图，失败时只保存失败瞬间的截图和 DOM）
+UPLOAD_DIAGNOSTICS_SNAPSHOTS = 8
+
+# 小红书签名 worker（uploader/xhs_uploader/sign_worker.py）：常驻页面数上限（每个 a1 一个），单个页面最多签名多少次、
+# 存活多少秒后重建，排队等待签名的请求上限，单次签名超时（秒）
+XHS_SIGN_MAX_PAGES = 4
+XHS_SIGN_PAGE_MAX_USES = 1000
+XHS_SIGN_PAGE_MAX_AGE = 1800
+XHS_SIGN_QUEUE_SIZE = 64
+XHS_SIGN_TIMEOUT = 60
+
+# 上传任务队列（myUtils/upload_jobs.py）：后台 worker 线程数（None 表示与 UPLOAD_MAX_CONCURRENCY 相同，
+# 每个线程同时执行一个任务），没有任务时的轮询间隔（秒），
+# 每个任务最多执行几次（失败后自动重试），重试前等待的秒数，以及执行中任务多久没有心跳视为遗留任务（秒）
+UPLOAD_JOB_WORKERS = None
+UPLOAD_JOB_POLL_INTERVAL = 2
+UPLOAD_JOB_MAX_ATTEMPTS = 2
+UPLOAD_JOB_RETRY_DELAY = 60
+UPLOAD_JOB_STALE_SECONDS = 120
+
+# 并发上传（utils/upload_fanout.py）：同时进行的上传总数上限，以及按平台的上限（平台名见 utils/base_social_media.py，
+# 未列出的平台只受总数限制），例如 {"tencent": 1, "douyin": 3}。浏览器池模式下多个上传共用 BROWSER_POOL_MAX_SIZE 个浏览器
+UPLOAD_MAX_CONCURRENCY = 4
+UPLOAD_PLATFORM_CONCURRENCY = {}
+
+# 上传限速（utils/rate_limit.py）：令牌桶，rate 为每小时最多上传几次，burst 为可以连续上传的次数，状态保存在数据库中，
+# 多个进程共用。UPLOAD_RATE_LIMITS 为平台级额度（该平台所有账号共用），UPLOAD_ACCOUNT_RATE_LIMITS 为每个账号的额度，
+# 未配置的平台不限速，例如 {"douyin": {"rate": 20, "burst": 3}}。预计等待超过 UPLOAD_RATE_LIMIT_MAX_WAIT 秒时放弃上传
+UPLOAD_RATE_LIMITS = {}
+UPLOAD_ACCOUNT_RATE_LIMITS = {
+    # 同一账号两次上传至少间隔 30 秒，避免风控
+    "bilibili": {"rate": 120, "burst": 1},
+    "xiaohongshu": {"rate": 120, "burst": 1},
+}
+UPLOAD_RATE_LIMIT_MAX_WAIT = 3600
+
+# 本地定时发布（myUtils/upload_scheduler.py）：这些平台开启定时时不操作平台的定时发布控件，由本地调度器到点上传并立即发布
+# （单次请求也可以用 localSchedule 指定），例如 ["tencent"]。调度器在内存里只保留未来 UPLOAD_SCHEDULER_LOOKAHEAD 秒内、
+# 最多 UPLOAD_SCHEDULER_MAX_TIMERS 个定时器，提前 UPLOAD_SCHEDULER_LEAD 秒开始上传；
+# 停机期间错过的定时任务在启动时补发（False 时标记为已取消）
+UPLOAD_LOCAL_SCHEDULE_PLATFORMS = []
+UPLOAD_SCHEDULER_LOOKAHEAD = 3600
+UPLOAD_SCHEDULER_MAX_TIMERS = 1000
+UPLOAD_SCHEDULER_LEAD = 60
+UPLOAD_SCHEDULER_CATCH_UP = True
+
+# 定时发布时间分配（utils/slot_allocator.py）：同一账号两次发布的最小间隔（分钟），按平台的每日发布上限（所有账号合计），
+# 例如 {"douyin": 20}，以及最多往后排多少天
+SCHEDULE_MIN_SPACING_MINUTES = 30
+SCHEDULE_PLATFORM_DAILY_CAPS = {}
+SCHEDULE_MAX_DAYS = 365
+
+# 重试策略（utils/retry.py）：页面操作失败后按指数退避加随机抖动重试，第一次最多等 RETRY_BASE_DELAY 秒，之后每次翻倍，
+# 单次最多等 RETRY_MAX_DELAY 秒；点击发布最多重试 PUBLISH_RETRY_DEADLINE 秒，等待文件上传、转码最多 UPLOAD_TRANSFER_TIMEOUT 秒。
+# 失败的上传任务从 UPLOAD_JOB_RETRY_DELAY 秒开始按同样的方式退避，最多 UPLOAD_JOB_RETRY_MAX_DELAY 秒
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10
+PUBLISH_RETRY_DEADLINE = 300
+UPLOAD_TRANSFER_TIMEOUT = 3600
+UPLOAD_JOB_RETRY_MAX_DELAY = 1800
+
+# 平台熔断（utils/retry.py）：同一平台连续 CIRCUIT_BREAKER_FAILURE_THRESHOLD 次上传失败（cookie 失效等账号自身的问题不算）
+# 后暂停启动该平台的浏览器，CIRCUIT_BREAKER_COOL_DOWN 秒后放行一个上传试探，成功则恢复，失败则继续暂停
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+CIRCUIT_BREAKER_COOL_DOWN = 600
@@ -9,34 +9,122 @@ db_file = './database.db'
 # if os.path.exists(db_file):
 #     os.remove(db_file)
 
-# 连接到SQLite数据库（如果文件不存在则会自动创建）
-conn = sqlite3.connect(db_file)
-cursor = conn.cursor()
-
-# 创建账号记录表
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS user_info (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    type INTEGER NOT NULL,
-    filePath TEXT NOT NULL,  -- 存储文件路径
-    userName TEXT NOT NULL,
-    status INTEGER DEFAULT 0
-)
-''')
-
-# 创建文件记录表
-cursor.execute('''CREATE TABLE IF NOT EXISTS file_records (
-    id INTEGER PRIMARY KEY AUTOINCREMENT, -- 唯一标识每条记录
-    filename TEXT NOT NULL,               -- 文件名
-    filesize REAL,                     -- 文件大小（单位：MB）
-    upload_time DATETIME DEFAULT CURRENT_TIMESTAMP, -- 上传时间，默认当前时间
-    file_path TEXT                        -- 文件路径
-)
-''')
-
-
-# 提交更改
-conn.commit()
-print("✅ 表创建成功")
-# 关闭连接
-conn.close()
\ No newline at end of file
+
+def create_tables(cursor):
+    # 创建账号记录表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_info (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type INTEGER NOT NULL,
+        filePath TEXT NOT NULL,  -- 存储文件路径
+        userName TEXT NOT NULL,
+        status INTEGER DEFAULT 0,
+        last_checked_at DATETIME,  -- 最近一次校验 cookie 的时间
+        last_valid_at DATETIME     -- 最近一次校验为有效的时间
+    )
+    ''')
+
+    # 创建文件记录表
+    cursor.execute('''CREATE TABLE IF NOT EXISTS file_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, -- 唯一标识每条记录
+        filename TEXT NOT NULL,               -- 文件名
+        filesize REAL,                     -- 文件大小（单位：MB）
+        upload_time DATETIME DEFAULT CURRENT_TIMESTAMP, -- 上传时间，默认当前时间
+        file_path TEXT,                       -- 文件路径
+        content_hash TEXT                     -- 文件内容的 SHA-256，用于发布去重（见 utils/publish_log.py）
+    )
+    ''')
+
+    # 创建上传任务表（见 myUtils/upload_jobs.py），每条记录是一个 文件 × 账号
+    cursor.execute('''CREATE TABLE IF NOT EXISTS upload_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id TEXT NOT NULL,               -- 同一次发布请求生成的任务共用
+        type INTEGER NOT NULL,                -- 平台类型，与 user_info.type 一致
+        file_path TEXT NOT NULL,              -- videoFile 目录下的文件名
+        account_file TEXT NOT NULL,           -- cookiesFile 目录下的文件名
+        payload TEXT NOT NULL,                -- 标题、话题、发布时间等上传参数（JSON）
+        status TEXT NOT NULL DEFAULT 'pending', -- pending / running / succeeded / failed / cancelled
+        attempts INTEGER NOT NULL DEFAULT 0,  -- 已执行次数
+        max_attempts INTEGER NOT NULL DEFAULT 1,
+        error TEXT,                           -- 最近一次失败的原因
+        cancel_requested INTEGER NOT NULL DEFAULT 0, -- 执行中的任务被请求取消
+        worker TEXT,                          -- 正在执行的 worker
+        run_after DATETIME,                   -- 失败重试时，早于该时间不执行
+        scheduled_at DATETIME,                -- 本地定时发布的时间，由 myUtils/upload_scheduler.py 按时派发
+        checkpoint TEXT,                      -- 已完成的上传步骤和平台草稿地址（JSON，见 utils/checkpoint.py）
+        content_hash TEXT,                    -- 素材的 SHA-256，入队时用于发现重复的任务
+        heartbeat_at DATETIME,                -- 执行中的任务定期更新，用于发现进程退出后遗留的任务
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        started_at DATETIME,
+        finished_at DATETIME
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_jobs_status ON upload_jobs (status, run_after)')
+
+    # 创建发布记录表（见 utils/publish_log.py），同一内容 × 账号 × 平台只记一条
+    cursor.execute('''CREATE TABLE IF NOT EXISTS publish_log (
+        content_hash TEXT NOT NULL,           -- 素材的 SHA-256
+        account TEXT NOT NULL,                -- cookie 文件名（B 站为 DedeUserID）
+        platform TEXT NOT NULL,
+        file_path TEXT,                       -- 最近一次发布的文件名
+        publish_date DATETIME,                -- 定时发布时间，立即发布为空
+        published_at DATETIME NOT NULL,       -- 最近一次发布成功的时间
+        count INTEGER NOT NULL DEFAULT 1,     -- 发布次数，允许重复发布时累加
+        PRIMARY KEY (content_hash, account, platform)
+    )
+    ''')
+
+    # 创建上传限速的令牌桶表（见 utils/rate_limit.py），多个进程共用同一份额度
+    cursor.execute('''CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        key TEXT PRIMARY KEY,                 -- 平台，或 平台:账号
+        platform TEXT NOT NULL,
+        account TEXT NOT NULL DEFAULT '',     -- 为空表示平台级额度
+        tokens REAL NOT NULL,                 -- 上次更新时的令牌数，预约排队时可以为负
+        updated_at REAL NOT NULL,             -- 上次更新的 Unix 时间戳（秒），用于计算补充的令牌
+        acquired INTEGER NOT NULL DEFAULT 0,  -- 累计放行次数
+        waited INTEGER NOT NULL DEFAULT 0,    -- 其中需要等待的次数
+        wait_seconds REAL NOT NULL DEFAULT 0, -- 累计等待秒数
+        max_wait_seconds REAL NOT NULL DEFAULT 0,
+        last_acquired_at DATETIME
+    )
+    ''')
+
+
+def add_column(cursor, table, column, definition):
+    """表中没有该列时才添加（SQLite 不支持 ADD COLUMN IF NOT EXISTS）"""
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"✅ 已为 {table} 添加列 {column}")
+
+
+def migrate(cursor):
+    """为旧版本创建的数据库补齐新增的列，可重复执行"""
+    add_column(cursor, "user_info", "last_checked_at", "DATETIME")
+    add_column(cursor, "user_info", "last_valid_at", "DATETIME")
+    add_column(cursor, "upload_jobs", "scheduled_at", "DATETIME")
+    add_column(cursor, "upload_jobs", "checkpoint", "TEXT")
+    add_column(cursor, "upload_jobs", "content_hash", "TEXT")
+    add_column(cursor, "file_records", "content_hash", "TEXT")
+    # 旧数据库补齐 scheduled_at、content_hash 之后才能建索引
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_jobs_scheduled ON upload_jobs (status, scheduled_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_jobs_content ON upload_jobs (content_hash, account_file, type)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_records_path ON file_records (file_path)')
+
+
+def init_db(path=db_file):
+    """建表并执行迁移，后端启动时也会调用"""
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        create_tables(cursor)
+        migrate(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    init_db()
+    print("✅ 表创建成功")
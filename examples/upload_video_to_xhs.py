@@ -1,12 +1,13 @@
 import configparser
 from pathlib import Path
-from time import sleep
 
 from xhs import XhsClient
 
 from conf import BASE_DIR
 from utils.files_times import generate_schedule_time_next_day, get_title_and_hashtags
 from uploader.xhs_uploader.main import sign_local, beauty_print
+from utils.base_social_media import SOCIAL_MEDIA_XIAOHONGSHU
+from utils.rate_limit import upload_rate_limiter
 
 config = configparser.RawConfigParser()
 config.read(Path(BASE_DIR / "uploader" / "xhs_uploader" / "accounts.ini"))
@@ -43,6 +44,8 @@ if __name__ == '__main__':
         print(f"视频文件名：{file}")
         print(f"标题：{title}")
         print(f"Hashtag：{tags}")
+        # 两次发布之间的间隔由 conf.UPLOAD_ACCOUNT_RATE_LIMITS["xiaohongshu"] 控制，避免风控（必要）
+        upload_rate_limiter.acquire_sync(SOCIAL_MEDIA_XIAOHONGSHU, "account1")
 
         topics = []
         # 获取hashtag
@@ -64,5 +67,3 @@ if __name__ == '__main__':
                                             post_time=publish_datetimes[index].strftime("%Y-%m-%d %H:%M:%S"))
 
         beauty_print(note)
-        # 强制休眠30s，避免风控（必要）
-        sleep(30)
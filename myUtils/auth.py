@@ -3,12 +3,17 @@ import configparser
 import os
 import logging
 import traceback
+from contextlib import asynccontextmanager
 
 from playwright.async_api import async_playwright
 from xhs import XhsClient
 
-from conf import BASE_DIR, DATA_DIR, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import BASE_DIR, DATA_DIR, LOCAL_CHROME_HEADLESS, COOKIE_HTTP_FASTPATH, COOKIE_CHECK_CONCURRENCY
+from myUtils.cookie_fastpath import http_check_cookie, new_http_client
+from utils.browser_pool import BrowserPool
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_DOUYIN, SOCIAL_MEDIA_TENCENT, \
+    SOCIAL_MEDIA_KUAISHOU, SOCIAL_MEDIA_XIAOHONGSHU
+from utils.resource_policy import apply_validation_policy
 from utils.log import tencent_logger, kuaishou_logger, douyin_logger
 from pathlib import Path
 from uploader.xhs_uploader.main import sign_local
@@ -17,11 +22,34 @@ from uploader.xhs_uploader.main import sign_local
 logger = logging.getLogger(__name__)
 
 
-async def cookie_auth_douyin(account_file):
+@asynccontextmanager
+async def validation_context(account_file, platform, browser_pool=None):
+    """
+    创建校验 cookie 用的浏览器上下文，退出时自动关闭
+
+    传入 browser_pool 时从池中共享浏览器，只新建并关闭上下文；否则独立启动一个浏览器
+    """
+    if browser_pool is not None:
+        context = await browser_pool.new_context({'headless': LOCAL_CHROME_HEADLESS}, storage_state=account_file)
+        try:
+            context = await set_init_script(context)
+            yield await apply_validation_policy(context, platform)
+        finally:
+            await context.close()
+        return
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
+        try:
+            yield await apply_validation_policy(context, platform)
+        finally:
+            await context.close()
+            await browser.close()
+
+
+async def cookie_auth_douyin(account_file, browser_pool=None):
+    async with validation_context(account_file, SOCIAL_MEDIA_DOUYIN, browser_pool) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -40,16 +68,11 @@ async def cookie_auth_douyin(account_file):
                 return True
         except:
             douyin_logger.error("[+] 等待5秒 cookie 失效")
-            await context.close()
-            await browser.close()
             return False
 
 
-async def cookie_auth_tencent(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
+async def cookie_auth_tencent(account_file, browser_pool=None):
+    async with validation_context(account_file, SOCIAL_MEDIA_TENCENT, browser_pool) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -63,11 +86,8 @@ async def cookie_auth_tencent(account_file):
             return True
 
 
-async def cookie_auth_ks(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
+async def cookie_auth_ks(account_file, browser_pool=None):
+    async with validation_context(account_file, SOCIAL_MEDIA_KUAISHOU, browser_pool) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -82,11 +102,8 @@ async def cookie_auth_ks(account_file):
             return True
 
 
-async def cookie_auth_xhs(account_file):
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
+async def cookie_auth_xhs(account_file, browser_pool=None):
+    async with validation_context(account_file, SOCIAL_MEDIA_XIAOHONGSHU, browser_pool) as context:
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -95,8 +112,6 @@ async def cookie_auth_xhs(account_file):
             await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
         except:
             print("[+] 等待5秒 cookie 失效")
-            await context.close()
-            await browser.close()
             return False
         # 2024.06.17 抖音创作者中心改版
         if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
@@ -107,13 +122,19 @@ async def cookie_auth_xhs(account_file):
             return True
 
 
-async def check_cookie(type, file_path):
+async def check_cookie(type, file_path, fast=COOKIE_HTTP_FASTPATH, browser_pool=None, http_client=None,
+                       raise_errors=False):
     """
     验证 cookie 有效性
     
     Args:
         type: 平台类型 (1=小红书, 2=视频号, 3=抖音, 4=快手)
         file_path: cookie 文件名
+        fast: 先走 HTTP 快速校验，结果不确定时才启动浏览器
+        browser_pool: 需要浏览器校验时从该池借用浏览器，不传则单独启动
+        http_client: HTTP 快速校验共用的客户端，不传则本次新建并关闭
+        raise_errors: 浏览器校验出错（浏览器启动失败、崩溃等）时抛出异常而不是返回 False，
+            check_cookies 据此把结果记为 None，不会把账号误判为失效
     """
     platform_names = {1: '小红书', 2: '视频号', 3: '抖音', 4: '快手'}
     platform_name = platform_names.get(type, f'未知平台({type})')
@@ -125,28 +146,70 @@ async def check_cookie(type, file_path):
     if not cookie_file.exists():
         logger.error(f"Cookie 文件不存在: {cookie_file}")
         return False
+
+    if fast:
+        result = await http_check_cookie(type, cookie_file, http_client)
+        if result is not None:
+            logger.info(f"HTTP 快速校验完成: 平台={platform_name}, 有效={result}")
+            return result
+        logger.info(f"HTTP 快速校验结果不确定，回退到浏览器校验: 平台={platform_name}")
     
     try:
         match type:
             # 小红书
             case 1:
-                return await cookie_auth_xhs(cookie_file)
+                return await cookie_auth_xhs(cookie_file, browser_pool)
             # 视频号
             case 2:
-                return await cookie_auth_tencent(cookie_file)
+                return await cookie_auth_tencent(cookie_file, browser_pool)
             # 抖音
             case 3:
-                return await cookie_auth_douyin(cookie_file)
+                return await cookie_auth_douyin(cookie_file, browser_pool)
             # 快手
             case 4:
-                return await cookie_auth_ks(cookie_file)
+                return await cookie_auth_ks(cookie_file, browser_pool)
             case _:
                 logger.warning(f"未知平台类型: {type}")
                 return False
     except Exception as e:
         logger.error(f"验证 {platform_name} cookie 时发生异常: {str(e)}")
         logger.error(f"详细错误堆栈:\n{traceback.format_exc()}")
+        if raise_errors:
+            raise
         return False
 
+
+async def check_cookies(accounts, concurrency=COOKIE_CHECK_CONCURRENCY):
+    """
+    并发验证多个账号的 cookie
+
+    同时进行的校验数不超过 concurrency；需要浏览器校验的账号共用同一个浏览器实例，
+    每个账号只新建一个隔离的上下文。浏览器在第一次需要时才启动，全部走 HTTP 快速校验时不会启动。
+
+    Args:
+        accounts: [(type, file_path), ...]
+        concurrency: 最大并发数，默认取 conf.COOKIE_CHECK_CONCURRENCY
+
+    Returns:
+        与 accounts 顺序一致的结果列表，元素为 True / False，校验过程出错的为 None
+    """
+    semaphore = asyncio.Semaphore(max(int(concurrency), 1))
+    browser_pool = BrowserPool(max_size=1, persistent_profiles=False)
+
+    async def check_one(type, file_path):
+        async with semaphore:
+            try:
+                return await check_cookie(type, file_path, browser_pool=browser_pool, http_client=http_client,
+                                          raise_errors=True)
+            except Exception as e:
+                logger.warning(f"验证 cookie 时出错: {file_path}, {str(e)}")
+                return None
+
+    try:
+        async with new_http_client() as http_client:
+            return await asyncio.gather(*(check_one(type, file_path) for type, file_path in accounts))
+    finally:
+        await browser_pool.close()
+
 # a = asyncio.run(check_cookie(1,"3a6cfdc0-3d51-11f0-8507-44e51723d63c.json"))
 # print(a)
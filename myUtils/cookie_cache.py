@@ -0,0 +1,129 @@
+"""
+账号 cookie 校验结果缓存
+
+user_info 表记录每个账号最近一次校验时间（last_checked_at）和最近一次有效时间（last_valid_at）。
+在 COOKIE_CHECK_TTL 秒内校验过的账号直接使用数据库中的 status，不再重新校验；
+距离过期不足 COOKIE_REVALIDATE_BEFORE 秒的账号先按缓存返回，同时在后台线程中重新校验。
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from conf import DATA_DIR, COOKIE_CHECK_TTL, COOKIE_REVALIDATE_BEFORE
+from myUtils.auth import check_cookies
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(DATA_DIR / "db" / "database.db")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 账号字段顺序与 user_info 表一致
+ACCOUNT_COLUMNS = "id, type, filePath, userName, status, last_checked_at, last_valid_at"
+
+# 正在后台重新校验的账号 id，避免重复提交
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+def load_accounts() -> list:
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {ACCOUNT_COLUMNS} FROM user_info')
+        return [list(row) for row in cursor.fetchall()]
+
+
+def checked_age(row, now: datetime):
+    """距离上次校验的秒数，从未校验过返回 None"""
+    if not row[5]:
+        return None
+    try:
+        return (now - datetime.strptime(row[5], TIME_FORMAT)).total_seconds()
+    except ValueError:
+        return None
+
+
+def split_by_freshness(rows, ttl=COOKIE_CHECK_TTL, revalidate_before=COOKIE_REVALIDATE_BEFORE, now=None):
+    """
+    按缓存状态把账号分成三组
+
+    Returns:
+        (fresh, expiring, stale): 缓存有效 / 缓存有效但即将过期 / 需要立即校验
+    """
+    now = now or datetime.now()
+    fresh, expiring, stale = [], [], []
+    for row in rows:
+        age = checked_age(row, now)
+        if age is None or age < 0 or age >= ttl:
+            stale.append(row)
+        elif age >= ttl - revalidate_before:
+            expiring.append(row)
+        else:
+            fresh.append(row)
+    return fresh, expiring, stale
+
+
+async def validate_accounts(rows):
+    """
+    校验账号 cookie，并在一个事务中写回状态和校验时间
+
+    rows 中的 status / last_checked_at / last_valid_at 会被原地更新；校验出错的账号保持原样
+    """
+    if not rows:
+        return rows
+    results = await check_cookies([(row[1], row[2]) for row in rows])
+    checked_at = datetime.now().strftime(TIME_FORMAT)
+    updates = []
+    for row, flag in zip(rows, results):
+        if flag is None:
+            logger.warning(f"验证账号 {row[0]} cookie 时出错，保留原状态")
+            continue
+        status = 1 if flag else 0
+        if row[4] != status:
+            logger.info(f"账号 {row[0]} cookie {'有效' if flag else '已失效'}，状态已更新")
+        row[4] = status
+        row[5] = checked_at
+        if flag:
+            row[6] = checked_at
+        updates.append((status, checked_at, row[6], row[0]))
+    if updates:
+        with sqlite3.connect(DB_PATH) as conn:
+            conn.executemany('''
+            UPDATE user_info
+            SET status = ?, last_checked_at = ?, last_valid_at = ?
+            WHERE id = ?
+            ''', updates)
+            conn.commit()
+    return rows
+
+
+def revalidate_in_background(rows):
+    """在后台线程中重新校验即将过期的账号，正在校验中的账号会被跳过"""
+    with _revalidating_lock:
+        rows = [row for row in rows if row[0] not in _revalidating]
+        _revalidating.update(row[0] for row in rows)
+    if not rows:
+        return None
+
+    def worker():
+        try:
+            asyncio.run(validate_accounts([list(row) for row in rows]))
+            logger.info(f"后台重新校验完成，共 {len(rows)} 个账号")
+        except Exception as e:
+            logger.error(f"后台重新校验账号失败: {str(e)}")
+        finally:
+            with _revalidating_lock:
+                _revalidating.difference_update(row[0] for row in rows)
+
+    thread = threading.Thread(target=worker, name="cookie-revalidate", daemon=True)
+    thread.start()
+    return thread
+
+
+def invalidate(account_id):
+    """清除账号的校验缓存（例如重新上传了 cookie 文件），下次请求会重新校验"""
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute('UPDATE user_info SET last_checked_at = NULL WHERE id = ?', (account_id,))
+        conn.commit()
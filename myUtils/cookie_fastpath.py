@@ -0,0 +1,169 @@
+"""
+cookie 有效性的 HTTP 快速校验
+
+不启动浏览器，直接从 storage_state JSON 中取出 cookie，请求各平台一个轻量的已登录接口来判断 cookie 是否有效。
+结果只有在接口返回体明确表示"已登录"/"未登录"时才采用，其他情况（网络错误、接口改版、
+风控拦截返回的 401/403、跳转、缺少该域名的 cookie 等）一律返回 None，由 check_cookie 回退到浏览器校验。
+
+校验器按平台类型注册，可以替换或新增：
+
+    register_validator(3, JsonApiValidator(
+        cookie_domain="douyin.com",
+        path="/web/api/media/user/info/",
+        base_url="http://127.0.0.1:8000",   # 指向本地桩服务即可离线测试
+        is_valid=lambda data: data.get("status_code") == 0,
+        is_invalid=lambda data: data.get("status_code") not in (None, 0),
+    ))
+"""
+import json
+import logging
+from typing import Callable, Optional
+
+import httpx
+
+from conf import COOKIE_HTTP_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36'
+
+
+def new_http_client() -> httpx.AsyncClient:
+    """
+    新建快速校验用的 httpx 客户端
+
+    调用方负责关闭，一般写成 async with new_http_client() as client；
+    check_cookies 整批共用一个客户端，复用连接池。
+    """
+    return httpx.AsyncClient(
+        timeout=COOKIE_HTTP_TIMEOUT,
+        follow_redirects=False,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        headers={'User-Agent': USER_AGENT},
+    )
+
+
+def load_cookies(account_file) -> list:
+    with open(account_file, "r", encoding="utf-8") as f:
+        return json.load(f).get("cookies", [])
+
+
+def cookie_header(cookies: list, cookie_domain: str) -> str:
+    """拼出属于 cookie_domain（含子域名）的 Cookie 请求头"""
+    pairs = []
+    for cookie in cookies:
+        domain = cookie.get("domain", "").lstrip(".")
+        if domain == cookie_domain or domain.endswith("." + cookie_domain):
+            pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+class JsonApiValidator(object):
+    """请求一个返回 JSON 的已登录接口，根据返回内容判断 cookie 是否有效"""
+
+    def __init__(self, cookie_domain: str, path: str, base_url: str,
+                 is_valid: Callable[[dict], bool], is_invalid: Callable[[dict], bool],
+                 method: str = "GET", json_body: dict = None, headers: dict = None):
+        self.cookie_domain = cookie_domain
+        self.path = path
+        self.base_url = base_url.rstrip("/")
+        self.is_valid = is_valid
+        self.is_invalid = is_invalid
+        self.method = method
+        self.json_body = json_body
+        self.headers = headers or {}
+
+    async def validate(self, client: httpx.AsyncClient, cookies: list) -> Optional[bool]:
+        """
+        Returns:
+            True 有效 / False 失效 / None 无法确定
+
+        只有接口返回体明确表示未登录时才判为失效；401/403 和跳转也可能是风控、地区限制，
+        cookie 文件里没有该域名的 cookie 可能只是存储格式不同，这些都交给浏览器校验。
+        """
+        header = cookie_header(cookies, self.cookie_domain)
+        if not header:
+            return None
+        headers = {**self.headers, 'Cookie': header, 'Referer': self.base_url + "/"}
+        response = await client.request(self.method, self.base_url + self.path, headers=headers, json=self.json_body)
+        if response.status_code != 200:
+            return None
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        if self.is_valid(data):
+            return True
+        if self.is_invalid(data):
+            return False
+        return None
+
+
+# 平台类型与 check_cookie 保持一致：1=小红书, 2=视频号, 3=抖音, 4=快手
+VALIDATORS = {
+    1: JsonApiValidator(
+        cookie_domain="xiaohongshu.com",
+        base_url="https://creator.xiaohongshu.com",
+        path="/api/galaxy/user/info",
+        is_valid=lambda data: data.get("success") is True and bool(data.get("data")),
+        is_invalid=lambda data: data.get("code") in (-100, -101),
+    ),
+    2: JsonApiValidator(
+        cookie_domain="channels.weixin.qq.com",
+        base_url="https://channels.weixin.qq.com",
+        path="/cgi-bin/mmfinderassistant-bin/auth/auth_data",
+        method="POST",
+        json_body={},
+        is_valid=lambda data: data.get("errCode") == 0 and bool((data.get("data") or {}).get("finderUser")),
+        is_invalid=lambda data: data.get("errCode") in (300333, 300334),
+    ),
+    3: JsonApiValidator(
+        cookie_domain="douyin.com",
+        base_url="https://creator.douyin.com",
+        path="/web/api/media/user/info/",
+        is_valid=lambda data: data.get("status_code") == 0 and bool(data.get("user")),
+        is_invalid=lambda data: data.get("status_code") in (8, 2190008),
+    ),
+    4: JsonApiValidator(
+        cookie_domain="kuaishou.com",
+        base_url="https://cp.kuaishou.com",
+        path="/rest/v2/creator/pc/authority/account/current",
+        method="POST",
+        json_body={},
+        is_valid=lambda data: data.get("result") == 1 and bool(data.get("data")),
+        is_invalid=lambda data: data.get("result") in (109, 100110000),
+    ),
+}
+
+
+def register_validator(type, validator):
+    """注册或替换某个平台的快速校验器，validator 需实现 async validate(client, cookies)"""
+    VALIDATORS[type] = validator
+
+
+async def http_check_cookie(type, account_file, client: httpx.AsyncClient = None) -> Optional[bool]:
+    """
+    不启动浏览器校验 cookie
+
+    Args:
+        client: 共用的 httpx 客户端，不传则本次新建并在结束时关闭
+
+    Returns:
+        True 有效 / False 失效 / None 无法确定（没有对应校验器或结果不明确）
+    """
+    validator = VALIDATORS.get(type)
+    if validator is None:
+        return None
+    try:
+        cookies = load_cookies(account_file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取 cookie 文件失败: {account_file}, {e}")
+        return None
+    try:
+        if client is not None:
+            return await validator.validate(client, cookies)
+        async with new_http_client() as client:
+            return await validator.validate(client, cookies)
+    except httpx.HTTPError as e:
+        logger.debug(f"HTTP 快速校验请求失败: {e}")
+        return None
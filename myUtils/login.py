@@ -7,19 +7,19 @@ from myUtils.auth import check_cookie
 from utils.base_social_media import set_init_script
 import uuid
 from pathlib import Path
-from conf import BASE_DIR, DATA_DIR, LOCAL_CHROME_HEADLESS
+from conf import BASE_DIR, DATA_DIR
+from utils.launch_profiles import get_launch_profile
 
 # 抖音登录
-async def douyin_cookie_gen(id,status_queue):
+async def douyin_cookie_gen(id,status_queue,launch_profile=None):
     url_changed_event = asyncio.Event()
     async def on_url_change():
         # 检查是否是主框架的变化
         if page.url != original_url:
             url_changed_event.set()
     async with async_playwright() as playwright:
-        options = {
-            'headless': LOCAL_CHROME_HEADLESS
-        }
+        # 启动参数和无头模式取自启动配置，见 utils/launch_profiles.py
+        options = get_launch_profile(launch_profile).launch_options()
         # Make sure to run headed.
         browser = await playwright.chromium.launch(**options)
         # Setup context however you like.
@@ -76,7 +76,7 @@ async def douyin_cookie_gen(id,status_queue):
 
 
 # 视频号登录
-async def get_tencent_cookie(id,status_queue):
+async def get_tencent_cookie(id,status_queue,launch_profile=None):
     url_changed_event = asyncio.Event()
     async def on_url_change():
         # 检查是否是主框架的变化
@@ -84,12 +84,8 @@ async def get_tencent_cookie(id,status_queue):
             url_changed_event.set()
 
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 启动参数和无头模式取自启动配置，见 utils/launch_profiles.py
+        options = get_launch_profile(launch_profile).launch_options()
         # Make sure to run headed.
         browser = await playwright.chromium.launch(**options)
         # Setup context however you like.
@@ -154,19 +150,15 @@ async def get_tencent_cookie(id,status_queue):
         status_queue.put("200")
 
 # 快手登录
-async def get_ks_cookie(id,status_queue):
+async def get_ks_cookie(id,status_queue,launch_profile=None):
     url_changed_event = asyncio.Event()
     async def on_url_change():
         # 检查是否是主框架的变化
         if page.url != original_url:
             url_changed_event.set()
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 启动参数和无头模式取自启动配置，见 utils/launch_profiles.py
+        options = get_launch_profile(launch_profile).launch_options()
         # Make sure to run headed.
         browser = await playwright.chromium.launch(**options)
         # Setup context however you like.
@@ -228,7 +220,7 @@ async def get_ks_cookie(id,status_queue):
         status_queue.put("200")
 
 # 小红书登录
-async def xiaohongshu_cookie_gen(id,status_queue):
+async def xiaohongshu_cookie_gen(id,status_queue,launch_profile=None):
     url_changed_event = asyncio.Event()
 
     async def on_url_change():
@@ -237,12 +229,8 @@ async def xiaohongshu_cookie_gen(id,status_queue):
             url_changed_event.set()
 
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 启动参数和无头模式取自启动配置，见 utils/launch_profiles.py
+        options = get_launch_profile(launch_profile).launch_options()
         # Make sure to run headed.
         browser = await playwright.chromium.launch(**options)
         # Setup context however you like.
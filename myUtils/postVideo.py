@@ -1,4 +1,3 @@
-import asyncio
 from pathlib import Path
 
 from conf import DATA_DIR
@@ -6,85 +5,107 @@ from uploader.douyin_uploader.main import DouYinVideo
 from uploader.ks_uploader.main import KSVideo
 from uploader.tencent_uploader.main import TencentVideo
 from uploader.xiaohongshu_uploader.main import XiaoHongShuVideo
+from utils.base_social_media import SOCIAL_MEDIA_XIAOHONGSHU, SOCIAL_MEDIA_TENCENT, SOCIAL_MEDIA_DOUYIN, \
+    SOCIAL_MEDIA_KUAISHOU
+from utils.browser_pool import get_browser_pool
 from utils.constant import TencentZoneTypes
-from utils.files_times import generate_schedule_time_next_day
+from utils.publish_log import publish_log
+from utils.slot_allocator import SlotAllocator
+from utils.upload_fanout import run_fan_out
 
 
-def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, is_draft=False):
+# 平台类型与 user_info.type 一致
+PLATFORM_XHS = 1
+PLATFORM_TENCENT = 2
+PLATFORM_DOUYIN = 3
+PLATFORM_KUAISHOU = 4
+PLATFORM_NAMES = {
+    PLATFORM_XHS: SOCIAL_MEDIA_XIAOHONGSHU,
+    PLATFORM_TENCENT: SOCIAL_MEDIA_TENCENT,
+    PLATFORM_DOUYIN: SOCIAL_MEDIA_DOUYIN,
+    PLATFORM_KUAISHOU: SOCIAL_MEDIA_KUAISHOU,
+}
+
+
+def create_uploader(type, file, cookie, publish_date, title, tags, category=None, is_draft=False, thumbnail_path='',
+                    productLink='', productTitle='', browser_pool=None, checkpoint=None, allow_duplicate=False):
+    """
+    按平台类型创建单个 文件 × 账号 的上传器，上传任务队列（myUtils/upload_jobs.py）也用它
+
+    checkpoint 为 utils/checkpoint.UploadCheckpoint，目前只有视频号和小红书支持从草稿继续，其它平台忽略；
+    allow_duplicate 为 True 时即使该账号发布过相同内容也重新发布（见 utils/publish_log.py）
+    """
+    if type == PLATFORM_XHS:
+        return XiaoHongShuVideo(title, file, tags, publish_date, cookie, browser_pool=browser_pool,
+                                checkpoint=checkpoint, allow_duplicate=allow_duplicate)
+    if type == PLATFORM_TENCENT:
+        return TencentVideo(title, str(file), tags, publish_date, cookie, category, is_draft, browser_pool=browser_pool,
+                            checkpoint=checkpoint, allow_duplicate=allow_duplicate)
+    if type == PLATFORM_DOUYIN:
+        return DouYinVideo(title, str(file), tags, publish_date, cookie, thumbnail_path, productLink, productTitle,
+                           browser_pool=browser_pool, allow_duplicate=allow_duplicate)
+    if type == PLATFORM_KUAISHOU:
+        return KSVideo(title, str(file), tags, publish_date, cookie, browser_pool=browser_pool,
+                       allow_duplicate=allow_duplicate)
+    raise ValueError(f"不支持的平台类型: {type}")
+
+
+def _post_video(type, title, files, tags, account_file, enableTimer=False, videos_per_day=1, daily_times=None,
+                start_days=0, use_browser_pool=True, allow_duplicate=False, **options):
+    """
+    把 文件 × 账号 的上传并发执行（见 utils/upload_fanout.py），返回每个 文件 × 账号 的结果
+
+    该账号已经发布过相同内容的 文件 × 账号 不上传，结果中 skipped 为 True；allow_duplicate 为 True 时照常上传
+
+    Returns:
+        [{"platform", "file", "account", "ok", "error", "seconds", "skipped"}, ...]
+    """
+    platform = PLATFORM_NAMES[type]
+    browser_pool = get_browser_pool() if use_browser_pool else None
     # 生成文件的完整路径
     account_file = [Path(DATA_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(DATA_DIR / "videoFile" / file) for file in files]
-    if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
-    else:
-        publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
+    # 每个账号单独排时间，同一账号两次发布满足最小间隔（见 utils/slot_allocator.py）
+    allocator = SlotAllocator(daily_times, videos_per_day, start_days) if enableTimer else None
+    apps, skipped = [], []
+    for file in files:
         for cookie in account_file:
-            print(f"文件路径{str(file)}")
+            if publish_log.already_published_sync(platform, cookie, file, allow_duplicate):
+                # 跳过的组合不占用发布时间
+                skipped.append({"platform": platform, "file": file.name, "account": cookie.name, "ok": True,
+                                "error": None, "seconds": 0, "skipped": True})
+                continue
             # 打印视频文件名、标题和 hashtag
             print(f"视频文件名：{file}")
             print(f"标题：{title}")
             print(f"Hashtag：{tags}")
-            app = TencentVideo(title, str(file), tags, publish_datetimes[index], cookie, category, is_draft)
-            asyncio.run(app.main(), debug=False)
+            publish_date = allocator.allocate(platform, cookie) if allocator else 0
+            apps.append(create_uploader(type, file, cookie, publish_date, title, tags, browser_pool=browser_pool,
+                                        allow_duplicate=allow_duplicate, **options))
+    return run_fan_out(apps, browser_pool) + skipped
+
+
+def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, is_draft=False, use_browser_pool=True, allow_duplicate=False):
+    return _post_video(PLATFORM_TENCENT, title, files, tags, account_file, enableTimer, videos_per_day, daily_times,
+                       start_days, use_browser_pool, allow_duplicate, category=category, is_draft=is_draft)
 
 
 def post_video_DouYin(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0,
                       thumbnail_path = '',
-                      productLink = '', productTitle = ''):
-    # 生成文件的完整路径
-    account_file = [Path(DATA_DIR / "cookiesFile" / file) for file in account_file]
-    files = [Path(DATA_DIR / "videoFile" / file) for file in files]
-    if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
-    else:
-        publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            print(f"文件路径{str(file)}")
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = DouYinVideo(title, str(file), tags, publish_datetimes[index], cookie, thumbnail_path, productLink, productTitle)
-            asyncio.run(app.main(), debug=False)
+                      productLink = '', productTitle = '', use_browser_pool=True, allow_duplicate=False):
+    return _post_video(PLATFORM_DOUYIN, title, files, tags, account_file, enableTimer, videos_per_day, daily_times,
+                       start_days, use_browser_pool, allow_duplicate, thumbnail_path=thumbnail_path,
+                       productLink=productLink, productTitle=productTitle)
 
 
-def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
-    # 生成文件的完整路径
-    account_file = [Path(DATA_DIR / "cookiesFile" / file) for file in account_file]
-    files = [Path(DATA_DIR / "videoFile" / file) for file in files]
-    if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(len(files), videos_per_day, daily_times,start_days)
-    else:
-        publish_datetimes = [0 for i in range(len(files))]
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            print(f"文件路径{str(file)}")
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = KSVideo(title, str(file), tags, publish_datetimes[index], cookie)
-            asyncio.run(app.main(), debug=False)
+def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, use_browser_pool=True, allow_duplicate=False):
+    return _post_video(PLATFORM_KUAISHOU, title, files, tags, account_file, enableTimer, videos_per_day, daily_times,
+                       start_days, use_browser_pool, allow_duplicate)
 
-def post_video_xhs(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
-    # 生成文件的完整路径
-    account_file = [Path(DATA_DIR / "cookiesFile" / file) for file in account_file]
-    files = [Path(DATA_DIR / "videoFile" / file) for file in files]
-    file_num = len(files)
-    if enableTimer:
-        publish_datetimes = generate_schedule_time_next_day(file_num, videos_per_day, daily_times,start_days)
-    else:
-        publish_datetimes = 0
-    for index, file in enumerate(files):
-        for cookie in account_file:
-            # 打印视频文件名、标题和 hashtag
-            print(f"视频文件名：{file}")
-            print(f"标题：{title}")
-            print(f"Hashtag：{tags}")
-            app = XiaoHongShuVideo(title, file, tags, publish_datetimes, cookie)
-            asyncio.run(app.main(), debug=False)
+
+def post_video_xhs(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, use_browser_pool=True, allow_duplicate=False):
+    return _post_video(PLATFORM_XHS, title, files, tags, account_file, enableTimer, videos_per_day, daily_times,
+                       start_days, use_browser_pool, allow_duplicate)
 
 
 
@@ -0,0 +1,507 @@
+"""
+持久化的上传任务队列
+
+/postVideo、/postVideoBatch 不再在 HTTP 请求里直接上传：每个 文件 × 账号 作为一条任务写入 upload_jobs 表，
+请求立即返回任务 ID，由 UploadJobWorker 在后台线程里逐条领取、通过浏览器池执行。
+默认启动 UPLOAD_MAX_CONCURRENCY 个线程，同一批的 文件 × 账号 同时上传，仍受 utils/upload_fanout.py 中全局和按平台的
+并发上限约束（与 fan_out 共用同一个 upload_limiter）。
+
+任务状态保存在 SQLite 中，后端重启后未完成的任务会继续执行。执行中的任务每隔 HEARTBEAT_INTERVAL 秒更新
+heartbeat_at，超过 UPLOAD_JOB_STALE_SECONDS 没有心跳的 running 任务视为所在进程已退出，重新放回队列。
+领取任务用 BEGIN IMMEDIATE 加写锁，多个 worker（包括多个进程）不会领到同一条任务。
+
+状态流转：pending -> running -> succeeded / failed / cancelled；失败且未达到 max_attempts 时回到 pending，
+从 UPLOAD_JOB_RETRY_DELAY 秒开始按指数退避（带抖动，最多 UPLOAD_JOB_RETRY_MAX_DELAY 秒）后重试；cookie 失效、
+文件不存在等重试也不会成功的错误不重试。平台熔断（见 utils/retry.py）时任务没有真正执行，不计入失败次数，熔断结束后再执行。
+视频号、小红书上传器把已完成的步骤和平台草稿地址写入 checkpoint 列（见 utils/checkpoint.py），
+重试时从草稿继续，不再重新上传整个文件；已发布的不会重复发布。
+入队时按素材内容哈希去重（见 utils/publish_log.py）：已经发布到该账号、或同一账号已有排队中的相同内容的 文件 × 账号
+不生成任务，请求带 allowDuplicate 时不检查。
+
+本地定时发布：请求带 localSchedule（或平台在 UPLOAD_LOCAL_SCHEDULE_PLATFORMS 中）且开启定时时，不再操作平台的定时发布控件，
+而是把发布时间写入 scheduled_at、上传时直接发布，由 myUtils/upload_scheduler.py 在到点时派发。
+"""
+import concurrent.futures
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from conf import DATA_DIR, UPLOAD_JOB_WORKERS, UPLOAD_JOB_POLL_INTERVAL, UPLOAD_JOB_MAX_ATTEMPTS, \
+    UPLOAD_JOB_RETRY_DELAY, UPLOAD_JOB_RETRY_MAX_DELAY, UPLOAD_JOB_STALE_SECONDS, UPLOAD_LOCAL_SCHEDULE_PLATFORMS, \
+    SCHEDULE_MAX_DAYS, UPLOAD_MAX_CONCURRENCY
+from myUtils.postVideo import create_uploader, PLATFORM_XHS, PLATFORM_TENCENT, PLATFORM_DOUYIN, PLATFORM_KUAISHOU, \
+    PLATFORM_NAMES
+from utils.browser_pool import get_browser_pool
+from utils.checkpoint import UploadCheckpoint
+from utils.publish_log import publish_log
+from utils.slot_allocator import SlotAllocator
+from utils.retry import RetryPolicy, CircuitOpenError, is_retryable
+from utils.upload_fanout import upload_limiter
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(DATA_DIR / "db" / "database.db")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+PLATFORM_TYPES = (PLATFORM_XHS, PLATFORM_TENCENT, PLATFORM_DOUYIN, PLATFORM_KUAISHOU)
+
+# 执行中的任务多久更新一次心跳、检查一次取消请求（秒）
+HEARTBEAT_INTERVAL = 5
+# 取消任务后最多等上传器收尾（保存失败现场、归还浏览器）多少秒
+CANCEL_CLEANUP_TIMEOUT = 60
+
+
+async def _run_limited(app, finished: threading.Event = None):
+    try:
+        async with upload_limiter.slot(app.tracer.platform, app.tracer.account):
+            await app.main()
+    finally:
+        # future.cancel() 在协程收尾之前就返回，调用方通过 finished 等上传器归还浏览器
+        if finished is not None:
+            finished.set()
+
+
+def _now() -> str:
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+@contextmanager
+def _connect(immediate: bool = False):
+    """自动提交并关闭的连接；immediate=True 时开启写事务，用于领取任务这类先读后写的操作"""
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def job_to_dict(row) -> dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["checkpoint"] = json.loads(job["checkpoint"]) if job.get("checkpoint") else None
+    return job
+
+
+def booked_publish_times(conn, type: int, since: datetime) -> list:
+    """同一平台未失败、未取消的任务已经预定的发布时间：[(account_file, datetime)]"""
+    rows = conn.execute('''
+        SELECT account_file, scheduled_at, payload FROM upload_jobs
+        WHERE type = ? AND status IN (?, ?, ?) AND created_at >= ?
+    ''', (type, JOB_PENDING, JOB_RUNNING, JOB_SUCCEEDED,
+          (since - timedelta(days=SCHEDULE_MAX_DAYS)).strftime(TIME_FORMAT)))
+    booked = []
+    for row in rows:
+        publish_at = row["scheduled_at"] or json.loads(row["payload"]).get("publish_date")
+        if publish_at:
+            publish_at = datetime.strptime(publish_at, TIME_FORMAT)
+            if publish_at >= since:
+                booked.append((row["account_file"], publish_at))
+    return booked
+
+
+def content_hashes(file_list: list) -> dict:
+    """{文件: 内容哈希}，文件不存在时为 None（不去重，执行时再报错）"""
+    hashes = {}
+    for file in file_list:
+        try:
+            hashes[file] = publish_log.content_hash(Path(DATA_DIR / "videoFile" / file))
+        except OSError as e:
+            logger.warning(f"无法计算 {file} 的内容哈希，不做去重: {e}")
+            hashes[file] = None
+    return hashes
+
+
+def duplicate_pairs(conn, type: int, hashes: dict, account_list: list) -> dict:
+    """已经发布过、或已有排队中任务的 文件 × 账号：{(文件, 账号): 原因}"""
+    platform = PLATFORM_NAMES[type]
+    accounts = set(account_list)
+    duplicates = {}
+    for file, content_hash in hashes.items():
+        if content_hash is None:
+            continue
+        for row in conn.execute("SELECT account, published_at FROM publish_log WHERE content_hash = ? AND platform = ?",
+                                (content_hash, platform)):
+            if row["account"] in accounts:
+                duplicates[(file, row["account"])] = f"已于 {row['published_at']} 发布过相同内容"
+        for row in conn.execute('''
+            SELECT id, account_file FROM upload_jobs WHERE content_hash = ? AND type = ? AND status IN (?, ?)
+        ''', (content_hash, type, JOB_PENDING, JOB_RUNNING)):
+            if row["account_file"] in accounts:
+                duplicates.setdefault((file, row["account_file"]), f"相同内容已有排队中的任务 {row['id']}")
+    return duplicates
+
+
+def allocate_publish_dates(conn, type: int, file_list: list, account_list: list, data: dict,
+                           skip: dict = None) -> list:
+    """为 文件 × 账号 分配发布时间（跳过 skip 中的组合），返回 [(文件, 账号, 发布时间字符串)]"""
+    platform = PLATFORM_NAMES[type]
+    skip = skip or {}
+    allocator = SlotAllocator(data.get('dailyTimes'), data.get('videosPerDay') or 1, data.get('startDays') or 0)
+    for account, publish_at in booked_publish_times(conn, type, allocator.now):
+        allocator.book(platform, account, publish_at)
+    if data.get('spreadAccounts'):
+        # 每个文件只发一个账号：已经发到其中任意一个账号的文件不再分配
+        file_list = [file for file in file_list if not any((file, account) in skip for account in account_list)]
+        assigned = allocator.allocate_batch(platform, account_list, len(file_list), spread=True)
+        return [(file, account, publish_at.strftime(TIME_FORMAT))
+                for file, (account, publish_at) in zip(file_list, assigned)]
+    # 与 allocate_batch 的顺序一致，跳过的组合不占用发布时间
+    return [(file, account, allocator.allocate(platform, account).strftime(TIME_FORMAT))
+            for file in file_list for account in account_list if (file, account) not in skip]
+
+
+def validate_post_video(data) -> None:
+    """检查一次发布请求，不合法时抛出 ValueError；/postVideoBatch 在写入任何一批之前先检查全部"""
+    if not isinstance(data, dict):
+        raise ValueError("每一批发布请求应为 JSON 对象")
+    if data.get('type') not in PLATFORM_TYPES:
+        raise ValueError(f"不支持的平台类型: {data.get('type')}")
+    for key in ('fileList', 'accountList'):
+        if not isinstance(data.get(key) or [], list):
+            raise ValueError(f"{key} 应为数组")
+
+
+def enqueue_post_video(data: dict, max_attempts: int = UPLOAD_JOB_MAX_ATTEMPTS) -> dict:
+    """
+    把一次发布请求（/postVideo 的 JSON）拆成 文件 × 账号 的任务写入队列
+
+    开启定时时由 utils/slot_allocator.py 避开同一平台、同一账号已经预定的时间，为每个 文件 × 账号 分配发布时间；
+    spreadAccounts 为 true 时每个文件只发一个账号，轮流分给最早有空闲时间的账号。
+    定时默认由平台定时发布；localSchedule 为 true（或平台在 UPLOAD_LOCAL_SCHEDULE_PLATFORMS 中）时改为本地定时：
+    发布时间写入 scheduled_at，到点由调度器派发并立即发布。
+    已经发布过、或已有排队中任务的相同内容 × 账号跳过，allowDuplicate 为 true 时不检查
+
+    Returns:
+        {"batchId": ..., "jobIds": [...], "skipped": [{"file", "account", "reason"}, ...]}
+    """
+    validate_post_video(data)
+    type = data.get('type')
+    file_list = data.get('fileList') or []
+    account_list = data.get('accountList') or []
+    local_schedule = bool(data.get('enableTimer')) and bool(
+        data.get('localSchedule', PLATFORM_NAMES[type] in UPLOAD_LOCAL_SCHEDULE_PLATFORMS))
+    options = {
+        "title": data.get('title'),
+        "tags": data.get('tags'),
+        "category": data.get('category') or None,  # 0 表示不设置分类
+        "is_draft": data.get('isDraft', False),
+        "thumbnail_path": data.get('thumbnail', ''),
+        "productLink": data.get('productLink', ''),
+        "productTitle": data.get('productTitle', ''),
+        "allow_duplicate": bool(data.get('allowDuplicate')),
+    }
+    # 哈希在写事务之外计算：素材记录里没有哈希时要读整个文件
+    hashes = content_hashes(file_list)
+
+    batch_id = uuid.uuid4().hex
+    now = _now()
+    job_ids, scheduled = [], []
+    # 读取已预定的时间、分配、写入放在同一个写事务里，同时提交的两批任务不会分到同一个时间
+    # 查重也在同一个事务里，连点两次提交的第二批会看到第一批的任务
+    with _connect(immediate=True) as conn:
+        skip = {} if options["allow_duplicate"] else duplicate_pairs(conn, type, hashes, account_list)
+        if data.get('enableTimer'):
+            pairs = allocate_publish_dates(conn, type, file_list, account_list, data, skip)
+        else:
+            pairs = [(file, account, 0) for file in file_list for account in account_list
+                     if (file, account) not in skip]
+        for file, account, publish_date in pairs:
+            scheduled_at = publish_date if local_schedule else None
+            payload = json.dumps({**options, "publish_date": 0 if local_schedule else publish_date},
+                                 ensure_ascii=False)
+            cursor = conn.execute('''
+                INSERT INTO upload_jobs (batch_id, type, file_path, account_file, payload, max_attempts,
+                                         scheduled_at, content_hash, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (batch_id, type, file, account, payload, max(max_attempts, 1), scheduled_at, hashes[file], now,
+                  now))
+            job_ids.append(cursor.lastrowid)
+            if scheduled_at:
+                scheduled.append((cursor.lastrowid, scheduled_at))
+    skipped = [{"file": file, "account": account, "reason": reason} for (file, account), reason in skip.items()]
+    for item in skipped:
+        logger.warning(f"跳过重复发布 {item['file']} -> {item['account']}: {item['reason']}")
+    logger.info(f"已创建上传任务 batch={batch_id} jobs={job_ids}")
+    if _scheduler is not None:
+        for job_id, scheduled_at in scheduled:
+            _scheduler.notify(job_id, scheduled_at)
+    return {"batchId": batch_id, "jobIds": job_ids, "skipped": skipped}
+
+
+def get_job(job_id: int) -> Optional[dict]:
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+    return job_to_dict(row) if row else None
+
+
+def list_jobs(status: str = None, batch_id: str = None, limit: int = 100) -> list:
+    conditions, params = [], []
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if batch_id:
+        conditions.append("batch_id = ?")
+        params.append(batch_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with _connect() as conn:
+        rows = conn.execute(f"SELECT * FROM upload_jobs {where} ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+    return [job_to_dict(row) for row in rows]
+
+
+def cancel_job(job_id: int) -> Optional[dict]:
+    """排队中的任务直接取消；执行中的任务标记 cancel_requested，由 worker 中止上传；已结束的任务不变"""
+    now = _now()
+    with _connect(immediate=True) as conn:
+        conn.execute("UPDATE upload_jobs SET status = ?, finished_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                     (JOB_CANCELLED, now, now, job_id, JOB_PENDING))
+        conn.execute("UPDATE upload_jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = ?",
+                     (now, job_id, JOB_RUNNING))
+    return get_job(job_id)
+
+
+def retry_job(job_id: int) -> Optional[dict]:
+    """失败或已取消的任务重新排队，执行次数从头计算"""
+    now = _now()
+    with _connect(immediate=True) as conn:
+        conn.execute('''
+            UPDATE upload_jobs
+            SET status = ?, attempts = 0, error = NULL, cancel_requested = 0, run_after = NULL, worker = NULL,
+                started_at = NULL, finished_at = NULL, updated_at = ?
+            WHERE id = ? AND status IN (?, ?)
+        ''', (JOB_PENDING, now, job_id, JOB_FAILED, JOB_CANCELLED))
+    return get_job(job_id)
+
+
+def requeue_stale_jobs(stale_seconds: float = UPLOAD_JOB_STALE_SECONDS) -> int:
+    """把心跳超时的 running 任务放回队列（所在进程已退出），返回放回的数量"""
+    deadline = (datetime.now() - timedelta(seconds=stale_seconds)).strftime(TIME_FORMAT)
+    with _connect(immediate=True) as conn:
+        cursor = conn.execute('''
+            UPDATE upload_jobs SET status = ?, worker = NULL, updated_at = ?
+            WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+        ''', (JOB_PENDING, _now(), JOB_RUNNING, deadline))
+    if cursor.rowcount:
+        logger.warning(f"{cursor.rowcount} 个上传任务的执行进程已退出，重新排队")
+    return cursor.rowcount
+
+
+def claim_job(worker: str, job_id: int = None) -> Optional[dict]:
+    """
+    领取一条可以执行的任务并标记为 running
+
+    不指定 job_id 时按 ID 顺序领取，本地定时的任务到了 scheduled_at 才会被领取；
+    调度器到点派发时指定 job_id，可以比 scheduled_at 略早领取
+    """
+    now = _now()
+    with _connect(immediate=True) as conn:
+        if job_id is None:
+            row = conn.execute('''
+                SELECT id FROM upload_jobs
+                WHERE status = ? AND (run_after IS NULL OR run_after <= ?) AND (scheduled_at IS NULL OR scheduled_at <= ?)
+                ORDER BY id LIMIT 1
+            ''', (JOB_PENDING, now, now)).fetchone()
+        else:
+            row = conn.execute('''
+                SELECT id FROM upload_jobs WHERE id = ? AND status = ? AND (run_after IS NULL OR run_after <= ?)
+            ''', (job_id, JOB_PENDING, now)).fetchone()
+        if row is None:
+            return None
+        conn.execute('''
+            UPDATE upload_jobs
+            SET status = ?, attempts = attempts + 1, worker = ?, started_at = ?, heartbeat_at = ?, updated_at = ?
+            WHERE id = ?
+        ''', (JOB_RUNNING, worker, now, now, now, row["id"]))
+        job = conn.execute("SELECT * FROM upload_jobs WHERE id = ?", (row["id"],)).fetchone()
+    return job_to_dict(job)
+
+
+def skip_missed_job(job_id: int) -> bool:
+    """不补发错过发布时间的定时任务时，把它标记为已取消（之后可以用 retry_job 重新排队）"""
+    now = _now()
+    with _connect(immediate=True) as conn:
+        cursor = conn.execute('''
+            UPDATE upload_jobs SET status = ?, error = ?, finished_at = ?, updated_at = ?
+            WHERE id = ? AND status = ?
+        ''', (JOB_CANCELLED, "错过定时发布时间", now, now, job_id, JOB_PENDING))
+    return cursor.rowcount > 0
+
+
+def heartbeat(job_id: int) -> bool:
+    """更新心跳，返回任务是否被请求取消"""
+    now = _now()
+    with _connect() as conn:
+        conn.execute("UPDATE upload_jobs SET heartbeat_at = ?, updated_at = ? WHERE id = ?", (now, now, job_id))
+        row = conn.execute("SELECT cancel_requested FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+    return bool(row and row["cancel_requested"])
+
+
+def save_checkpoint(job_id: int, checkpoint: dict):
+    """上传器每完成一步调用一次（在浏览器池的线程池中执行）"""
+    with _connect() as conn:
+        conn.execute("UPDATE upload_jobs SET checkpoint = ?, updated_at = ? WHERE id = ?",
+                     (json.dumps(checkpoint, ensure_ascii=False), _now(), job_id))
+
+
+# 任务失败后的重试间隔
+JOB_RETRY = RetryPolicy(base_delay=UPLOAD_JOB_RETRY_DELAY, max_delay=UPLOAD_JOB_RETRY_MAX_DELAY, jitter=0.5)
+
+
+def finish_job(job: dict, error: Optional[BaseException] = None, cancelled: bool = False):
+    now = _now()
+    attempts = job["attempts"]
+    if cancelled:
+        status, run_after, message = JOB_CANCELLED, None, "任务已取消"
+    elif error is None:
+        status, run_after, message = JOB_SUCCEEDED, None, None
+    else:
+        message = f"{type(error).__name__}: {error}"
+        if isinstance(error, CircuitOpenError):
+            # 平台熔断，没有启动浏览器：不算一次执行，熔断结束后再领取。
+            # 至少保留 1 次，避免定时调度器把它当成还没执行过的定时任务重新派发
+            status = JOB_PENDING
+            run_after = datetime.fromtimestamp(error.retry_at).strftime(TIME_FORMAT)
+            attempts = max(attempts - 1, 1)
+        elif attempts < job["max_attempts"] and is_retryable(error):
+            status = JOB_PENDING
+            run_after = (datetime.now() + timedelta(seconds=JOB_RETRY.delay(attempts))).strftime(TIME_FORMAT)
+        else:
+            # cookie 失效需要重新登录、文件不存在等，重试也不会成功
+            status, run_after = JOB_FAILED, None
+    with _connect() as conn:
+        conn.execute('''
+            UPDATE upload_jobs
+            SET status = ?, error = ?, run_after = ?, attempts = ?, worker = NULL, cancel_requested = 0,
+                updated_at = ?, finished_at = ?
+            WHERE id = ?
+        ''', (status, message, run_after, attempts, now, now if status in FINISHED_STATUSES else None, job["id"]))
+    return status
+
+
+class UploadJobWorker(object):
+    def __init__(self, workers: int = UPLOAD_JOB_WORKERS, poll_interval: float = UPLOAD_JOB_POLL_INTERVAL,
+                 browser_pool=None):
+        # 每个线程同一时间只执行一个任务，线程数就是任务队列能达到的最大并发
+        self.workers = max(workers or UPLOAD_MAX_CONCURRENCY, 1)
+        self.poll_interval = poll_interval
+        self.browser_pool = browser_pool
+        self.name = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        self.browser_pool = self.browser_pool or get_browser_pool()
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(f"{self.name}-{index}",), name=f"upload-job-{index}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"上传任务 worker 已启动，线程数 {self.workers}")
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, worker: str):
+        while not self._stop.is_set():
+            try:
+                requeue_stale_jobs()
+                job = claim_job(worker)
+            except sqlite3.Error as e:
+                logger.error(f"读取上传任务失败: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.execute(job)
+
+    def execute(self, job: dict) -> str:
+        payload = job["payload"]
+        publish_date = payload.pop("publish_date")
+        if publish_date:
+            publish_date = datetime.strptime(publish_date, TIME_FORMAT)
+        logger.info(f"开始执行上传任务 {job['id']}（第 {job['attempts']} 次）: {job['file_path']} -> {job['account_file']}")
+        checkpoint = UploadCheckpoint(job.get("checkpoint"), save=lambda data: save_checkpoint(job["id"], data))
+        if checkpoint.resumable:
+            logger.info(f"上传任务 {job['id']} 从平台草稿继续: {checkpoint.draft_url}")
+        error, cancelled = None, False
+        try:
+            app = create_uploader(job["type"], Path(DATA_DIR / "videoFile" / job["file_path"]),
+                                  Path(DATA_DIR / "cookiesFile" / job["account_file"]), publish_date,
+                                  browser_pool=self.browser_pool, checkpoint=checkpoint, **payload)
+            finished = threading.Event()
+            future = self.browser_pool.submit(_run_limited(app, finished))
+            while not future.done():
+                concurrent.futures.wait([future], timeout=HEARTBEAT_INTERVAL)
+                if not future.done() and heartbeat(job["id"]) and future.cancel():
+                    logger.info(f"上传任务 {job['id']} 被取消，正在中止")
+                    # 等上传器在 finally 里关闭浏览器上下文，再把任务标记为已取消；还没开始执行的协程不会收尾，等到超时
+                    if not finished.wait(CANCEL_CLEANUP_TIMEOUT):
+                        logger.warning(f"上传任务 {job['id']} 在 {CANCEL_CLEANUP_TIMEOUT} 秒内没有完成收尾")
+            future.result()
+        except concurrent.futures.CancelledError:
+            cancelled = True
+        except Exception as e:
+            error = e
+        status = finish_job(job, error, cancelled)
+        if error is not None:
+            logger.error(f"上传任务 {job['id']} 失败（{status}）: {error}")
+        else:
+            logger.info(f"上传任务 {job['id']} {status}")
+        return status
+
+
+_worker: Optional[UploadJobWorker] = None
+_scheduler = None  # myUtils/upload_scheduler.UploadScheduler，新建的本地定时任务直接通知它
+_worker_lock = threading.Lock()
+
+
+def start_upload_worker() -> UploadJobWorker:
+    """启动进程内共用的上传任务 worker 和本地定时调度器（后端启动时调用）"""
+    # 调度器依赖本模块，延迟导入
+    from myUtils.upload_scheduler import UploadScheduler
+    global _worker, _scheduler
+    with _worker_lock:
+        if _worker is None:
+            _worker = UploadJobWorker(browser_pool=get_browser_pool())
+            _scheduler = UploadScheduler(_worker)
+        # 先启动调度器：停机期间错过的定时任务要先按 UPLOAD_SCHEDULER_CATCH_UP 处理，再让 worker 领取
+        _scheduler.start()
+        _worker.start()
+        return _worker
+
+
+def scheduler_snapshot() -> Optional[dict]:
+    """本进程调度器的定时器数量、下一个到期时间和派发计数，没有启动时返回 None"""
+    return _scheduler.snapshot() if _scheduler is not None else None
+
+
+if __name__ == '__main__':
+    # 单独运行 worker：python -m myUtils.upload_jobs
+    logging.basicConfig(level=logging.INFO)
+    start_upload_worker()
+    threading.Event().wait()
@@ -0,0 +1,186 @@
+"""
+本地定时发布调度器
+
+本地定时的上传任务（upload_jobs.scheduled_at 不为空，见 myUtils/upload_jobs.py）不依赖平台的定时发布控件，
+到点由这里派发：提前 UPLOAD_SCHEDULER_LEAD 秒领取任务并交给 UploadJobWorker.execute 上传、直接发布。
+调度器只负责第一次执行，失败后的重试和遗留任务仍由普通 worker 按 run_after 领取。
+
+调度器不轮询数据库：内存里用最小堆保存未来 UPLOAD_SCHEDULER_LOOKAHEAD 秒内到期的任务（最多 UPLOAD_SCHEDULER_MAX_TIMERS 个），
+线程睡到最近一个任务到期或窗口结束时才醒来；窗口结束时再从数据库加载下一个窗口。本进程新建的定时任务由
+enqueue_post_video 直接通知调度器，其它进程新建的任务在下一次加载窗口时读到（到点后普通 worker 也会领取，不会漏发）。
+
+启动时 scheduled_at 已经过去的任务视为停机期间错过的：UPLOAD_SCHEDULER_CATCH_UP 为 True 时按原定顺序立即补发
+（同时上传的数量和频率仍受 utils/upload_fanout.py、utils/rate_limit.py 约束），否则标记为已取消。
+"""
+import heapq
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from conf import UPLOAD_SCHEDULER_LOOKAHEAD, UPLOAD_SCHEDULER_MAX_TIMERS, UPLOAD_SCHEDULER_LEAD, \
+    UPLOAD_SCHEDULER_CATCH_UP, UPLOAD_MAX_CONCURRENCY
+from myUtils.upload_jobs import UploadJobWorker, JOB_PENDING, TIME_FORMAT, _connect, claim_job, skip_missed_job
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(value: str) -> float:
+    return datetime.strptime(value, TIME_FORMAT).timestamp()
+
+
+def _format(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).strftime(TIME_FORMAT) if timestamp else None
+
+
+def load_scheduled_jobs(until: str, limit: int) -> list:
+    """读取 scheduled_at 不晚于 until、还没有执行过的定时任务：[(id, scheduled_at)]，按时间排序"""
+    with _connect() as conn:
+        rows = conn.execute('''
+            SELECT id, scheduled_at FROM upload_jobs
+            WHERE status = ? AND attempts = 0 AND scheduled_at IS NOT NULL AND scheduled_at <= ?
+            ORDER BY scheduled_at, id LIMIT ?
+        ''', (JOB_PENDING, until, limit)).fetchall()
+    return [(row["id"], row["scheduled_at"]) for row in rows]
+
+
+class UploadScheduler(object):
+    def __init__(self, worker: UploadJobWorker, lookahead: float = UPLOAD_SCHEDULER_LOOKAHEAD,
+                 max_timers: int = UPLOAD_SCHEDULER_MAX_TIMERS, lead: float = UPLOAD_SCHEDULER_LEAD,
+                 catch_up: bool = UPLOAD_SCHEDULER_CATCH_UP):
+        self.worker = worker
+        self.lookahead = max(lookahead, 1)
+        self.max_timers = max(max_timers, 1)
+        self.lead = max(lead, 0)
+        self.catch_up = catch_up
+        self.name = f"{worker.name}-scheduler"
+        self.stats = {"dispatched": 0, "caught_up": 0, "skipped": 0, "stale": 0}
+        self._heap = []  # (到期时间戳, 任务 ID)
+        self._queued = set()
+        self._window_end = 0.0  # 堆里已经包含了这个时间之前到期的全部任务
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=max(UPLOAD_MAX_CONCURRENCY, 1),
+                                            thread_name_prefix="upload-scheduled")
+        self._handle_missed()
+        self._thread = threading.Thread(target=self._run, name="upload-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"本地定时调度器已启动，窗口 {self.lookahead} 秒，提前 {self.lead} 秒派发")
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def notify(self, job_id: int, scheduled_at: str):
+        """新建或重新排队的定时任务：落在当前窗口内时加入堆并唤醒调度线程，窗口外的等加载下一个窗口时读取"""
+        due = _timestamp(scheduled_at)
+        with self._condition:
+            if due > self._window_end or job_id in self._queued:
+                return
+            self._push(due, job_id)
+            self._condition.notify_all()
+
+    def _push(self, due: float, job_id: int):
+        heapq.heappush(self._heap, (due, job_id))
+        self._queued.add(job_id)
+
+    def _handle_missed(self):
+        """
+        启动时处理停机期间错过的定时任务
+
+        补发的任务不在这里派发：调度线程加载第一个窗口时它们按原定顺序排在堆顶、立即到期
+        """
+        while True:
+            missed = load_scheduled_jobs(datetime.now().strftime(TIME_FORMAT), self.max_timers)
+            for job_id, scheduled_at in missed:
+                if self.catch_up:
+                    logger.warning(f"定时任务 {job_id} 错过了发布时间 {scheduled_at}，立即补发")
+                    self.stats["caught_up"] += 1
+                elif skip_missed_job(job_id):
+                    logger.warning(f"定时任务 {job_id} 错过了发布时间 {scheduled_at}，已取消")
+                    self.stats["skipped"] += 1
+            if self.catch_up or len(missed) < self.max_timers:
+                return
+
+    def _load_window(self, now: float):
+        """加载 [现在, 现在 + lookahead] 内到期的任务；达到 max_timers 时窗口缩短到最后一个任务"""
+        window_end = now + self.lookahead
+        try:
+            jobs = load_scheduled_jobs(_format(window_end), self.max_timers)
+        except sqlite3.Error as e:
+            logger.error(f"读取定时任务失败: {e}")
+            self._window_end = now + min(self.lookahead, 60)
+            return
+        if len(jobs) >= self.max_timers:
+            window_end = _timestamp(jobs[-1][1])
+        self._heap = [item for item in self._heap if item[0] <= window_end]
+        heapq.heapify(self._heap)
+        self._queued = {job_id for _, job_id in self._heap}
+        for job_id, scheduled_at in jobs:
+            if job_id not in self._queued:
+                self._push(_timestamp(scheduled_at), job_id)
+        self._window_end = window_end
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._condition:
+                now = time.time()
+                if now >= self._window_end:
+                    self._load_window(now)
+                due = []
+                while self._heap and self._heap[0][0] - self.lead <= now:
+                    _, job_id = heapq.heappop(self._heap)
+                    self._queued.discard(job_id)
+                    due.append(job_id)
+                if not due:
+                    wake_at = min(self._heap[0][0] - self.lead, self._window_end) if self._heap else self._window_end
+                    self._condition.wait(max(wake_at - now, 0.01))
+                    continue
+            for job_id in due:
+                self._dispatch(job_id)
+
+    def _dispatch(self, job_id: int):
+        # 在执行线程里才领取任务：排队等线程的任务仍是 pending，不会因为没有心跳被当成遗留任务
+        self._executor.submit(self._execute, job_id)
+
+    def _execute(self, job_id: int):
+        try:
+            job = claim_job(self.name, job_id)
+        except sqlite3.Error as e:
+            logger.error(f"领取定时任务 {job_id} 失败: {e}")
+            return
+        if job is None:
+            # 已被取消、已被其它 worker 领取，或正在等待失败重试
+            self.stats["stale"] += 1
+            return
+        self.stats["dispatched"] += 1
+        logger.info(f"定时任务 {job_id} 到达发布时间 {job['scheduled_at']}，开始上传")
+        self.worker.execute(job)
+
+    def snapshot(self) -> dict:
+        with self._condition:
+            next_due = self._heap[0][0] if self._heap else None
+            return {
+                **self.stats,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "timers": len(self._heap),
+                "next_due": _format(next_due),
+                "window_end": _format(self._window_end),
+            }
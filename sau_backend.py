@@ -1,4 +1,5 @@
 import asyncio
+import json
 import os
 import sys
 import sqlite3
@@ -11,11 +12,20 @@ from datetime import datetime
 from pathlib import Path
 from queue import Queue
 from flask_cors import CORS
-from myUtils.auth import check_cookie
+from myUtils.cookie_cache import load_accounts, split_by_freshness, validate_accounts, revalidate_in_background, \
+    invalidate as invalidate_cookie_cache
+from db.createTable import init_db
+from utils.upload_progress import subscribe as subscribe_upload_progress, \
+    unsubscribe as unsubscribe_upload_progress, upload_metrics
+from utils.tracing import phase_stats
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import save_stream, file_sha256
+from utils.retry import circuit_breakers
 from flask import Flask, request, jsonify, Response, render_template, send_from_directory
 from conf import BASE_DIR, DATA_DIR
 from myUtils.login import get_tencent_cookie, douyin_cookie_gen, get_ks_cookie, xiaohongshu_cookie_gen
-from myUtils.postVideo import post_video_tencent, post_video_DouYin, post_video_ks, post_video_xhs
+from myUtils.upload_jobs import enqueue_post_video, validate_post_video, get_job, list_jobs, cancel_job, retry_job, start_upload_worker, \
+    scheduler_snapshot
 
 # ============ 日志配置 ============
 def setup_logging():
@@ -212,15 +222,15 @@ def upload_save():
         final_filename = f"{uuid_v1}_{filename}"
         filepath = Path(DATA_DIR / "videoFile" / f"{uuid_v1}_{filename}")
 
-        # 保存文件
-        file.save(filepath)
+        # 保存文件，同时计算内容哈希，发布时用于去重（见 utils/publish_log.py）
+        filesize, content_hash = save_stream(file.stream, filepath)
 
         with sqlite3.connect(Path(DATA_DIR / "db" / "database.db")) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                                INSERT INTO file_records (filename, filesize, file_path)
-            VALUES (?, ?, ?)
-                                ''', (filename, round(float(os.path.getsize(filepath)) / (1024 * 1024),2), final_filename))
+                                INSERT INTO file_records (filename, filesize, file_path, content_hash)
+            VALUES (?, ?, ?, ?)
+                                ''', (filename, round(float(filesize) / (1024 * 1024),2), final_filename, content_hash))
             conn.commit()
             print("✅ 上传文件已记录")
 
@@ -317,44 +327,34 @@ def getAccounts():
 
 @app.route("/getValidAccounts", methods=['GET'])
 async def getValidAccounts():
-    """获取所有账号信息，并验证cookie有效性"""
-    logger.info("API 调用: getValidAccounts")
+    """获取所有账号信息，并验证cookie有效性（TTL 内校验过的账号直接返回缓存结果，force=1 强制全部重新校验）"""
+    force = request.args.get('force') == '1'
+    logger.info(f"API 调用: getValidAccounts, force={force}")
     try:
         db_path = Path(DATA_DIR / "db" / "database.db")
         logger.debug(f"数据库路径: {db_path}, 存在: {db_path.exists()}")
-        
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''SELECT * FROM user_info''')
-            rows = cursor.fetchall()
-            rows_list = [list(row) for row in rows]
-            
-            logger.info(f"查询到 {len(rows_list)} 个账号，开始验证 cookie...")
-            
-            for i, row in enumerate(rows_list):
-                try:
-                    logger.debug(f"验证账号 [{i+1}/{len(rows_list)}]: type={row[1]}, cookie_file={row[2]}")
-                    flag = await check_cookie(row[1], row[2])
-                    if not flag:
-                        row[4] = 0
-                        cursor.execute('''
-                        UPDATE user_info 
-                        SET status = ? 
-                        WHERE id = ?
-                        ''', (0, row[0]))
-                        conn.commit()
-                        logger.info(f"账号 {row[0]} cookie 已失效，状态已更新")
-                except Exception as cookie_error:
-                    logger.warning(f"验证账号 {row[0]} cookie 时出错: {str(cookie_error)}")
-                    # 继续处理其他账号
-            
-            logger.info(f"getValidAccounts 完成，返回 {len(rows_list)} 条记录")
-            return jsonify({
-                "code": 200,
-                "msg": None,
-                "data": rows_list
-            }), 200
-            
+
+        rows_list = load_accounts()
+        if force:
+            fresh, expiring, stale = [], [], rows_list
+        else:
+            fresh, expiring, stale = split_by_freshness(rows_list)
+
+        logger.info(f"查询到 {len(rows_list)} 个账号，缓存命中 {len(fresh) + len(expiring)} 个，"
+                    f"开始验证 {len(stale)} 个账号的 cookie...")
+
+        # 并发验证，需要浏览器的账号共用一个浏览器实例，结果在一个事务中写回
+        await validate_accounts(stale)
+        # 即将过期的账号先返回缓存结果，后台刷新
+        revalidate_in_background(expiring)
+
+        logger.info(f"getValidAccounts 完成，返回 {len(rows_list)} 条记录")
+        return jsonify({
+            "code": 200,
+            "msg": None,
+            "data": rows_list
+        }), 200
+
     except Exception as e:
         error_msg = f"获取有效账号列表失败: {str(e)}"
         logger.error(error_msg)
@@ -497,47 +497,17 @@ def login():
 def postVideo():
     # 获取JSON数据
     data = request.get_json()
-
-    # 从JSON数据中提取fileList和accountList
-    file_list = data.get('fileList', [])
-    account_list = data.get('accountList', [])
-    type = data.get('type')
-    title = data.get('title')
-    tags = data.get('tags')
-    category = data.get('category')
-    enableTimer = data.get('enableTimer')
-    if category == 0:
-        category = None
-    productLink = data.get('productLink', '')
-    productTitle = data.get('productTitle', '')
-    thumbnail_path = data.get('thumbnail', '')
-    is_draft = data.get('isDraft', False)  # 新增参数：是否保存为草稿
-
-    videos_per_day = data.get('videosPerDay')
-    daily_times = data.get('dailyTimes')
-    start_days = data.get('startDays')
-    # 打印获取到的数据（仅作为示例）
-    print("File List:", file_list)
-    print("Account List:", account_list)
-    match type:
-        case 1:
-            post_video_xhs(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                               start_days)
-        case 2:
-            post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                               start_days, is_draft)
-        case 3:
-            post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                      start_days, thumbnail_path, productLink, productTitle)
-        case 4:
-            post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                      start_days)
+    # 每个 文件 × 账号 写入一条上传任务，由后台 worker 执行，这里立即返回任务 ID（见 myUtils/upload_jobs.py）
+    try:
+        result = enqueue_post_video(data)
+    except ValueError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
     # 返回响应给客户端
     return jsonify(
         {
             "code": 200,
             "msg": None,
-            "data": None
+            "data": result
         }), 200
 
 
@@ -584,46 +554,65 @@ def postVideoBatch():
 
     if not isinstance(data_list, list):
         return jsonify({"error": "Expected a JSON array"}), 400
-    for data in data_list:
-        # 从JSON数据中提取fileList和accountList
-        file_list = data.get('fileList', [])
-        account_list = data.get('accountList', [])
-        type = data.get('type')
-        title = data.get('title')
-        tags = data.get('tags')
-        category = data.get('category')
-        enableTimer = data.get('enableTimer')
-        if category == 0:
-            category = None
-        productLink = data.get('productLink', '')
-        productTitle = data.get('productTitle', '')
-
-        videos_per_day = data.get('videosPerDay')
-        daily_times = data.get('dailyTimes')
-        start_days = data.get('startDays')
-        # 打印获取到的数据（仅作为示例）
-        print("File List:", file_list)
-        print("Account List:", account_list)
-        match type:
-            case 1:
-                return
-            case 2:
-                post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                                   start_days)
-            case 3:
-                post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days, productLink, productTitle)
-            case 4:
-                post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days)
+    # 先检查全部批次，有一批不合法时一批都不写入，避免前面的批次已经排队、客户端却收到 400 后整体重试
+    for index, data in enumerate(data_list):
+        try:
+            validate_post_video(data)
+        except ValueError as e:
+            return jsonify({"code": 400, "msg": f"第 {index + 1} 批: {e}", "data": None}), 400
+    batches = [enqueue_post_video(data) for data in data_list]
+    logger.info(f"批量发布 {len(batches)} 批，共 {sum(len(batch['jobIds']) for batch in batches)} 个上传任务")
     # 返回响应给客户端
     return jsonify(
         {
             "code": 200,
             "msg": None,
-            "data": None
+            "data": {
+                "batches": batches,
+                "jobIds": [job_id for batch in batches for job_id in batch["jobIds"]]
+            }
         }), 200
 
+
+@app.route('/getUploadJobs', methods=['GET'])
+def get_upload_jobs():
+    """查询上传任务，可按 status、batchId 过滤"""
+    limit = request.args.get('limit', default=100, type=int)
+    jobs = list_jobs(request.args.get('status'), request.args.get('batchId'), limit)
+    return jsonify({"code": 200, "msg": None, "data": jobs}), 200
+
+
+@app.route('/getUploadJob', methods=['GET'])
+def get_upload_job():
+    job = get_job(request.args.get('id', type=int))
+    if job is None:
+        return jsonify({"code": 404, "msg": "任务不存在", "data": None}), 404
+    return jsonify({"code": 200, "msg": None, "data": job}), 200
+
+
+@app.route('/cancelUploadJob', methods=['GET'])
+def cancel_upload_job():
+    """排队中的任务直接取消，执行中的任务会在下一次心跳时中止"""
+    job = cancel_job(request.args.get('id', type=int))
+    if job is None:
+        return jsonify({"code": 404, "msg": "任务不存在", "data": None}), 404
+    return jsonify({"code": 200, "msg": None, "data": job}), 200
+
+
+@app.route('/retryUploadJob', methods=['GET'])
+def retry_upload_job():
+    """失败或已取消的任务重新排队"""
+    job = retry_job(request.args.get('id', type=int))
+    if job is None:
+        return jsonify({"code": 404, "msg": "任务不存在", "data": None}), 404
+    return jsonify({"code": 200, "msg": None, "data": job}), 200
+
+
+@app.route('/getUploadScheduler', methods=['GET'])
+def get_upload_scheduler():
+    """本地定时发布调度器的状态（定时任务本身用 /getUploadJobs 查询）"""
+    return jsonify({"code": 200, "msg": None, "data": scheduler_snapshot()}), 200
+
 # Cookie文件上传API
 @app.route('/uploadCookie', methods=['POST'])
 def upload_cookie():
@@ -681,8 +670,8 @@ def upload_cookie():
 
         file.save(str(cookie_file_path))
 
-        # 更新数据库中的账号信息（可选，比如更新更新时间）
-        # 这里可以根据需要添加额外的处理逻辑
+        # cookie 已更换，清除校验缓存，下次获取账号列表时重新校验
+        invalidate_cookie_cache(account_id)
 
         return jsonify({
             "code": 200,
@@ -779,6 +768,75 @@ def sse_stream(status_queue):
             # 避免 CPU 占满
             time.sleep(0.1)
 
+
+@app.route('/uploadProgress', methods=['GET'])
+def upload_progress():
+    """以 SSE 推送上传进度事件，可用 platform / account（cookie 文件名）过滤"""
+    platform = request.args.get('platform')
+    account = request.args.get('account')
+    progress_queue = Queue(maxsize=1000)
+
+    def listener(event):
+        if platform and event.get("platform") != platform:
+            return
+        if account and event.get("account") != account:
+            return
+        if not progress_queue.full():
+            progress_queue.put(json.dumps(event, ensure_ascii=False))
+
+    subscribe_upload_progress(listener)
+
+    def stream():
+        try:
+            yield from sse_stream(progress_queue)
+        finally:
+            # 客户端断开时取消订阅
+            unsubscribe_upload_progress(listener)
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Connection'] = 'keep-alive'
+    return response
+
+
+@app.route('/uploadMetrics', methods=['GET'])
+def upload_metrics_summary():
+    """按平台和账号汇总的上传吞吐量"""
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": upload_metrics.snapshot()
+    }), 200
+
+
+@app.route('/uploadPhaseStats', methods=['GET'])
+def upload_phase_stats():
+    """本进程内各平台上传各阶段耗时的 p50 / p95（历史数据用 cli_main.py trace-report 统计）"""
+    platform = request.args.get('platform')
+    data = [row for row in phase_stats.snapshot() if not platform or row["platform"] == platform]
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": data
+    }), 200
+
+
+@app.route('/getRateLimits', methods=['GET'])
+def get_rate_limits():
+    """各平台、各账号上传限速令牌桶的余额和累计等待时间（所有进程共用）"""
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": upload_rate_limiter.snapshot(request.args.get('platform'))
+    }), 200
+
+
+@app.route('/getCircuitBreakers', methods=['GET'])
+def get_circuit_breakers():
+    """各平台的熔断状态、连续失败次数和最后一次错误（只统计后端进程内的上传）"""
+    return jsonify({"code": 200, "msg": None, "data": circuit_breakers.snapshot()}), 200
+
 # AI 素材转移到素材库
 @app.route('/api/ai/transfer-to-material', methods=['POST'])
 def transfer_ai_to_material():
@@ -833,8 +891,8 @@ def transfer_ai_to_material():
                 
                 # 插入数据库
                 cursor.execute(
-                    "INSERT INTO file_records (filename, filesize, file_path) VALUES (?, ?, ?)",
-                    (unique_name, file_size_mb, str(dst_path))
+                    "INSERT INTO file_records (filename, filesize, file_path, content_hash) VALUES (?, ?, ?, ?)",
+                    (unique_name, file_size_mb, str(dst_path), file_sha256(dst_path))
                 )
                 
                 transferred.append({
@@ -1100,4 +1158,9 @@ def ai_publish_to_xhs():
 
 
 if __name__ == '__main__':
+    # 建表并迁移旧数据库（补齐新增的列）
+    Path(DATA_DIR / "db").mkdir(parents=True, exist_ok=True)
+    init_db(Path(DATA_DIR / "db" / "database.db"))
+    # 后台执行 /postVideo 创建的上传任务，重启前未完成的任务会继续执行
+    start_upload_worker()
     app.run(host='0.0.0.0' ,port=5409)
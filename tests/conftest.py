@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 仓库根目录本身带 __init__.py，pytest 不会自动把它加入 sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def tmp_db(tmp_path):
+    """建好全部表的临时 SQLite 数据库"""
+    import sqlite3
+    from db.createTable import create_tables, migrate
+
+    path = tmp_path / "database.db"
+    conn = sqlite3.connect(path)
+    create_tables(conn.cursor())
+    migrate(conn.cursor())
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture(autouse=True)
+def isolated_output(tmp_path, monkeypatch):
+    """上传追踪和失败现场写到临时目录，不污染仓库下的 logs/"""
+    import utils.diagnostics
+    import utils.tracing
+
+    monkeypatch.setattr(utils.tracing, "TRACE_FILE", tmp_path / "upload_trace.jsonl")
+    monkeypatch.setattr(utils.diagnostics, "DIAGNOSTICS_DIR", tmp_path / "diagnostics")
+
+
+@pytest.fixture
+def jobs_db(tmp_db, tmp_path, monkeypatch):
+    """上传任务队列、发布记录、限速都指向临时数据库，素材和 cookie 目录指向临时目录"""
+    import myUtils.upload_jobs as upload_jobs
+    from utils.publish_log import publish_log
+    from utils.rate_limit import upload_rate_limiter
+
+    monkeypatch.setattr(upload_jobs, "DB_PATH", tmp_db)
+    monkeypatch.setattr(upload_jobs, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(publish_log, "db_path", tmp_db)
+    monkeypatch.setattr(publish_log, "_ready", False)
+    monkeypatch.setattr(upload_rate_limiter, "db_path", tmp_db)
+    monkeypatch.setattr(upload_rate_limiter, "platform_limits", {})
+    monkeypatch.setattr(upload_rate_limiter, "account_limits", {})
+    (tmp_path / "videoFile").mkdir()
+    (tmp_path / "cookiesFile").mkdir()
+    return tmp_db
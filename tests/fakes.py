@@ -0,0 +1,231 @@
+"""测试用的 Playwright 替身，不启动真实浏览器"""
+
+
+class FakeLocator(object):
+    """元素数量由 page.present 决定（选择器包含其中任一字符串时为 1，否则为 0），操作记录到 page.actions"""
+
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+
+    def _child(self, selector):
+        return FakeLocator(self.page, f"{self.selector} >> {selector}")
+
+    def locator(self, selector):
+        return self._child(selector)
+
+    def filter(self, has_text=None, **kwargs):
+        return self._child(f"filter={has_text}")
+
+    def get_by_text(self, text, **kwargs):
+        return self._child(f"text={text}")
+
+    def nth(self, index):
+        return self
+
+    def or_(self, other):
+        return self
+
+    @property
+    def first(self):
+        return self
+
+    async def set_input_files(self, files):
+        self.page.files = files
+        self.page.actions.append(("set_input_files", self.selector))
+
+    async def click(self, **kwargs):
+        self.page.actions.append(("click", self.selector))
+
+    async def fill(self, value, **kwargs):
+        self.page.actions.append(("fill", self.selector, value))
+
+    async def hover(self, **kwargs):
+        self.page.actions.append(("hover", self.selector))
+
+    async def check(self, **kwargs):
+        self.page.actions.append(("check", self.selector))
+
+    async def count(self):
+        return 1 if any(text in self.selector for text in self.page.present) else 0
+
+    async def is_visible(self):
+        return bool(await self.count())
+
+    async def is_disabled(self):
+        return False
+
+    async def get_attribute(self, name):
+        return self.page.attributes.get(name, "")
+
+
+class FakeKeyboard(object):
+    def __init__(self, page):
+        self.page = page
+
+    async def type(self, text, **kwargs):
+        self.page.actions.append(("type", text))
+
+    async def press(self, key, **kwargs):
+        self.page.actions.append(("press", key))
+
+
+class FakePage(object):
+    """
+    只实现上传器和浏览器池用到的 Page 接口；goto 的行为由 on_goto 决定
+
+    present: 页面上存在的元素（选择器片段）；attributes: get_attribute 的返回值；
+    redirects: wait_for_url 的模式 -> 等到后的地址；blocked_urls: wait_for_url 超时的模式
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+        self.closed = False
+        self.files = None
+        self.present = set()
+        self.attributes = {}
+        self.redirects = {}
+        self.blocked_urls = set()
+        self.actions = []
+        self.keyboard = FakeKeyboard(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+    async def screenshot(self, **kwargs):
+        return b""
+
+    async def content(self):
+        return "<html></html>"
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+        self.actions.append(("goto", url))
+        if self.context.on_goto is not None:
+            await self.context.on_goto(url)
+
+    async def wait_for_url(self, url, **kwargs):
+        self.actions.append(("wait_for_url", url))
+        if url in self.blocked_urls:
+            raise TimeoutError(f"waiting for {url}")
+        self.url = self.redirects.get(url, self.url)
+
+    def get_by_role(self, role, name=None, **kwargs):
+        return FakeLocator(self, f"role={role}[{name}]")
+
+    def get_by_text(self, text, **kwargs):
+        return FakeLocator(self, f"text={text}")
+
+    def get_by_label(self, text, **kwargs):
+        return FakeLocator(self, f"label={text}")
+
+    def get_by_placeholder(self, text, **kwargs):
+        return FakeLocator(self, f"placeholder={text}")
+
+    async def type(self, selector, text, **kwargs):
+        self.actions.append(("type", text))
+
+    async def press(self, selector, key, **kwargs):
+        self.actions.append(("press", key))
+
+    async def reload(self, **kwargs):
+        await self.goto(self.url)
+
+    async def wait_for_function(self, expression, **kwargs):
+        pass
+
+    async def evaluate(self, expression, arg=None):
+        # 小红书签名页面 window._webmsxyw 的返回值
+        return {"X-s": "signed", "X-t": 1}
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+    async def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+
+class FakeContext(object):
+    def __init__(self, on_goto=None):
+        self.on_goto = on_goto
+        self.pages = []
+        self.closed = False
+        self.cookies = []
+        self._handlers = []
+
+    def on(self, event, handler):
+        if event == "close":
+            self._handlers.append(handler)
+
+    async def add_init_script(self, script=None, **kwargs):
+        pass
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def storage_state(self, path=None):
+        pass
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for page in self.pages:
+            page.closed = True
+        for handler in self._handlers:
+            handler(self)
+
+
+class FakeBrowser(object):
+    def __init__(self, on_goto=None):
+        self.on_goto = on_goto
+        self.contexts = []
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        context = FakeContext(self.on_goto)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+class FakeBrowserType(object):
+    def __init__(self, on_goto=None):
+        self.on_goto = on_goto
+        self.persistent = []
+        self.launches = []  # 每次 launch() 的参数
+
+    async def launch(self, **kwargs):
+        self.launches.append(kwargs)
+        return FakeBrowser(self.on_goto)
+
+    async def launch_persistent_context(self, user_data_dir, **kwargs):
+        context = FakeContext(self.on_goto)
+        self.persistent.append(context)
+        return context
+
+
+class FakePlaywright(object):
+    def __init__(self, on_goto=None):
+        self.chromium = FakeBrowserType(on_goto)
+
+    async def stop(self):
+        pass
@@ -0,0 +1,54 @@
+import asyncio
+
+import utils.browser_profiles as browser_profiles
+from utils.browser_profiles import ProfileCache
+from tests.fakes import FakePlaywright
+
+
+def make_cache(tmp_path, monkeypatch, **kwargs):
+    monkeypatch.setattr(browser_profiles, "PROFILE_DIR", tmp_path / "profiles")
+    return ProfileCache(max_open=2, max_memory_mb=0, **kwargs)
+
+
+def test_release_frees_lease_for_next_upload(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    playwright = FakePlaywright()
+
+    async def run():
+        context = await cache.get_context(playwright, tmp_path / "a.json", {})
+        waiter = asyncio.ensure_future(cache.get_context(playwright, tmp_path / "a.json", {}))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await cache.release(context)
+        assert await asyncio.wait_for(waiter, 1) is context
+
+    asyncio.run(run())
+
+
+def test_leaked_lease_times_out(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, lease_timeout=0.1)
+    playwright = FakePlaywright()
+
+    async def run():
+        leaked = await cache.get_context(playwright, tmp_path / "a.json", {})
+        # 调用方出错没有归还，下一个上传不能一直等下去
+        context = await asyncio.wait_for(cache.get_context(playwright, tmp_path / "a.json", {}), 2)
+        assert context is not leaked
+        assert leaked.closed
+
+    asyncio.run(run())
+
+
+def test_crashed_profile_wakes_waiters(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    playwright = FakePlaywright()
+
+    async def run():
+        crashed = await cache.get_context(playwright, tmp_path / "a.json", {})
+        waiter = asyncio.ensure_future(cache.get_context(playwright, tmp_path / "a.json", {}))
+        await asyncio.sleep(0.05)
+        await crashed.close()
+        context = await asyncio.wait_for(waiter, 1)
+        assert context is not crashed
+
+    asyncio.run(run())
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+import uploader.tencent_uploader.main as tencent_main
+import uploader.xiaohongshu_uploader.main as xhs_main
+import utils.browser_profiles as browser_profiles
+from uploader.tencent_uploader.main import TencentVideo
+from uploader.xiaohongshu_uploader.main import XiaoHongShuVideo, XHS_PUBLISH_URL
+from utils.browser_pool import BrowserPool
+from utils.checkpoint import UploadCheckpoint, STEP_FILE_UPLOADED, STEP_METADATA_FILLED, STEP_DRAFT_SAVED, \
+    STEP_PUBLISHED
+from utils.retry import RetryPolicy, RetryExhausted
+from tests.fakes import FakePlaywright, FakeContext, FakePage
+
+TENCENT_POST_LIST = "https://channels.weixin.qq.com/platform/post/list"
+TENCENT_DRAFT_LIST = "https://channels.weixin.qq.com/platform/post/list?tab=draft"
+
+
+def new_page(present=()):
+    page = FakePage(FakeContext())
+    page.present.update(present)
+    return page
+
+
+def typed(page) -> list:
+    """页面上输入过的内容（填写标题、话题）"""
+    return [action for action in page.actions if action[0] in ("fill", "type")]
+
+
+def test_xhs_retry_resumes_from_draft_with_persistent_profiles(tmp_path, monkeypatch):
+    """第一次在文件传完后失败并暂存草稿，重试时借到同一个账号 Profile 并从草稿继续"""
+    monkeypatch.setattr(xhs_main, "BROWSER_PERSISTENT_PROFILES", True)
+    monkeypatch.setattr(browser_profiles, "PROFILE_DIR", tmp_path / "profiles")
+    calls = []
+
+    async def fill_and_publish(self, page, resumed):
+        calls.append(resumed)
+        if not resumed:
+            await self.checkpoint.mark(STEP_FILE_UPLOADED)
+            raise TimeoutError("发布按钮没有响应")
+        await self.checkpoint.mark(STEP_PUBLISHED)
+
+    async def save_draft(self, page):
+        await self.checkpoint.mark(STEP_DRAFT_SAVED, draft_url=XHS_PUBLISH_URL)
+
+    async def open_draft(self, page):
+        return True
+
+    monkeypatch.setattr(XiaoHongShuVideo, "fill_and_publish", fill_and_publish)
+    monkeypatch.setattr(XiaoHongShuVideo, "save_draft", save_draft)
+    monkeypatch.setattr(XiaoHongShuVideo, "open_draft", open_draft)
+    video = tmp_path / "a.mp4"
+    video.write_bytes(b"0" * 1024)
+    account = tmp_path / "account.json"
+    saved = {}
+
+    def make_app(pool):
+        app = XiaoHongShuVideo("标题", video, [], 0, account, browser_pool=pool,
+                               checkpoint=UploadCheckpoint(saved.get("data"), save=lambda data: saved.update(data=data)))
+        app.headless = True
+        return app
+
+    async def run():
+        pool = BrowserPool(persistent_profiles=True)
+
+        async def ensure_playwright():
+            return FakePlaywright()
+
+        monkeypatch.setattr(pool, "_ensure_playwright", ensure_playwright)
+        with pytest.raises(TimeoutError):
+            await make_app(pool).upload(None)
+        assert not any(entry.leased for entry in pool.profiles._entries.values())
+        await asyncio.wait_for(make_app(pool).upload(None), 5)
+        await pool.close()
+
+    asyncio.run(run())
+    assert calls == [False, True]
+    assert STEP_PUBLISHED in saved["data"]["steps"]
+
+
+def test_xhs_resume_skips_finished_steps(tmp_path):
+    """从草稿继续时不再等待文件上传，也不重复填写标题和话题，直接发布"""
+    checkpoint = UploadCheckpoint({"steps": {STEP_FILE_UPLOADED: "t", STEP_METADATA_FILLED: "t", STEP_DRAFT_SAVED: "t"},
+                                   "draft_url": XHS_PUBLISH_URL})
+    app = XiaoHongShuVideo("标题", tmp_path / "a.mp4", ["话题"], 0, tmp_path / "account.json", checkpoint=checkpoint)
+    # 页面上没有"上传成功"标识，如果没有跳过等待会一直等到超时
+    page = new_page(present=["title-container"])
+    asyncio.run(asyncio.wait_for(app.fill_and_publish(page, resumed=True), 5))
+    assert typed(page) == []
+    assert ("click", 'button:has-text("发布")') in page.actions
+    assert checkpoint.done(STEP_PUBLISHED)
+
+
+def test_xhs_resume_fills_metadata_missing_from_draft(tmp_path):
+    checkpoint = UploadCheckpoint({"steps": {STEP_FILE_UPLOADED: "t", STEP_DRAFT_SAVED: "t"},
+                                   "draft_url": XHS_PUBLISH_URL})
+    app = XiaoHongShuVideo("标题", tmp_path / "a.mp4", ["话题"], 0, tmp_path / "account.json", checkpoint=checkpoint)
+    page = new_page(present=["title-container"])
+    asyncio.run(asyncio.wait_for(app.fill_and_publish(page, resumed=True), 5))
+    assert ("fill", "div.plugin.title-container >> input.d-text", "标题") in page.actions
+    assert ("type", "#话题") in page.actions
+    assert checkpoint.done(STEP_METADATA_FILLED) and checkpoint.done(STEP_PUBLISHED)
+
+
+def test_tencent_draft_save_and_resume(tmp_path, monkeypatch):
+    """发表没有跳转时存为草稿，重试时打开草稿，只补发布，不重新填写"""
+    monkeypatch.setattr(tencent_main, "PUBLISH_RETRY", RetryPolicy(max_attempts=1))
+    saved = {}
+
+    def make_app():
+        checkpoint = UploadCheckpoint(saved.get("data"), save=lambda data: saved.update(data=data))
+        return TencentVideo("标题", tmp_path / "a.mp4", ["话题"], 0, tmp_path / "account.json", checkpoint=checkpoint)
+
+    async def first_attempt():
+        app = make_app()
+        page = new_page()
+        page.blocked_urls.add(TENCENT_POST_LIST)
+        page.redirects["**/post/list**"] = TENCENT_DRAFT_LIST
+        with pytest.raises(RetryExhausted):
+            await app.fill_and_publish(page, resumed=False)
+        # 与 upload() 一样：文件已经传完时存为草稿
+        assert app.checkpoint.done(STEP_FILE_UPLOADED) and not app.checkpoint.done(STEP_PUBLISHED)
+        await app.save_draft(page)
+        return page
+
+    first = asyncio.run(first_attempt())
+    assert typed(first)
+    assert saved["data"]["draft_url"] == TENCENT_DRAFT_LIST
+    assert STEP_DRAFT_SAVED in saved["data"]["steps"]
+
+    async def retry():
+        app = make_app()
+        assert app.checkpoint.resumable
+        page = new_page(present=["post-feed-item", "div.input-editor"])
+        assert await app.open_draft(page)
+        await app.fill_and_publish(page, resumed=True)
+        return page
+
+    page = asyncio.run(asyncio.wait_for(retry(), 5))
+    assert page.actions[0] == ("goto", TENCENT_DRAFT_LIST)
+    assert ("click", "div.post-feed-item >> filter=标题 >> text=编辑") in page.actions
+    assert typed(page) == []
+    assert STEP_PUBLISHED in saved["data"]["steps"]
@@ -0,0 +1,52 @@
+import asyncio
+import sys
+
+import pytest
+
+import cli_main
+from utils.login_guard import CookieInvalidError
+
+
+class ExpiredUploader(object):
+    """cookie 一直失效的上传器"""
+
+    def __init__(self, title, file_path, tags, publish_date, account_file, *args, **kwargs):
+        self.account_file = account_file
+
+    async def main(self):
+        raise CookieInvalidError("douyin", self.account_file)
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli_main, "BASE_DIR", tmp_path)
+    (tmp_path / "cookies").mkdir()
+    (tmp_path / "cookies" / "douyin_a.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "cookies" / "kuaishou_a.json").write_text("{}", encoding="utf-8")
+    path = tmp_path / "v.mp4"
+    path.write_bytes(b"video")
+    (tmp_path / "v.txt").write_text("标题\n#话题", encoding="utf-8")
+    return path
+
+
+def run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["cli_main.py", *argv])
+    asyncio.run(cli_main.main())
+
+
+def test_expired_cookie_without_relogin_exits_nonzero(video, monkeypatch):
+    monkeypatch.setattr(cli_main, "DouYinVideo", ExpiredUploader)
+    with pytest.raises(SystemExit) as info:
+        run(monkeypatch, "douyin", "a", "upload", str(video))
+    assert info.value.code == 1
+
+
+def test_failed_relogin_exits_nonzero(video, monkeypatch):
+    async def setup(account_file, handle=False):
+        return False
+
+    monkeypatch.setattr(cli_main, "KSVideo", ExpiredUploader)
+    monkeypatch.setattr(cli_main, "ks_setup", setup)
+    with pytest.raises(SystemExit) as info:
+        run(monkeypatch, "kuaishou", "a", "upload", str(video))
+    assert info.value.code == 1
@@ -0,0 +1,57 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import myUtils.auth as auth
+import myUtils.cookie_cache as cookie_cache
+from myUtils.cookie_cache import validate_accounts, load_accounts
+
+CHECKED_AT = "2026-01-01 08:00:00"
+
+
+@pytest.fixture
+def accounts_db(tmp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(cookie_cache, "DB_PATH", tmp_db)
+    monkeypatch.setattr(auth, "DATA_DIR", tmp_path)
+    (tmp_path / "cookiesFile").mkdir()
+    for name in ("a.json", "b.json"):
+        (tmp_path / "cookiesFile" / name).write_text('{"cookies": []}', encoding="utf-8")
+    conn = sqlite3.connect(tmp_db)
+    conn.executemany("INSERT INTO user_info (type, filePath, userName, status, last_checked_at, last_valid_at) "
+                     "VALUES (3, ?, ?, 1, ?, ?)", [("a.json", "a", CHECKED_AT, CHECKED_AT),
+                                                   ("b.json", "b", CHECKED_AT, CHECKED_AT)])
+    conn.commit()
+    conn.close()
+
+    async def undecided(type, account_file, client=None):
+        return None
+
+    # 不访问外网，直接走浏览器校验
+    monkeypatch.setattr(auth, "http_check_cookie", undecided)
+    return tmp_db
+
+
+def test_browser_error_keeps_cached_status(accounts_db, monkeypatch):
+    async def crashed(account_file, browser_pool=None):
+        if account_file.name == "a.json":
+            raise RuntimeError("Executable doesn't exist")
+        return False
+
+    monkeypatch.setattr(auth, "cookie_auth_douyin", crashed)
+    asyncio.run(validate_accounts(load_accounts()))
+
+    rows = {row[2]: row for row in load_accounts()}
+    # 浏览器启动失败：状态和校验时间都不变，下次请求会重新校验
+    assert rows["a.json"][4] == 1 and rows["a.json"][5] == CHECKED_AT
+    # 明确失效的账号照常更新
+    assert rows["b.json"][4] == 0 and rows["b.json"][5] != CHECKED_AT
+
+
+def test_check_cookie_still_returns_false_for_single_checks(accounts_db, monkeypatch):
+    async def crashed(account_file, browser_pool=None):
+        raise RuntimeError("browser crashed")
+
+    monkeypatch.setattr(auth, "cookie_auth_douyin", crashed)
+    assert asyncio.run(auth.check_cookie(3, "a.json")) is False
+    assert asyncio.run(auth.check_cookies([(3, "a.json")])) == [None]
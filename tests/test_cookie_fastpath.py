@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import myUtils.cookie_fastpath as cookie_fastpath
+from myUtils.cookie_fastpath import JsonApiValidator, http_check_cookie, new_http_client
+
+# 路径 -> (状态码, 响应体)，桩服务按请求路径返回
+ROUTES = {
+    "/ok": (200, {"status_code": 0, "user": {"uid": 1}}),
+    "/logged-out": (200, {"status_code": 8}),
+    "/forbidden": (403, {"status_code": 0, "user": {"uid": 1}}),
+    "/unauthorized": (401, {}),
+    "/redirect": (302, None),
+    "/changed": (200, {"unexpected": True}),
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.cookies.append(self.headers.get("Cookie"))
+        status, body = ROUTES[self.path]
+        self.send_response(status)
+        if status == 302:
+            self.send_header("Location", "/login")
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.cookies = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def account_file(tmp_path):
+    path = tmp_path / "account.json"
+    path.write_text(json.dumps({"cookies": [
+        {"name": "sessionid", "value": "abc", "domain": ".douyin.com"},
+        {"name": "other", "value": "x", "domain": ".example.com"},
+    ]}), encoding="utf-8")
+    return path
+
+
+def register(monkeypatch, server, path, cookie_domain="douyin.com"):
+    host, port = server.server_address
+    monkeypatch.setitem(cookie_fastpath.VALIDATORS, 3, JsonApiValidator(
+        cookie_domain=cookie_domain,
+        base_url=f"http://{host}:{port}",
+        path=path,
+        is_valid=lambda data: data.get("status_code") == 0 and bool(data.get("user")),
+        is_invalid=lambda data: data.get("status_code") in (8, 2190008),
+    ))
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/ok", True),
+    ("/logged-out", False),
+    ("/forbidden", None),
+    ("/unauthorized", None),
+    ("/redirect", None),
+    ("/changed", None),
+])
+def test_only_explicit_body_decides(stub_server, account_file, monkeypatch, path, expected):
+    register(monkeypatch, stub_server, path)
+    assert asyncio.run(http_check_cookie(3, account_file)) is expected
+    # 只带上目标域名的 cookie
+    assert stub_server.cookies == ["sessionid=abc"]
+
+
+def test_missing_domain_cookie_is_undecided(stub_server, account_file, monkeypatch):
+    register(monkeypatch, stub_server, "/ok", cookie_domain="kuaishou.com")
+    assert asyncio.run(http_check_cookie(3, account_file)) is None
+    assert stub_server.cookies == []
+
+
+def test_unreachable_server_is_undecided(account_file, monkeypatch):
+    monkeypatch.setitem(cookie_fastpath.VALIDATORS, 3, JsonApiValidator(
+        cookie_domain="douyin.com", base_url="http://127.0.0.1:1", path="/ok",
+        is_valid=lambda data: True, is_invalid=lambda data: False,
+    ))
+    assert asyncio.run(http_check_cookie(3, account_file)) is None
+
+
+def test_shared_client_is_left_open(stub_server, account_file, monkeypatch):
+    register(monkeypatch, stub_server, "/ok")
+
+    async def run():
+        async with new_http_client() as client:
+            assert await http_check_cookie(3, account_file, client) is True
+            assert await http_check_cookie(3, account_file, client) is True
+            assert not client.is_closed
+        return client
+
+    assert asyncio.run(run()).is_closed
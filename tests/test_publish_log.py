@@ -0,0 +1,53 @@
+import asyncio
+import io
+import sqlite3
+
+import pytest
+
+from utils.publish_log import PublishLog, file_sha256, save_stream
+
+
+@pytest.fixture
+def log(tmp_db):
+    return PublishLog(tmp_db)
+
+
+def write(path, content=b"video"):
+    path.write_bytes(content)
+    return path
+
+
+def test_same_content_under_another_name_is_skipped(log, tmp_path):
+    log.record_sync("douyin", "/cookies/a.json", write(tmp_path / "v.mp4"))
+    # 换了文件名、换了 cookie 目录，内容和账号相同仍然算重复
+    assert log.already_published_sync("douyin", "other/a.json", write(tmp_path / "copy.mp4"))
+    assert not log.already_published_sync("douyin", "b.json", tmp_path / "copy.mp4")
+    assert not log.already_published_sync("kuaishou", "a.json", tmp_path / "copy.mp4")
+    assert not log.already_published_sync("douyin", "a.json", write(tmp_path / "new.mp4", b"other"))
+
+
+def test_allow_duplicate_publishes_again_and_counts(log, tmp_path):
+    video = write(tmp_path / "v.mp4")
+    log.record_sync("douyin", "a.json", video)
+    assert not log.already_published_sync("douyin", "a.json", video, allow_duplicate=True)
+    log.record_sync("douyin", "a.json", video)
+    assert log.lookup("douyin", "a.json", video)["count"] == 2
+
+
+def test_upload_save_hash_is_reused(log, tmp_db, tmp_path):
+    video = tmp_path / "uuid_v.mp4"
+    size, content_hash = save_stream(io.BytesIO(b"video" * 1000), video)
+    assert size == 5000 and content_hash == file_sha256(video)
+    conn = sqlite3.connect(tmp_db)
+    conn.execute("INSERT INTO file_records (filename, filesize, file_path, content_hash) VALUES (?, ?, ?, ?)",
+                 ("v.mp4", 0.01, video.name, "recorded"))
+    conn.commit()
+    conn.close()
+    # 有 /uploadSave 记录的哈希时不再重新读文件
+    assert log.content_hash(video) == "recorded"
+
+
+def test_unreadable_log_does_not_block_upload(tmp_path):
+    log = PublishLog(tmp_path / "missing" / "dir" / "database.db")
+    log._ready = True
+    assert not asyncio.run(log.already_published("douyin", "a.json", write(tmp_path / "v.mp4")))
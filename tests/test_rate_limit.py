@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+import utils.upload_fanout as upload_fanout
+from utils.rate_limit import UploadRateLimiter, RateLimitExceeded
+from utils.upload_fanout import UploadLimiter
+
+# 每秒补充一个令牌，最多连续上传两次
+ONE_PER_SECOND = {"douyin": {"rate": 3600, "burst": 2}}
+
+
+def make_limiter(tmp_db, max_wait=60):
+    return UploadRateLimiter(platform_limits={}, account_limits=ONE_PER_SECOND, max_wait=max_wait, db_path=tmp_db)
+
+
+def tokens(limiter, key="douyin:a.json"):
+    return next(bucket for bucket in limiter.snapshot() if bucket["key"] == key)["tokens"]
+
+
+def test_burst_then_wait(tmp_db):
+    limiter = make_limiter(tmp_db)
+    assert limiter.reserve("douyin", "cookies/a.json") == 0
+    assert limiter.reserve("douyin", "cookies/a.json") == 0
+    assert limiter.reserve("douyin", "cookies/a.json") == pytest.approx(1, abs=0.1)
+    # 不同账号的桶互不影响，没有配置的平台不限速
+    assert limiter.reserve("douyin", "b.json") == 0
+    assert limiter.reserve("kuaishou", "a.json") == 0
+
+
+def test_wait_over_limit_is_rejected_without_reserving(tmp_db):
+    limiter = make_limiter(tmp_db, max_wait=0.5)
+    limiter.reserve("douyin", "a.json")
+    limiter.reserve("douyin", "a.json")
+    before = tokens(limiter)
+    with pytest.raises(RateLimitExceeded):
+        limiter.reserve("douyin", "a.json")
+    assert tokens(limiter) == pytest.approx(before, abs=0.1)
+
+
+def test_prepaid_token_is_used_once(tmp_db):
+    limiter = make_limiter(tmp_db)
+
+    async def run():
+        async with limiter.prepaid("douyin", "a.json"):
+            # 上传器 main() 里的 acquire 不再扣令牌
+            assert await limiter.acquire("douyin", "a.json") == 0
+        return limiter.snapshot()[0]["acquired"]
+
+    assert asyncio.run(run()) == 1
+    assert tokens(limiter) == pytest.approx(1, abs=0.1)
+
+
+def test_unused_prepaid_token_is_refunded(tmp_db):
+    limiter = make_limiter(tmp_db)
+
+    async def run():
+        async with limiter.prepaid("douyin", "a.json"):
+            pass  # 例如重复内容直接跳过，没有调用 acquire
+
+    asyncio.run(run())
+    assert tokens(limiter) == pytest.approx(2, abs=0.1)
+
+
+def test_rate_limit_wait_does_not_hold_concurrency_slot(tmp_db, monkeypatch):
+    limiter = make_limiter(tmp_db)
+    monkeypatch.setattr(upload_fanout, "upload_rate_limiter", limiter)
+    limiter.reserve("douyin", "a.json")
+    limiter.reserve("douyin", "a.json")
+    slots = UploadLimiter(max_concurrency=1)
+    finished = []
+
+    async def upload(platform, account):
+        async with slots.slot(platform, account):
+            await limiter.acquire(platform, account)
+            finished.append((platform, time.monotonic()))
+
+    async def run():
+        # 抖音账号要等约 1 秒令牌，等待期间快手的上传不应被唯一的名额挡住
+        waiting = asyncio.ensure_future(upload("douyin", "a.json"))
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(upload("kuaishou", "b.json"), 0.5)
+        await waiting
+
+    asyncio.run(run())
+    assert [platform for platform, _ in finished] == ["kuaishou", "douyin"]
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.login_guard import CookieInvalidError
+from utils.network import async_retry
+from utils.retry import RetryPolicy, RetryExhausted, CircuitBreaker, CircuitOpenError, is_retryable
+
+
+def fail(breaker, error):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+def test_backoff_grows_to_max_delay():
+    policy = RetryPolicy(base_delay=1, max_delay=8, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [1, 2, 4, 8, 8]
+    assert RetryPolicy(base_delay=0.5, max_delay=2, jitter=0).delay(5000) == 2
+    jittered = RetryPolicy(base_delay=1, max_delay=8, jitter=1)
+    assert all(0 <= jittered.delay(4) <= 8 for _ in range(100))
+
+
+def test_max_attempts_raises_exhausted_with_cause():
+    retry = RetryPolicy(max_attempts=3, base_delay=0).start("click")
+    retry.failed(ValueError())
+    retry.failed(ValueError())
+    with pytest.raises(RetryExhausted) as info:
+        retry.failed(ValueError("boom"))
+    assert isinstance(info.value, TimeoutError) and isinstance(info.value.__cause__, ValueError)
+
+
+def test_deadline_raises_exhausted():
+    retry = RetryPolicy(deadline=0.05, base_delay=0.01).start("wait")
+    time.sleep(0.06)
+    with pytest.raises(RetryExhausted):
+        retry.failed()
+
+
+def test_fatal_error_is_not_retried():
+    calls = []
+
+    async def missing():
+        calls.append(1)
+        raise FileNotFoundError("v.mp4")
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(RetryPolicy(base_delay=0).call(missing))
+    assert len(calls) == 1
+
+
+def test_call_retries_until_success():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ValueError("flaky")
+        return "ok"
+
+    assert asyncio.run(RetryPolicy(base_delay=0.01).call(flaky)) == "ok"
+    assert len(calls) == 3
+
+
+def test_async_retry_stops_after_max_retries():
+    calls = []
+
+    @async_retry(timeout=5, max_retries=3)
+    async def broken():
+        calls.append(1)
+        raise ValueError("broken")
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(broken())
+    assert len(calls) == 3
+
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker("douyin", failure_threshold=2, cool_down=60)
+    fail(breaker, RuntimeError("selector changed"))
+    assert breaker.state == CircuitBreaker.CLOSED
+    fail(breaker, RuntimeError("selector changed"))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.before_call()
+    assert not is_retryable(info.value)
+    assert breaker.snapshot()["rejected"] == 1 and breaker.snapshot()["opened"] == 1
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("douyin", failure_threshold=1, cool_down=0.05)
+    fail(breaker, RuntimeError("down"))
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 试探还没有结果时，其它上传仍然被拒绝
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker("douyin", failure_threshold=3, cool_down=0.05)
+    for _ in range(3):
+        fail(breaker, RuntimeError("down"))
+    opened_at = breaker.opened_at
+    time.sleep(0.06)
+    fail(breaker, RuntimeError("still down"))
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened_at > opened_at
+    assert breaker.snapshot()["opened"] == 2
+
+
+def test_account_errors_do_not_trip_or_consume_trial():
+    breaker = CircuitBreaker("douyin", failure_threshold=1, cool_down=0.05)
+    for _ in range(5):
+        fail(breaker, CookieInvalidError("douyin", "a.json"))
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+    fail(breaker, RuntimeError("down"))
+    time.sleep(0.06)
+    # 半开试探遇到 cookie 失效，说明不了平台是否恢复，下一个上传继续试探
+    fail(breaker, CookieInvalidError("douyin", "a.json"))
+    with breaker.guard():
+        pass
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_upload_does_not_count():
+    breaker = CircuitBreaker("douyin", failure_threshold=1)
+    fail(breaker, asyncio.CancelledError())
+    assert breaker.state == CircuitBreaker.CLOSED
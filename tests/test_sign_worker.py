@@ -0,0 +1,43 @@
+import asyncio
+
+from uploader.xhs_uploader.sign_worker import XhsSignWorker
+from tests.fakes import FakePlaywright
+
+
+async def slow_goto(url):
+    # 打开首页有延迟，几个 a1 的页面会同时处于打开中
+    await asyncio.sleep(0.05)
+
+
+def test_concurrent_opens_respect_max_pages():
+    worker = XhsSignWorker(max_pages=2, launch_profile="default")
+    playwright = FakePlaywright(on_goto=slow_goto)
+
+    async def run():
+        worker._browser_lock = asyncio.Lock()
+        worker._playwright = playwright
+        results = await asyncio.gather(*(worker.sign_async("/api/x", None, a1=f"a1-{i}") for i in range(5)))
+        assert all(result == {"x-s": "signed", "x-t": "1"} for result in results)
+        assert len(worker._pages) <= 2
+        browser = worker._browser
+        open_contexts = [context for context in browser.contexts if not context.closed]
+        assert len(open_contexts) == len(worker._pages)
+        await worker._close()
+
+    asyncio.run(run())
+    assert worker.stats["signed"] == 5
+
+
+def test_sign_browser_is_always_headless():
+    # headed-debug 配置会弹出浏览器窗口，签名浏览器不应该跟着弹
+    worker = XhsSignWorker(launch_profile="headed-debug")
+    playwright = FakePlaywright()
+
+    async def run():
+        worker._browser_lock = asyncio.Lock()
+        worker._playwright = playwright
+        await worker.sign_async("/api/x", None, a1="a1")
+        await worker._close()
+
+    asyncio.run(run())
+    assert playwright.chromium.launches[0]["headless"] is True
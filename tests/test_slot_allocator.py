@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.slot_allocator import SlotAllocator, parse_daily_time
+
+NOW = datetime(2026, 1, 1, 9, 0)
+DAY1 = datetime(2026, 1, 2)
+
+
+def make(**kwargs):
+    kwargs.setdefault("min_spacing", 30 * 60)
+    kwargs.setdefault("platform_daily_caps", {})
+    return SlotAllocator(now=NOW, **kwargs)
+
+
+def test_parse_daily_time():
+    assert parse_daily_time(16) == timedelta(hours=16)
+    assert parse_daily_time(" 9:30 ") == timedelta(hours=9, minutes=30)
+
+
+def test_per_day_fills_daily_times_in_order():
+    allocator = make(daily_times=["18:00", 10], per_day=2)
+    times = [allocator.allocate("douyin", "a.json") for _ in range(3)]
+    assert times == [DAY1 + timedelta(hours=10), DAY1 + timedelta(hours=18), DAY1 + timedelta(days=1, hours=10)]
+
+
+def test_booked_slot_shifts_within_the_slot():
+    allocator = make(daily_times=[10], per_day=3)
+    allocator.book("douyin", "a.json", DAY1 + timedelta(hours=10))
+    # 与已预定的时间间隔不足 min_spacing，在本时段内顺延
+    assert allocator.allocate("douyin", "a.json") == DAY1 + timedelta(hours=10, minutes=30)
+    # 其它账号不受影响
+    assert allocator.allocate("douyin", "b.json") == DAY1 + timedelta(hours=10)
+
+
+def test_full_slot_moves_to_next_slot():
+    allocator = make(daily_times=[10, 14], per_day=5, slot_width=3600)
+    for minutes in (0, 30):
+        allocator.book("douyin", "a.json", DAY1 + timedelta(hours=10, minutes=minutes))
+    assert allocator.allocate("douyin", "a.json") == DAY1 + timedelta(hours=14)
+
+
+def test_platform_daily_cap_is_shared_by_accounts():
+    allocator = make(daily_times=[10, 14], per_day=2, platform_daily_caps={"douyin": 2})
+    times = [allocator.allocate("douyin", account) for account in ("a.json", "b.json", "c.json")]
+    assert [when.date() for when in times] == [DAY1.date(), DAY1.date(), (DAY1 + timedelta(days=1)).date()]
+    assert allocator.allocate("kuaishou", "a.json") == DAY1 + timedelta(hours=10)
+
+
+def test_spread_gives_each_video_one_account():
+    allocator = make(daily_times=[10], per_day=1)
+    result = allocator.allocate_batch("douyin", ["a.json", "b.json"], 4, spread=True)
+    assert result == [
+        ("a.json", DAY1 + timedelta(hours=10)),
+        ("b.json", DAY1 + timedelta(hours=10)),
+        ("a.json", DAY1 + timedelta(days=1, hours=10)),
+        ("b.json", DAY1 + timedelta(days=1, hours=10)),
+    ]
+
+
+def test_batch_to_all_accounts_never_double_books():
+    allocator = make(daily_times=[10, 14, 18], per_day=2)
+    accounts = [f"{i}.json" for i in range(5)]
+    rows = allocator.allocate_batch("douyin", accounts, 30)
+    for index, account in enumerate(accounts):
+        times = sorted(row[index] for row in rows)
+        assert all(later - earlier >= timedelta(minutes=30) for earlier, later in zip(times, times[1:]))
+        per_day = {}
+        for when in times:
+            per_day[when.date()] = per_day.get(when.date(), 0) + 1
+        assert max(per_day.values()) <= 2
+
+
+def test_no_free_slot_within_max_days():
+    allocator = make(daily_times=[10], per_day=1, max_days=2)
+    allocator.allocate("douyin", "a.json")
+    allocator.allocate("douyin", "a.json")
+    with pytest.raises(ValueError):
+        allocator.allocate("douyin", "a.json")
@@ -0,0 +1,139 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import myUtils.upload_jobs as upload_jobs
+from myUtils.postVideo import PLATFORM_KUAISHOU
+from myUtils.upload_jobs import enqueue_post_video, claim_job, finish_job, requeue_stale_jobs, cancel_job, get_job, \
+    heartbeat, validate_post_video, UploadJobWorker, JOB_PENDING, JOB_RUNNING, JOB_FAILED, JOB_CANCELLED
+from utils.browser_pool import BrowserPool
+from utils.login_guard import CookieInvalidError
+from utils.retry import CircuitOpenError
+from tests.fakes import FakePlaywright
+
+
+def enqueue(tmp_path, accounts=("a.json", "b.json"), content=b"video", **data):
+    (tmp_path / "videoFile" / "v.mp4").write_bytes(content)
+    return enqueue_post_video({"type": PLATFORM_KUAISHOU, "title": "t", "tags": [], "fileList": ["v.mp4"],
+                               "accountList": list(accounts), **data})
+
+
+def test_claim_each_job_once(jobs_db, tmp_path):
+    result = enqueue(tmp_path)
+    assert len(result["jobIds"]) == 2
+    first, second = claim_job("w1"), claim_job("w2")
+    assert {first["id"], second["id"]} == set(result["jobIds"])
+    assert first["status"] == JOB_RUNNING and first["attempts"] == 1
+    assert claim_job("w3") is None
+
+
+def test_double_submit_is_skipped(jobs_db, tmp_path):
+    enqueue(tmp_path)
+    again = enqueue(tmp_path)
+    assert again["jobIds"] == [] and len(again["skipped"]) == 2
+    assert len(enqueue(tmp_path, allowDuplicate=True)["jobIds"]) == 2
+
+
+def test_requeue_stale_running_job(jobs_db, tmp_path):
+    enqueue(tmp_path, accounts=["a.json"])
+    job = claim_job("w1")
+    assert requeue_stale_jobs(stale_seconds=60) == 0
+    conn = sqlite3.connect(jobs_db)
+    conn.execute("UPDATE upload_jobs SET heartbeat_at = '2000-01-01 00:00:00' WHERE id = ?", (job["id"],))
+    conn.commit()
+    conn.close()
+    assert requeue_stale_jobs(stale_seconds=60) == 1
+    assert get_job(job["id"])["status"] == JOB_PENDING
+    assert claim_job("w2")["attempts"] == 2
+
+
+def test_finish_job_retry_rules(jobs_db, tmp_path):
+    enqueue(tmp_path, accounts=["a.json"])
+    job = claim_job("w1")
+    # 可重试的错误：回到队列，稍后再执行
+    assert finish_job(job, RuntimeError("timeout")) == JOB_PENDING
+    assert get_job(job["id"])["run_after"] is not None
+    assert claim_job("w1") is None
+    # 熔断：不计入执行次数，熔断结束后再执行
+    assert finish_job(job, CircuitOpenError("kuaishou", time.time() + 600)) == JOB_PENDING
+    assert get_job(job["id"])["attempts"] == 1
+    # cookie 失效：重试也不会成功
+    assert finish_job(job, CookieInvalidError("kuaishou", "a.json")) == JOB_FAILED
+    assert heartbeat(job["id"]) is False
+
+
+def test_cancel_running_job_releases_browser(jobs_db, tmp_path, monkeypatch):
+    """取消执行中的任务后，上传器要先归还浏览器池的上下文再结束任务"""
+    monkeypatch.setattr(upload_jobs, "HEARTBEAT_INTERVAL", 0.05)
+    (tmp_path / "cookiesFile" / "a.json").write_text("{}")
+    uploading = threading.Event()
+
+    async def hang(url):
+        uploading.set()
+        await asyncio.Event().wait()
+
+    pool = BrowserPool(persistent_profiles=False)
+
+    async def ensure_playwright():
+        return FakePlaywright(on_goto=hang)
+
+    monkeypatch.setattr(pool, "_ensure_playwright", ensure_playwright)
+    enqueue(tmp_path, accounts=["a.json"])
+    job = claim_job("w1")
+
+    def cancel():
+        uploading.wait(5)
+        cancel_job(job["id"])
+
+    threading.Thread(target=cancel, daemon=True).start()
+    try:
+        assert UploadJobWorker(browser_pool=pool).execute(job) == JOB_CANCELLED
+        # 上下文关闭后由 close 事件异步归还实例
+        pool.run(asyncio.sleep(0.05))
+        assert pool._browsers and all(pooled.active == 0 for pooled in pool._browsers)
+    finally:
+        pool.shutdown()
+
+
+def test_validate_post_video_rejects_bad_batch():
+    for data in (None, {"type": 99}, {"type": PLATFORM_KUAISHOU, "fileList": "v.mp4"}):
+        with pytest.raises(ValueError):
+            validate_post_video(data)
+    validate_post_video({"type": PLATFORM_KUAISHOU, "fileList": ["v.mp4"], "accountList": ["a.json"]})
+
+
+def test_worker_runs_jobs_concurrently(jobs_db, tmp_path, monkeypatch):
+    """同一批 文件 × 账号 的任务同时上传，不再逐个执行"""
+    running, peak = [], []
+
+    class SlowUploader(object):
+        def __init__(self, account):
+            self.tracer = type("Tracer", (), {"platform": "kuaishou", "account": account})()
+
+        async def main(self):
+            running.append(self)
+            peak.append(len(running))
+            await asyncio.sleep(0.3)
+            running.remove(self)
+
+    monkeypatch.setattr(upload_jobs, "create_uploader",
+                        lambda type, file, cookie, publish_date, **kwargs: SlowUploader(cookie.name))
+    result = enqueue(tmp_path, accounts=["a.json", "b.json", "c.json"])
+    pool = BrowserPool(persistent_profiles=False)
+    worker = UploadJobWorker(workers=None, poll_interval=0.05, browser_pool=pool)
+    assert worker.workers == upload_jobs.UPLOAD_MAX_CONCURRENCY
+    worker.start()
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if all(get_job(job_id)["status"] == "succeeded" for job_id in result["jobIds"]):
+                break
+            time.sleep(0.05)
+        assert all(get_job(job_id)["status"] == "succeeded" for job_id in result["jobIds"])
+        assert max(peak) == 3
+    finally:
+        worker.stop(1)
+        pool.shutdown()
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import uploader.baijiahao_uploader.main as baijiahao_main
+import uploader.tencent_uploader.main as tencent_main
+from uploader.baijiahao_uploader.main import BaiJiaHaoVideo
+from uploader.tencent_uploader.main import TencentVideo
+from utils.retry import RetryPolicy, RetryExhausted
+
+
+class StaticLocator(object):
+    """count() 和 get_attribute() 固定返回同一个结果"""
+
+    def __init__(self, count=1, attribute="", error=None):
+        self._count = count
+        self.attribute = attribute
+        self.error = error
+
+    async def count(self):
+        return self._count
+
+    async def get_attribute(self, name):
+        if self.error is not None:
+            raise self.error
+        return self.attribute
+
+
+class StaticPage(object):
+    def __init__(self, button, locator):
+        self.button = button
+        self._locator = locator
+
+    def get_by_role(self, role, **kwargs):
+        return self.button
+
+    def locator(self, selector):
+        return self._locator
+
+
+def test_tencent_gives_up_on_a_file_the_platform_keeps_rejecting(tmp_path, monkeypatch):
+    monkeypatch.setattr(tencent_main, "REUPLOAD_RETRY", RetryPolicy(max_attempts=3, base_delay=0))
+    app = TencentVideo("t", "v.mp4", [], 0, tmp_path / "a.json")
+    reuploads = []
+
+    async def handle_upload_error(page):
+        reuploads.append(1)
+
+    app.handle_upload_error = handle_upload_error
+    # 发表按钮一直不可用，错误提示和删除按钮一直在
+    page = StaticPage(StaticLocator(attribute="weui-desktop-btn_disabled"), StaticLocator(count=1))
+    with pytest.raises(RetryExhausted):
+        asyncio.run(asyncio.wait_for(app.detect_upload_status(page), 5))
+    assert len(reuploads) == 2
+
+
+async def never_met(condition, **kwargs):
+    return False
+
+
+async def always_met(condition, **kwargs):
+    return True
+
+
+def test_tencent_button_errors_back_off_until_deadline(tmp_path, monkeypatch):
+    monkeypatch.setattr(tencent_main, "TRANSFER_POLL", RetryPolicy(deadline=0.3, base_delay=0.05, jitter=0))
+    monkeypatch.setattr(tencent_main, "wait_until", always_met)
+    app = TencentVideo("t", "v.mp4", [], 0, tmp_path / "a.json")
+    button = StaticLocator(error=RuntimeError("detached"))
+    calls = []
+    original = button.get_attribute
+
+    async def get_attribute(name):
+        calls.append(name)
+        return await original(name)
+
+    button.get_attribute = get_attribute
+    with pytest.raises(RetryExhausted):
+        asyncio.run(asyncio.wait_for(app.detect_upload_status(page=StaticPage(button, StaticLocator(count=0))), 5))
+    # 每次出错都退避 0.05 秒，不会空转
+    assert len(calls) <= 10
+
+
+def test_baijiahao_upload_wait_ends(tmp_path, monkeypatch):
+    monkeypatch.setattr(baijiahao_main, "TRANSFER_POLL", RetryPolicy(deadline=0.1, base_delay=0.01, jitter=0))
+    monkeypatch.setattr(baijiahao_main, "wait_until", never_met)
+    app = BaiJiaHaoVideo("t", "v.mp4", [], 0, tmp_path / "a.json")
+    page = StaticPage(None, StaticLocator(count=1))
+    with pytest.raises(RetryExhausted):
+        asyncio.run(asyncio.wait_for(app.uploading_video(page), 5))
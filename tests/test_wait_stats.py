@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import utils.tracing as tracing
+from benchmarks.adaptive_waits import wait_report
+from utils.log import kuaishou_logger
+from utils.tracing import UploadTracer, load_spans
+from utils.wait import wait_until, start_wait_stats, log_wait_stats
+
+
+def ready_after(seconds):
+    ready_at = time.monotonic() + seconds
+
+    async def condition():
+        return time.monotonic() >= ready_at
+    return condition
+
+
+async def fake_upload(tracer, error=None):
+    with tracer:
+        start_wait_stats()
+        assert await wait_until(ready_after(0.05), timeout=1, replaces=2)
+        assert not await wait_until(ready_after(10), timeout=0.1, replaces=1)
+        log_wait_stats(kuaishou_logger, tracer)
+        if error:
+            raise error
+
+
+def test_wait_stats_reach_the_trace_report():
+    tracer = UploadTracer("kuaishou", "a.json", "v.mp4")
+    asyncio.run(fake_upload(tracer))
+    try:
+        asyncio.run(fake_upload(tracer, RuntimeError("boom")))
+    except RuntimeError:
+        pass
+
+    spans = load_spans([tracing.TRACE_FILE])
+    waits = [span["meta"]["waits"] for span in spans if span["kind"] == "upload"]
+    assert [item["count"] for item in waits] == [2, 2]
+    assert [item["timeouts"] for item in waits] == [1, 1]
+
+    # 失败的上传默认不统计
+    [row] = wait_report(spans)
+    assert row["platform"] == "kuaishou" and row["uploads"] == 1 and row["waits"] == 2
+    assert row["fixed_seconds"] == 3
+    assert 0.1 <= row["p50_seconds"] < 1
+    assert row["saved_seconds"] == round(3 - row["p50_seconds"], 2)
+    assert wait_report(spans, include_failed=True)[0]["uploads"] == 2
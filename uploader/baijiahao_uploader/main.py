@@ -7,20 +7,27 @@ import os
 import time
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_BAIJIAHAO
+from utils.browser_pool import open_browser_context, close_browser_context
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.retry import circuit_breakers, PAGE_RETRY, TRANSFER_POLL
 from utils.log import baijiahao_logger
 from utils.network import async_retry
+from utils.diagnostics import UploadDiagnostics
+from utils.tracing import UploadTracer
+from utils.wait import wait_until, wait_visible, wait_hidden, wait_count_stable, start_wait_stats, log_wait_stats
+
+# 百家号上传页默认使用的 UA，启动配置里设置了 user_agent 时以配置为准
+BAIJIAHAO_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.4324.150 Safari/537.36'
 
 
 async def baijiahao_cookie_gen(account_file):
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 扫码登录需要人工操作，无头模式仍按 LOCAL_CHROME_HEADLESS，其余参数取默认启动配置
+        options = get_launch_profile().launch_options(headless=LOCAL_CHROME_HEADLESS)
         # Make sure to run headed.
         browser = await playwright.chromium.launch(**options)
         # Setup context however you like.
@@ -44,7 +51,11 @@ async def cookie_auth(account_file):
         page = await context.new_page()
         # 访问指定的 URL
         await page.goto("https://baijiahao.baidu.com/builder/rc/home")
-        await page.wait_for_timeout(timeout=5000)
+        # 等待页面网络空闲（登录框或首页已渲染），最多 5 秒
+        try:
+            await page.wait_for_load_state("networkidle", timeout=5000)
+        except Exception:
+            pass
 
         if await page.get_by_text('注册/登录百家号').count():
             baijiahao_logger.error("等待5秒 cookie 失效")
@@ -63,16 +74,22 @@ async def baijiahao_setup(account_file, handle=False):
     return True
 
 class BaiJiaHaoVideo(object):
-    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, proxy_setting=None):
+    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, proxy_setting=None, browser_pool=None,
+                 launch_profile=None, allow_duplicate=False):
         self.title = title  # 视频标题
         self.file_path = file_path
         self.tags = tags
         self.publish_date = publish_date
         self.account_file = account_file
         self.date_format = '%Y年%m月%d日 %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)  # 浏览器启动配置，见 utils/launch_profiles.py
+        self.local_executable_path = self.launch_profile.executable_path
+        self.headless = self.launch_profile.headless
         self.proxy_setting = proxy_setting
+        self.browser_pool = browser_pool
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
+        self.tracer = UploadTracer(SOCIAL_MEDIA_BAIJIAHAO, account_file, file_path)
+        self.diagnostics = UploadDiagnostics(self.tracer)  # 上传失败时保存现场截图和 DOM
 
     async def set_schedule_time(self, page, publish_date):
         """
@@ -90,9 +107,9 @@ class BaiJiaHaoVideo(object):
             except:
                 await page.locator('div.select-wrap').nth(0).click()
         # page.locator(f'div.rc-virtual-list-holder-inner >> text={publish_date_day}').click()
-        await page.wait_for_timeout(2000)
+        await wait_count_stable(page.locator('div.rc-virtual-list  div.cheetah-select-item'), timeout=4, replaces=2)
         await page.locator(f'div.rc-virtual-list  div.cheetah-select-item >> text={publish_date_day}').click()
-        await page.wait_for_timeout(2000)
+        await wait_hidden(page.locator('div.rc-virtual-list:visible'), timeout=4, replaces=2)
 
         # 改为随机点击一个 hour
         for _ in range(3):
@@ -102,108 +119,127 @@ class BaiJiaHaoVideo(object):
                 break
             except:
                 await page.locator('div.select-wrap').nth(1).click()
-        await page.wait_for_timeout(2000)
-        current_choice_hour = await page.locator('div.rc-virtual-list:visible div.cheetah-select-item-option').count()
-        await page.wait_for_timeout(2000)
+        hour_options = page.locator('div.rc-virtual-list:visible div.cheetah-select-item-option')
+        await wait_count_stable(hour_options, timeout=8, replaces=4)
+        current_choice_hour = await hour_options.count()
         await page.locator('div.rc-virtual-list:visible div.cheetah-select-item-option').nth(
             random.randint(1, current_choice_hour-3)).click()
         # 2024.08.05 current_choice_hour的获取可能有问题，页面有7，这里获取了10，暂时硬编码至6
 
-        await page.wait_for_timeout(2000)
+        await wait_hidden(page.locator('div.rc-virtual-list:visible'), timeout=4, replaces=2)
         await page.locator("button >> text=定时发布").click()
 
 
+    @staticmethod
+    async def published_or_blocked(page, security_check) -> bool:
+        return "builder/rc/clue" in page.url or await security_check.count()
+
     async def handle_upload_error(self, page):
         # 日后实现，目前没遇到
         return
         print("视频出错了，重新上传中")
 
     async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path, proxy=self.proxy_setting)
+        self.tracer.phase("launch")
+        # 使用 Chromium 浏览器启动一个浏览器实例（传入浏览器池时从池中借用）
+        launch_options = self.launch_profile.launch_options(self.headless, self.local_executable_path,
+                                                            proxy=self.proxy_setting)
         # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}", user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.4324.150 Safari/537.36')
-        # context = await set_init_script(context)
-        await context.grant_permissions(['geolocation'])
-
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://baijiahao.baidu.com/builder/rc/edit?type=videoV2", timeout=60000)
-        baijiahao_logger.info(f"正在上传-------{self.title}.mp4")
-        # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-        baijiahao_logger.info('正在打开主页...')
-        await page.wait_for_url("https://baijiahao.baidu.com/builder/rc/edit?type=videoV2", timeout=60000)
-
-        # 点击 "上传视频" 按钮
-        await page.locator("div[class^='video-main-container'] input").set_input_files(self.file_path)
-
-        # 等待页面跳转到指定的 URL
-        while True:
-            # 判断是是否进入视频发布页面，没进入，则自动等待到超时
-            try:
-                await page.wait_for_selector("div#formMain:visible")
-                break
-            except:
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options,
+            **self.launch_profile.context_options(storage_state=f"{self.account_file}",
+                                                  user_agent=BAIJIAHAO_USER_AGENT))
+        try:
+            # context = await set_init_script(context)
+            await context.grant_permissions(['geolocation'])
+
+            start_wait_stats()
+            # 创建一个新的页面
+            page = await context.new_page()
+            self.diagnostics.attach(page)
+            # 访问指定的 URL
+            self.tracer.phase("navigate")
+            await page.goto("https://baijiahao.baidu.com/builder/rc/edit?type=videoV2", timeout=60000)
+            baijiahao_logger.info(f"正在上传-------{self.title}.mp4")
+            # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+            baijiahao_logger.info('正在打开主页...')
+            await page.wait_for_url("https://baijiahao.baidu.com/builder/rc/edit?type=videoV2", timeout=60000)
+
+            # 点击 "上传视频" 按钮
+            self.tracer.phase("file_input", size=os.path.getsize(self.file_path))
+            await page.locator("div[class^='video-main-container'] input").set_input_files(self.file_path)
+
+            # 等待进入视频发布页面
+            retry = PAGE_RETRY.start("进入视频发布页")
+            while not await wait_visible(page.locator("div#formMain"), timeout=30, max_interval=1):
                 baijiahao_logger.info("正在等待进入视频发布页面...")
-                await asyncio.sleep(0.1)
-
-        # 填充标题和话题
-        # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
-        baijiahao_logger.info("正在填充标题和话题...")
-        await self.add_title_tags(page)
-
-        upload_status = await self.uploading_video(page)
-        if not upload_status:
-            baijiahao_logger.error(f"发现上传出错了... 文件:{self.file_path}")
-            raise
-
-        # 判断视频封面图是否生成成功
-        while True:
+                retry.failed()
+
+            # 填充标题和话题
+            # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
+            self.tracer.phase("form")
+            await wait_visible(page.get_by_placeholder('添加标题获得更多推荐'), timeout=3, replaces=1)
+            baijiahao_logger.info("正在填充标题和话题...")
+            await self.add_title_tags(page)
+
+            self.tracer.phase("transcode")
+            upload_status = await self.uploading_video(page)
+            if not upload_status:
+                baijiahao_logger.error(f"发现上传出错了... 文件:{self.file_path}")
+                raise Exception(f"百家号视频上传失败: {self.file_path}")
+
+            # 判断视频封面图是否生成成功
             baijiahao_logger.info("正在确认封面完成, 准备去点击定时/发布...")
-            if await page.locator("div.cheetah-spin-container img").count():
-                baijiahao_logger.info("封面已完成，点击定时/发布...")
-                break
-            else:
+            retry = TRANSFER_POLL.start("等待封面生成")
+            while not await wait_until(page.locator("div.cheetah-spin-container img").count, timeout=10, max_interval=1):
                 baijiahao_logger.info("等待封面生成...")
-                await asyncio.sleep(3)
-
-        await self.publish_video(page, self.publish_date)
-        await page.wait_for_timeout(2000)
-        if await page.locator('div.passMod_dialog-container >> text=百度安全验证:visible').count():
-            baijiahao_logger.error("出现验证，退出")
-            raise Exception("出现验证，退出")
-        await page.wait_for_url("https://baijiahao.baidu.com/builder/rc/clue**", timeout=5000)
-        baijiahao_logger.success("视频发布成功")
-
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        baijiahao_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+                retry.failed()
+            baijiahao_logger.info("封面已完成，点击定时/发布...")
+
+            self.tracer.phase("publish", scheduled=self.publish_date != 0)
+            await self.publish_video(page, self.publish_date)
+            # 等待跳转或出现安全验证
+            security_check = page.locator('div.passMod_dialog-container >> text=百度安全验证:visible')
+            await wait_until(lambda: self.published_or_blocked(page, security_check), timeout=2, replaces=2)
+            if await page.locator('div.passMod_dialog-container >> text=百度安全验证:visible').count():
+                baijiahao_logger.error("出现验证，退出")
+                raise Exception("出现验证，退出")
+            await page.wait_for_url("https://baijiahao.baidu.com/builder/rc/clue**", timeout=5000)
+            baijiahao_logger.success("视频发布成功")
+
+            self.tracer.phase("cleanup")
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            baijiahao_logger.info('cookie更新完毕！')
+            log_wait_stats(baijiahao_logger, self.tracer)
+            if not self.headless:
+                await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+        except BaseException as e:
+            # 先保存失败现场，关闭上下文后页面就没了
+            await self.diagnostics.failed(e)
+            raise
+        finally:
+            # 关闭浏览器上下文和浏览器实例（出错、被取消时也要归还浏览器池）
+            await close_browser_context(context, browser, self.browser_pool)
+        self.tracer.finish()
 
 
-    @async_retry(timeout=300)  # 例如，最多重试3次，超时时间为180秒
     async def uploading_video(self, page):
-        while True:
-            upload_failed = await page.locator('div .cover-overlay:has-text("上传失败")').count()
-            if upload_failed:
-                baijiahao_logger.error("发现上传出错了...")
-                # await self.handle_upload_error(page)  # 假设这是处理上传错误的函数
-                return False
-
-            uploading = await page.locator('div .cover-overlay:has-text("上传中")').count()
-            if uploading:
-                baijiahao_logger.info("正在上传视频中...")
-                await asyncio.sleep(2)  # 等待2秒再次检查
-                continue
-
-            # 检查上传是否成功
-            if not uploading and not upload_failed:
-                baijiahao_logger.success("视频上传完毕")
-                return True
+        upload_failed = page.locator('div .cover-overlay:has-text("上传失败")')
+        uploading = page.locator('div .cover-overlay:has-text("上传中")')
+
+        async def finished_or_failed():
+            return await upload_failed.count() or not await uploading.count()
+
+        retry = TRANSFER_POLL.start("等待视频上传")
+        while not await wait_until(finished_or_failed, timeout=10, max_interval=2):
+            baijiahao_logger.info("正在上传视频中...")
+            retry.failed()
+        if await upload_failed.count():
+            baijiahao_logger.error("发现上传出错了...")
+            # await self.handle_upload_error(page)  # 假设这是处理上传错误的函数
+            return False
+        baijiahao_logger.success("视频上传完毕")
+        return True
 
     async def set_schedule_publish(self, page, publish_date):
         while True:
@@ -212,7 +248,7 @@ class BaiJiaHaoVideo(object):
             try:
                 await schedule_element.click()
                 await page.wait_for_selector('div.select-wrap:visible', timeout=3000)
-                await page.wait_for_timeout(timeout=2000)
+                await wait_count_stable(page.locator('div.select-wrap'), timeout=3, replaces=2)
                 baijiahao_logger.info("开始点击发布定时...")
                 await self.set_schedule_time(page, publish_date)
                 break
@@ -245,21 +281,34 @@ class BaiJiaHaoVideo(object):
         await title_container.fill(self.title[:30])
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        if await publish_log.already_published(SOCIAL_MEDIA_BAIJIAHAO, self.account_file, self.file_path,
+                                               self.allow_duplicate):
+            return
+        # 平台连续失败时熔断，不再启动浏览器（见 utils/retry.py）
+        with circuit_breakers.guard(SOCIAL_MEDIA_BAIJIAHAO):
+            await upload_rate_limiter.acquire(SOCIAL_MEDIA_BAIJIAHAO, self.account_file)
+            with self.tracer:
+                if self.browser_pool is not None:
+                    async with self.diagnostics:
+                        await self.upload(None)
+                else:
+                    async with async_playwright() as playwright, self.diagnostics:
+                        await self.upload(playwright)
+        await publish_log.record(SOCIAL_MEDIA_BAIJIAHAO, self.account_file, self.file_path, self.publish_date)
 
 
 
     # 使用 AI成片 功能
     async def ai2video(self, playwright: Playwright) -> None:
         # 使用 Chromium 浏览器启动一个浏览器实例
-        browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path, proxy=self.proxy_setting)
+        browser = await playwright.chromium.launch(**self.launch_profile.launch_options(
+            self.headless, self.local_executable_path, proxy=self.proxy_setting))
         # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(
+        context = await browser.new_context(**self.launch_profile.context_options(
             viewport={"width": 1600, "height": 900},
             storage_state=f"{self.account_file}",
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.4324.150 Safari/537.36'
-        )
+            user_agent=BAIJIAHAO_USER_AGENT
+        ))
         # context = await set_init_script(context)
         await context.grant_permissions(['geolocation'])
 
@@ -1,9 +1,14 @@
 import json
 import pathlib
 import random
+from datetime import datetime
 from biliup.plugins.bili_webup import BiliBili, Data
 
+from utils.base_social_media import SOCIAL_MEDIA_BILIBILI
 from utils.log import bilibili_logger
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.tracing import UploadTracer
 
 
 def extract_keys_from_json(data):
@@ -40,7 +45,7 @@ def random_emoji():
 
 
 class BilibiliUploader(object):
-    def __init__(self, cookie_data, file: pathlib.Path, title, desc, tid, tags, dtime):
+    def __init__(self, cookie_data, file: pathlib.Path, title, desc, tid, tags, dtime, allow_duplicate=False):
         self.upload_thread_num = 3
         self.copyright = 1
         self.lines = 'AUTO'
@@ -51,6 +56,8 @@ class BilibiliUploader(object):
         self.tid = tid
         self.tags = tags
         self.dtime = dtime
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
+        self.tracer = UploadTracer(SOCIAL_MEDIA_BILIBILI, "", file)
         self._init_data()
 
     def _init_data(self):
@@ -63,16 +70,25 @@ class BilibiliUploader(object):
         self.data.dtime = self.dtime
 
     def upload(self):
-        with BiliBili(self.data) as bili:
+        account = self.cookie_data.get("DedeUserID", "")
+        if publish_log.already_published_sync(SOCIAL_MEDIA_BILIBILI, account, self.file, self.allow_duplicate):
+            return False
+        upload_rate_limiter.acquire_sync(SOCIAL_MEDIA_BILIBILI, account)
+        with self.tracer, BiliBili(self.data) as bili:
+            self.tracer.phase("navigate")
             bili.login_by_cookies(self.cookie_data)
             bili.access_token = self.cookie_data.get('access_token')
+            self.tracer.phase("transcode", size=self.file.stat().st_size)
             video_part = bili.upload_file(str(self.file), lines=self.lines,
                                           tasks=self.upload_thread_num)  # 上传视频，默认线路AUTO自动选择，线程数量3。
             video_part['title'] = self.title
             self.data.append(video_part)
+            self.tracer.phase("publish")
             ret = bili.submit()  # 提交视频
             if ret.get('code') == 0:
                 bilibili_logger.success(f'[+] {self.file.name}上传 成功')
+                publish_log.record_sync(SOCIAL_MEDIA_BILIBILI, account,
+                                        self.file, datetime.fromtimestamp(self.dtime) if self.dtime else None)
                 return True
             else:
                 bilibili_logger.error(f'[-] {self.file.name}上传 失败, error messge: {ret.get("message")}')
@@ -5,16 +5,33 @@ from playwright.async_api import Playwright, async_playwright, Page
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS, UPLOAD_WATCH_NETWORK
+from uploader.douyin_uploader.network_events import DouyinNetworkEvents
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_DOUYIN
+from utils.browser_pool import open_browser_context, close_browser_context
+from utils.browser_server import launch_or_connect
+from utils.diagnostics import UploadDiagnostics
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.retry import circuit_breakers, PUBLISH_RETRY, PAGE_RETRY, TRANSFER_POLL, REUPLOAD_RETRY
+from utils.login_guard import ensure_logged_in
+from utils.resource_policy import apply_validation_policy
+from utils.tracing import UploadTracer
+from utils.upload_progress import UploadProgress
 from utils.log import douyin_logger
 
+# 网络事件模式下，多久没有等到结果就用页面元素兜底检查一次（秒）
+UPLOAD_EVENT_TIMEOUT = 30
+PUBLISH_EVENT_TIMEOUT = 5
+
 
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
+        browser = await launch_or_connect(playwright, {'headless': LOCAL_CHROME_HEADLESS})
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
+        context = await apply_validation_policy(context, SOCIAL_MEDIA_DOUYIN)
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -47,11 +64,10 @@ async def douyin_setup(account_file, handle=False):
 
 async def douyin_cookie_gen(account_file):
     async with async_playwright() as playwright:
-        options = {
-            'headless': LOCAL_CHROME_HEADLESS
-        }
+        # 扫码登录需要人工操作，无头模式仍按 LOCAL_CHROME_HEADLESS，其余参数取默认启动配置
+        options = get_launch_profile().launch_options(headless=LOCAL_CHROME_HEADLESS)
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
+        browser = await launch_or_connect(playwright, options, interactive=True)
         # Setup context however you like.
         context = await browser.new_context()  # Pass any options
         context = await set_init_script(context)
@@ -64,18 +80,26 @@ async def douyin_cookie_gen(account_file):
 
 
 class DouYinVideo(object):
-    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, thumbnail_path=None, productLink='', productTitle=''):
+    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, thumbnail_path=None, productLink='', productTitle='', browser_pool=None,
+                 watch_network=UPLOAD_WATCH_NETWORK, launch_profile=None, allow_duplicate=False):
         self.title = title  # 视频标题
         self.file_path = file_path
         self.tags = tags
         self.publish_date = publish_date
         self.account_file = account_file
         self.date_format = '%Y年%m月%d日 %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)  # 浏览器启动配置，见 utils/launch_profiles.py
+        self.local_executable_path = self.launch_profile.executable_path
+        self.headless = self.launch_profile.headless
         self.thumbnail_path = thumbnail_path
         self.productLink = productLink
         self.productTitle = productTitle
+        self.browser_pool = browser_pool
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
+        self.progress = None
+        self.tracer = UploadTracer(SOCIAL_MEDIA_DOUYIN, account_file, file_path)
+        self.diagnostics = UploadDiagnostics(self.tracer)  # 上传失败时保存现场截图和 DOM
+        self.watch_network = watch_network  # 通过网络事件判断上传 / 发布结果，代替轮询页面元素
 
     async def set_schedule_time_douyin(self, page, publish_date):
         # 选择包含特定文本内容的 label 元素
@@ -97,134 +121,206 @@ class DouYinVideo(object):
         douyin_logger.info('视频出错了，重新上传中')
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
-        else:
-            browser = await playwright.chromium.launch(headless=self.headless)
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        context = await set_init_script(context)
+    async def wait_upload_by_events(self, page, events: DouyinNetworkEvents):
+        """等待上传提交请求返回；一段时间没有结果时用页面上的"重新上传"按钮兜底判断"""
+        retry = TRANSFER_POLL.start("等待视频上传")
+        reupload = REUPLOAD_RETRY.start("重新上传视频")
+        while True:
+            try:
+                if await events.wait_upload(UPLOAD_EVENT_TIMEOUT):
+                    douyin_logger.success("  [-]视频上传完毕")
+                    return
+            except asyncio.TimeoutError:
+                if await page.locator('[class^="long-card"] div:has-text("重新上传")').count():
+                    douyin_logger.success("  [-]视频上传完毕")
+                    return
+                douyin_logger.info(f"  [-] 正在上传视频中... {self.progress.describe()}")
+                # wait_upload 已经等过，这里只检查是否超过 UPLOAD_TRANSFER_TIMEOUT
+                retry.failed()
+            # 分片失败时上传组件可能会自己重试，以页面提示为准再决定是否重新上传
+            if await page.locator('div.progress-div > div:has-text("上传失败")').count():
+                douyin_logger.error("  [-] 发现上传出错了... 准备重试")
+                retry.failed()
+                await reupload.backoff(Exception(f"抖音上传出错: {self.file_path}"))
+                events.reset_upload()
+                await self.handle_upload_error(page)
+            else:
+                events.upload_failed.clear()
 
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.douyin.com/creator-micro/content/upload")
-        douyin_logger.info(f'[+]正在上传-------{self.title}.mp4')
-        # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-        douyin_logger.info(f'[-] 正在打开主页...')
-        await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload")
-        # 点击 "上传视频" 按钮
-        await page.locator("div[class^='container'] input").set_input_files(self.file_path)
-
-        # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
+    async def publish_by_events(self, page, events: DouyinNetworkEvents):
+        """点击发布后等待发布接口返回或跳转到作品管理页"""
+        retry = PUBLISH_RETRY.start("发布")
         while True:
+            events.reset_publish()
+            publish_button = page.get_by_role('button', name="发布", exact=True)
+            if await publish_button.count():
+                await publish_button.click()
             try:
-                # 尝试等待第一个 URL
-                await page.wait_for_url(
-                    "https://creator.douyin.com/creator-micro/content/publish?enter_from=publish_page", timeout=3000)
-                douyin_logger.info("[+] 成功进入version_1发布页面!")
-                break  # 成功进入页面后跳出循环
-            except Exception:
+                if await events.wait_publish(PUBLISH_EVENT_TIMEOUT):
+                    douyin_logger.success("  [-]视频发布成功")
+                    return
+            except asyncio.TimeoutError:
+                pass
+            # 尝试处理封面问题
+            await self.handle_auto_video_cover(page)
+            douyin_logger.info("  [-] 视频正在发布中...")
+            retry.failed()
+
+    async def upload(self, playwright: Playwright) -> None:
+        self.tracer.phase("launch")
+        # 使用 Chromium 浏览器启动一个浏览器实例（传入浏览器池时从池中借用）
+        launch_options = self.launch_profile.launch_options(self.headless, self.local_executable_path)
+        # 创建一个浏览器上下文，使用指定的 cookie 文件
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options,
+            **self.launch_profile.context_options(storage_state=f"{self.account_file}"))
+        try:
+            context = await set_init_script(context)
+
+            # 创建一个新的页面
+            page = await context.new_page()
+            self.diagnostics.attach(page)
+            # 统计视频分片上传的字节数、耗时和吞吐量
+            self.progress = UploadProgress(page, SOCIAL_MEDIA_DOUYIN, self.account_file, self.file_path)
+            # 在打开上传页之前开始监听，避免漏掉上传过程中的请求
+            events = DouyinNetworkEvents(page) if self.watch_network else None
+            # 访问指定的 URL
+            self.tracer.phase("navigate")
+            await page.goto("https://creator.douyin.com/creator-micro/content/upload")
+            douyin_logger.info(f'[+]正在上传-------{self.title}.mp4')
+            # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+            douyin_logger.info(f'[-] 正在打开主页...')
+            await ensure_logged_in(page, "div[class^='container'] input", ["text=手机号登录", "text=扫码登录"],
+                                   SOCIAL_MEDIA_DOUYIN, self.account_file)
+            # 点击 "上传视频" 按钮
+            self.tracer.phase("file_input", size=self.progress.total_bytes)
+            await page.locator("div[class^='container'] input").set_input_files(self.file_path)
+
+            # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
+            retry = PAGE_RETRY.start("进入视频发布页")
+            while True:
                 try:
-                    # 如果第一个 URL 超时，再尝试等待第二个 URL
+                    # 尝试等待第一个 URL
                     await page.wait_for_url(
-                        "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page",
-                        timeout=3000)
-                    douyin_logger.info("[+] 成功进入version_2发布页面!")
-
+                        "https://creator.douyin.com/creator-micro/content/publish?enter_from=publish_page", timeout=3000)
+                    douyin_logger.info("[+] 成功进入version_1发布页面!")
                     break  # 成功进入页面后跳出循环
-                except:
-                    print("  [-] 超时未进入视频发布页面，重新尝试...")
-                    await asyncio.sleep(0.5)  # 等待 0.5 秒后重新尝试
-        # 填充标题和话题
-        # 检查是否存在包含输入框的元素
-        # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
-        douyin_logger.info(f'  [-] 正在填充标题和话题...')
-        title_container = page.get_by_text('作品标题').locator("..").locator("xpath=following-sibling::div[1]").locator("input")
-        if await title_container.count():
-            await title_container.fill(self.title[:30])
-        else:
-            titlecontainer = page.locator(".notranslate")
-            await titlecontainer.click()
-            await page.keyboard.press("Backspace")
-            await page.keyboard.press("Control+KeyA")
-            await page.keyboard.press("Delete")
-            await page.keyboard.type(self.title)
-            await page.keyboard.press("Enter")
-        css_selector = ".zone-container"
-        for index, tag in enumerate(self.tags, start=1):
-            await page.type(css_selector, "#" + tag)
-            await page.press(css_selector, "Space")
-        douyin_logger.info(f'总共添加{len(self.tags)}个话题')
-        while True:
-            # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
-            try:
-                #  新版：定位重新上传
-                number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
-                if number > 0:
-                    douyin_logger.success("  [-]视频上传完毕")
-                    break
-                else:
-                    douyin_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-
-                    if await page.locator('div.progress-div > div:has-text("上传失败")').count():
-                        douyin_logger.error("  [-] 发现上传出错了... 准备重试")
-                        await self.handle_upload_error(page)
-            except:
-                douyin_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
-
-        if self.productLink and self.productTitle:
-            douyin_logger.info(f'  [-] 正在设置商品链接...')
-            await self.set_product_link(page, self.productLink, self.productTitle)
-            douyin_logger.info(f'  [+] 完成设置商品链接...')
+                except Exception:
+                    try:
+                        # 如果第一个 URL 超时，再尝试等待第二个 URL
+                        await page.wait_for_url(
+                            "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page",
+                            timeout=3000)
+                        douyin_logger.info("[+] 成功进入version_2发布页面!")
+
+                        break  # 成功进入页面后跳出循环
+                    except Exception as e:
+                        print("  [-] 超时未进入视频发布页面，重新尝试...")
+                        await retry.backoff(e)
+            # 填充标题和话题
+            # 检查是否存在包含输入框的元素
+            # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
+            self.tracer.phase("form", tags=len(self.tags))
+            await asyncio.sleep(1)
+            douyin_logger.info(f'  [-] 正在填充标题和话题...')
+            title_container = page.get_by_text('作品标题').locator("..").locator("xpath=following-sibling::div[1]").locator("input")
+            if await title_container.count():
+                await title_container.fill(self.title[:30])
+            else:
+                titlecontainer = page.locator(".notranslate")
+                await titlecontainer.click()
+                await page.keyboard.press("Backspace")
+                await page.keyboard.press("Control+KeyA")
+                await page.keyboard.press("Delete")
+                await page.keyboard.type(self.title)
+                await page.keyboard.press("Enter")
+            css_selector = ".zone-container"
+            for index, tag in enumerate(self.tags, start=1):
+                await page.type(css_selector, "#" + tag)
+                await page.press(css_selector, "Space")
+            douyin_logger.info(f'总共添加{len(self.tags)}个话题')
+            self.tracer.phase("transcode", watch_network=events is not None)
+            if events is not None:
+                await self.wait_upload_by_events(page, events)
+            else:
+                retry = TRANSFER_POLL.start("等待视频上传")
+                while True:
+                    # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
+                    try:
+                        #  新版：定位重新上传
+                        number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
+                        if number > 0:
+                            douyin_logger.success("  [-]视频上传完毕")
+                            break
+                        douyin_logger.info(f"  [-] 正在上传视频中... {self.progress.describe()}")
+                        if await page.locator('div.progress-div > div:has-text("上传失败")').count():
+                            douyin_logger.error("  [-] 发现上传出错了... 准备重试")
+                            await self.handle_upload_error(page)
+                    except Exception:
+                        douyin_logger.info("  [-] 正在上传视频中...")
+                    await retry.backoff()
+
+            self.tracer.phase("form")
+            if self.productLink and self.productTitle:
+                douyin_logger.info(f'  [-] 正在设置商品链接...')
+                await self.set_product_link(page, self.productLink, self.productTitle)
+                douyin_logger.info(f'  [+] 完成设置商品链接...')
         
-        #上传视频封面
-        await self.set_thumbnail(page, self.thumbnail_path)
+            #上传视频封面
+            await self.set_thumbnail(page, self.thumbnail_path)
 
-        # 更换可见元素
-        await self.set_location(page, "")
+            # 更换可见元素
+            await self.set_location(page, "")
 
 
-        # 頭條/西瓜
-        third_part_element = '[class^="info"] > [class^="first-part"] div div.semi-switch'
-        # 定位是否有第三方平台
-        if await page.locator(third_part_element).count():
-            # 检测是否是已选中状态
-            if 'semi-switch-checked' not in await page.eval_on_selector(third_part_element, 'div => div.className'):
-                await page.locator(third_part_element).locator('input.semi-switch-native-control').click()
+            # 頭條/西瓜
+            third_part_element = '[class^="info"] > [class^="first-part"] div div.semi-switch'
+            # 定位是否有第三方平台
+            if await page.locator(third_part_element).count():
+                # 检测是否是已选中状态
+                if 'semi-switch-checked' not in await page.eval_on_selector(third_part_element, 'div => div.className'):
+                    await page.locator(third_part_element).locator('input.semi-switch-native-control').click()
 
-        if self.publish_date != 0:
-            await self.set_schedule_time_douyin(page, self.publish_date)
+            if self.publish_date != 0:
+                self.tracer.phase("schedule")
+                await self.set_schedule_time_douyin(page, self.publish_date)
 
-        # 判断视频是否发布成功
-        while True:
             # 判断视频是否发布成功
-            try:
-                publish_button = page.get_by_role('button', name="发布", exact=True)
-                if await publish_button.count():
-                    await publish_button.click()
-                await page.wait_for_url("https://creator.douyin.com/creator-micro/content/manage**",
-                                        timeout=3000)  # 如果自动跳转到作品页面，则代表发布成功
-                douyin_logger.success("  [-]视频发布成功")
-                break
-            except:
-                # 尝试处理封面问题
-                await self.handle_auto_video_cover(page)
-                douyin_logger.info("  [-] 视频正在发布中...")
-                await page.screenshot(full_page=True)
-                await asyncio.sleep(0.5)
-
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        douyin_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+            self.tracer.phase("publish")
+            if events is not None:
+                await self.publish_by_events(page, events)
+                events.detach()
+            else:
+                retry = PUBLISH_RETRY.start("发布")
+                while True:
+                    # 判断视频是否发布成功
+                    try:
+                        publish_button = page.get_by_role('button', name="发布", exact=True)
+                        if await publish_button.count():
+                            await publish_button.click()
+                        await page.wait_for_url("https://creator.douyin.com/creator-micro/content/manage**",
+                                                timeout=3000)  # 如果自动跳转到作品页面，则代表发布成功
+                        douyin_logger.success("  [-]视频发布成功")
+                        break
+                    except Exception as e:
+                        # 尝试处理封面问题
+                        await self.handle_auto_video_cover(page)
+                        douyin_logger.info("  [-] 视频正在发布中...")
+                        await retry.backoff(e)
+
+            self.tracer.phase("cleanup")
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            douyin_logger.success('  [-]cookie更新完毕！')
+            await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+            self.progress.finish()
+        except BaseException as e:
+            # 先保存失败现场，关闭上下文后页面就没了
+            await self.diagnostics.failed(e)
+            raise
+        finally:
+            # 关闭浏览器上下文和浏览器实例（出错、被取消时也要归还浏览器池）
+            await close_browser_context(context, browser, self.browser_pool)
+        self.tracer.finish()
 
     async def handle_auto_video_cover(self, page):
         """
@@ -388,7 +484,19 @@ class DouYinVideo(object):
             return False
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        if await publish_log.already_published(SOCIAL_MEDIA_DOUYIN, self.account_file, self.file_path,
+                                               self.allow_duplicate):
+            return
+        # 平台连续失败时熔断，不再启动浏览器（见 utils/retry.py）
+        with circuit_breakers.guard(SOCIAL_MEDIA_DOUYIN):
+            await upload_rate_limiter.acquire(SOCIAL_MEDIA_DOUYIN, self.account_file)
+            with self.tracer:
+                if self.browser_pool is not None:
+                    async with self.diagnostics:
+                        await self.upload(None)
+                else:
+                    async with async_playwright() as playwright, self.diagnostics:
+                        await self.upload(playwright)
+        await publish_log.record(SOCIAL_MEDIA_DOUYIN, self.account_file, self.file_path, self.publish_date)
 
 
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+监听抖音创作者中心的网络请求，把视频上传和发布的结果转换成事件
+
+- 分片上传：上传到 VOD 存储的分片请求，任意一片失败即视为上传失败
+- 上传提交：vod.bytedanceapi.com 的 CommitUploadInner 成功返回即视为上传完成
+- 发布：aweme/create 接口返回 status_code == 0，或页面跳转到作品管理页，即视为发布成功
+
+接口地址变化时事件可能永远不会触发，所以调用方等待时都要带超时，并在超时后用页面元素兜底判断。
+"""
+import asyncio
+import re
+
+from playwright.async_api import Page, Request, Response
+
+from utils.log import douyin_logger
+
+UPLOAD_CHUNK_PATTERN = re.compile(r"/upload/v1/|[?&]part_number=|[?&]uploadid=|/tos-[^/]+/")
+UPLOAD_COMMIT_PATTERN = re.compile(r"vod\.bytedanceapi\.com/.*Action=CommitUpload")
+PUBLISH_PATTERN = re.compile(r"creator\.douyin\.com/web/api/media/aweme/create")
+MANAGE_URL_PATTERN = re.compile(r"creator\.douyin\.com/creator-micro/content/manage")
+
+
+class DouyinNetworkEvents(object):
+    def __init__(self, page: Page):
+        self.page = page
+        self.chunks = 0
+        self.upload_done = asyncio.Event()
+        self.upload_failed = asyncio.Event()
+        self.published = asyncio.Event()
+        self.publish_failed = asyncio.Event()
+        self.publish_error = None
+        page.on("response", self._on_response)
+        page.on("requestfailed", self._on_request_failed)
+        page.on("framenavigated", self._on_navigated)
+
+    def detach(self):
+        self.page.remove_listener("response", self._on_response)
+        self.page.remove_listener("requestfailed", self._on_request_failed)
+        self.page.remove_listener("framenavigated", self._on_navigated)
+
+    def reset_upload(self):
+        """重新上传前清除上一次的结果"""
+        self.chunks = 0
+        self.upload_done.clear()
+        self.upload_failed.clear()
+
+    def reset_publish(self):
+        self.publish_error = None
+        self.publish_failed.clear()
+
+    async def wait_upload(self, timeout) -> bool:
+        """
+        等待上传结果
+
+        Returns:
+            True 上传完成 / False 上传失败；超时抛出 asyncio.TimeoutError
+        """
+        return await self._wait_either(self.upload_done, self.upload_failed, timeout)
+
+    async def wait_publish(self, timeout) -> bool:
+        """
+        等待发布结果
+
+        Returns:
+            True 发布成功 / False 接口返回失败；超时抛出 asyncio.TimeoutError
+        """
+        return await self._wait_either(self.published, self.publish_failed, timeout)
+
+    @staticmethod
+    async def _wait_either(success: asyncio.Event, failure: asyncio.Event, timeout) -> bool:
+        waiters = [asyncio.ensure_future(success.wait()), asyncio.ensure_future(failure.wait())]
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        if not done:
+            raise asyncio.TimeoutError()
+        return success.is_set()
+
+    async def _on_response(self, response: Response):
+        url = response.url
+        try:
+            if UPLOAD_COMMIT_PATTERN.search(url):
+                data = await response.json()
+                error = (data.get("ResponseMetadata") or {}).get("Error")
+                if response.ok and not error:
+                    douyin_logger.info(f"  [-] 上传提交成功，共 {self.chunks} 个分片")
+                    self.upload_done.set()
+                else:
+                    douyin_logger.error(f"  [-] 上传提交失败: {error or response.status}")
+                    self.upload_failed.set()
+            elif PUBLISH_PATTERN.search(url):
+                data = await response.json()
+                if response.ok and data.get("status_code") == 0:
+                    self.published.set()
+                else:
+                    self.publish_error = data.get("status_msg") or response.status
+                    douyin_logger.error(f"  [-] 发布接口返回失败: {self.publish_error}")
+                    self.publish_failed.set()
+            elif UPLOAD_CHUNK_PATTERN.search(url) and response.request.method in ("POST", "PUT"):
+                if response.ok:
+                    self.chunks += 1
+                else:
+                    douyin_logger.error(f"  [-] 分片上传失败: HTTP {response.status}")
+                    self.upload_failed.set()
+        except Exception as e:
+            # 响应体不是 JSON 或页面已关闭，交给超时兜底
+            douyin_logger.debug(f"解析网络响应失败 {url}: {e}")
+
+    def _on_request_failed(self, request: Request):
+        if request.method in ("POST", "PUT") and UPLOAD_CHUNK_PATTERN.search(request.url):
+            douyin_logger.error(f"  [-] 分片上传请求失败: {request.failure}")
+            self.upload_failed.set()
+
+    def _on_navigated(self, frame):
+        if frame == self.page.main_frame and MANAGE_URL_PATTERN.search(frame.url):
+            self.published.set()
@@ -5,17 +5,30 @@ from playwright.async_api import Playwright, async_playwright
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_KUAISHOU
+from utils.browser_pool import open_browser_context, close_browser_context
+from utils.browser_server import launch_or_connect
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.retry import circuit_breakers, PUBLISH_RETRY
+from utils.login_guard import ensure_logged_in
 from utils.files_times import get_absolute_path
+from utils.resource_policy import apply_validation_policy
+from utils.diagnostics import UploadDiagnostics
+from utils.tracing import UploadTracer
+from utils.upload_progress import UploadProgress
+from utils.wait import wait_until, wait_visible, wait_hidden, start_wait_stats, log_wait_stats
 from utils.log import kuaishou_logger
 
 
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
+        browser = await launch_or_connect(playwright, {'headless': LOCAL_CHROME_HEADLESS})
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
+        context = await apply_validation_policy(context, SOCIAL_MEDIA_KUAISHOU)
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -42,14 +55,10 @@ async def ks_setup(account_file, handle=False):
 
 async def get_ks_cookie(account_file):
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 扫码登录需要人工操作，无头模式仍按 LOCAL_CHROME_HEADLESS，其余参数取默认启动配置
+        options = get_launch_profile().launch_options(headless=LOCAL_CHROME_HEADLESS)
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
+        browser = await launch_or_connect(playwright, options, interactive=True)
         # Setup context however you like.
         context = await browser.new_context()  # Pass any options
         context = await set_init_script(context)
@@ -62,152 +71,180 @@ async def get_ks_cookie(account_file):
 
 
 class KSVideo(object):
-    def __init__(self, title, file_path, tags, publish_date: datetime, account_file):
+    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, browser_pool=None, launch_profile=None,
+                 allow_duplicate=False):
         self.title = title  # 视频标题
         self.file_path = file_path
         self.tags = tags
         self.publish_date = publish_date
         self.account_file = account_file
         self.date_format = '%Y-%m-%d %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)  # 浏览器启动配置，见 utils/launch_profiles.py
+        self.local_executable_path = self.launch_profile.executable_path
+        self.headless = self.launch_profile.headless
+        self.browser_pool = browser_pool
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
+        self.progress = None
+        self.tracer = UploadTracer(SOCIAL_MEDIA_KUAISHOU, account_file, file_path)
+        self.diagnostics = UploadDiagnostics(self.tracer)  # 上传失败时保存现场截图和 DOM
+
+    @staticmethod
+    async def has_text(locator, text) -> bool:
+        return text in await locator.inner_text()
 
     async def handle_upload_error(self, page):
         kuaishou_logger.error("视频出错了，重新上传中")
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
     async def upload(self, playwright: Playwright) -> None:
+        self.tracer.phase("launch")
         # 使用 Chromium 浏览器启动一个浏览器实例
         print(self.local_executable_path)
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                executable_path=self.local_executable_path,
-            )
-        else:
-            browser = await playwright.chromium.launch(
-                headless=self.headless
-            )  # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://cp.kuaishou.com/article/publish/video")
-        kuaishou_logger.info('正在上传-------{}.mp4'.format(self.title))
-        # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-        kuaishou_logger.info('正在打开主页...')
-        await page.wait_for_url("https://cp.kuaishou.com/article/publish/video")
-        # 点击 "上传视频" 按钮
-        upload_button = page.locator("button[class^='_upload-btn']")
-        await upload_button.wait_for(state='visible')  # 确保按钮可见
-
-        async with page.expect_file_chooser() as fc_info:
-            await upload_button.click()
-        file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
-
-        await asyncio.sleep(2)
-
-        # if not await page.get_by_text("封面编辑").count():
-        #     raise Exception("似乎没有跳转到到编辑页面")
-
-        await asyncio.sleep(1)
-
-        # 等待按钮可交互
-        new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
-        if await new_feature_button.count() > 0:
-            await new_feature_button.click()
-
-        kuaishou_logger.info("正在填充标题和话题...")
-        await page.get_by_text("描述").locator("xpath=following-sibling::div").click()
-        kuaishou_logger.info("clear existing title")
-        await page.keyboard.press("Backspace")
-        await page.keyboard.press("Control+KeyA")
-        await page.keyboard.press("Delete")
-        kuaishou_logger.info("filling new  title")
-        await page.keyboard.type(self.title)
-        await page.keyboard.press("Enter")
-
-        # 快手只能添加3个话题
-        for index, tag in enumerate(self.tags[:3], start=1):
-            kuaishou_logger.info("正在添加第%s个话题" % index)
-            await page.keyboard.type(f"#{tag} ")
-            await asyncio.sleep(2)
-
-        max_retries = 60  # 设置最大重试次数,最大等待时间为 2 分钟
-        retry_count = 0
-
-        while retry_count < max_retries:
-            try:
-                # 获取包含 '上传中' 文本的元素数量
-                number = await page.locator("text=上传中").count()
-
-                if number == 0:
+        launch_options = self.launch_profile.launch_options(self.headless, self.local_executable_path)
+        # 创建一个浏览器上下文，使用指定的 cookie 文件
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options,
+            **self.launch_profile.context_options(storage_state=f"{self.account_file}"))
+        try:
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            self.diagnostics.attach(page)
+            start_wait_stats()
+            # 统计视频分片上传的字节数、耗时和吞吐量
+            self.progress = UploadProgress(page, SOCIAL_MEDIA_KUAISHOU, self.account_file, self.file_path)
+            # 访问指定的 URL
+            self.tracer.phase("navigate")
+            await page.goto("https://cp.kuaishou.com/article/publish/video")
+            kuaishou_logger.info('正在上传-------{}.mp4'.format(self.title))
+            # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+            kuaishou_logger.info('正在打开主页...')
+            await ensure_logged_in(page, "button[class^='_upload-btn']", ["div.names div.container div.name:text('机构服务')"],
+                                   SOCIAL_MEDIA_KUAISHOU, self.account_file)
+            # 点击 "上传视频" 按钮
+            self.tracer.phase("file_input", size=self.progress.total_bytes)
+            upload_button = page.locator("button[class^='_upload-btn']")
+            await upload_button.wait_for(state='visible')  # 确保按钮可见
+
+            async with page.expect_file_chooser() as fc_info:
+                await upload_button.click()
+            file_chooser = await fc_info.value
+            await file_chooser.set_files(self.file_path)
+
+            # if not await page.get_by_text("封面编辑").count():
+            #     raise Exception("似乎没有跳转到到编辑页面")
+
+            # 等待进入编辑页（描述输入框出现）
+            description = page.get_by_text("描述").locator("xpath=following-sibling::div")
+            await wait_visible(description, timeout=10, replaces=3)
+
+            # 等待按钮可交互
+            new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
+            if await new_feature_button.count() > 0:
+                await new_feature_button.click()
+
+            self.tracer.phase("form", tags=len(self.tags[:3]))
+            kuaishou_logger.info("正在填充标题和话题...")
+            await description.click()
+            kuaishou_logger.info("clear existing title")
+            await page.keyboard.press("Backspace")
+            await page.keyboard.press("Control+KeyA")
+            await page.keyboard.press("Delete")
+            kuaishou_logger.info("filling new  title")
+            await page.keyboard.type(self.title)
+            await page.keyboard.press("Enter")
+
+            # 快手只能添加3个话题
+            for index, tag in enumerate(self.tags[:3], start=1):
+                kuaishou_logger.info("正在添加第%s个话题" % index)
+                await page.keyboard.type(f"#{tag} ")
+                # 等待话题写入描述框
+                await wait_until(lambda: self.has_text(description, f"#{tag}"), timeout=2, replaces=2)
+
+            # 等待"上传中"消失，最多 2 分钟
+            self.tracer.phase("transcode")
+            uploading = page.locator("text=上传中")
+            for _ in range(12):
+                if await wait_hidden(uploading, timeout=10, max_interval=2):
                     kuaishou_logger.success("视频上传完毕")
                     break
-                else:
-                    if retry_count % 5 == 0:
-                        kuaishou_logger.info("正在上传视频中...")
-                    await asyncio.sleep(2)
-            except Exception as e:
-                kuaishou_logger.error(f"检查上传状态时发生错误: {e}")
-                await asyncio.sleep(2)  # 等待 2 秒后重试
-            retry_count += 1
-
-        if retry_count == max_retries:
-            kuaishou_logger.warning("超过最大重试次数，视频上传可能未完成。")
-
-        # 定时任务
-        if self.publish_date != 0:
-            await self.set_schedule_time(page, self.publish_date)
-
-        # 判断视频是否发布成功
-        while True:
-            try:
-                publish_button = page.get_by_text("发布", exact=True)
-                if await publish_button.count() > 0:
-                    await publish_button.click()
-
-                await asyncio.sleep(1)
-                confirm_button = page.get_by_text("确认发布")
-                if await confirm_button.count() > 0:
-                    await confirm_button.click()
-
-                # 等待页面跳转，确认发布成功
-                await page.wait_for_url(
-                    "https://cp.kuaishou.com/article/manage/video?status=2&from=publish",
-                    timeout=5000,
-                )
-                kuaishou_logger.success("视频发布成功")
-                break
-            except Exception as e:
-                kuaishou_logger.info(f"视频正在发布中... 错误: {e}")
-                await page.screenshot(full_page=True)
-                await asyncio.sleep(1)
-
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        kuaishou_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+                kuaishou_logger.info(f"正在上传视频中... {self.progress.describe()}")
+            else:
+                kuaishou_logger.warning("超过最大等待时间，视频上传可能未完成。")
+
+            # 定时任务
+            if self.publish_date != 0:
+                self.tracer.phase("schedule")
+                await self.set_schedule_time(page, self.publish_date)
+
+            # 判断视频是否发布成功
+            self.tracer.phase("publish")
+            retry = PUBLISH_RETRY.start("点击发布")
+            while True:
+                try:
+                    publish_button = page.get_by_text("发布", exact=True)
+                    if await publish_button.count() > 0:
+                        await publish_button.click()
+
+                    confirm_button = page.get_by_text("确认发布")
+                    if await wait_visible(confirm_button, timeout=1, replaces=1):
+                        await confirm_button.click()
+
+                    # 等待页面跳转，确认发布成功
+                    await page.wait_for_url(
+                        "https://cp.kuaishou.com/article/manage/video?status=2&from=publish",
+                        timeout=5000,
+                    )
+                    kuaishou_logger.success("视频发布成功")
+                    break
+                except Exception as e:
+                    kuaishou_logger.info(f"视频正在发布中... 错误: {e}")
+                    await retry.backoff(e)
+
+            self.tracer.phase("cleanup")
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            kuaishou_logger.info('cookie更新完毕！')
+            log_wait_stats(kuaishou_logger, self.tracer)
+            if not self.headless:
+                await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+            self.progress.finish()
+        except BaseException as e:
+            # 先保存失败现场，关闭上下文后页面就没了
+            await self.diagnostics.failed(e)
+            raise
+        finally:
+            # 关闭浏览器上下文和浏览器实例（出错、被取消时也要归还浏览器池）
+            await close_browser_context(context, browser, self.browser_pool)
+        self.tracer.finish()
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        if await publish_log.already_published(SOCIAL_MEDIA_KUAISHOU, self.account_file, self.file_path,
+                                               self.allow_duplicate):
+            return
+        # 平台连续失败时熔断，不再启动浏览器（见 utils/retry.py）
+        with circuit_breakers.guard(SOCIAL_MEDIA_KUAISHOU):
+            await upload_rate_limiter.acquire(SOCIAL_MEDIA_KUAISHOU, self.account_file)
+            with self.tracer:
+                if self.browser_pool is not None:
+                    async with self.diagnostics:
+                        await self.upload(None)
+                else:
+                    async with async_playwright() as playwright, self.diagnostics:
+                        await self.upload(playwright)
+        await publish_log.record(SOCIAL_MEDIA_KUAISHOU, self.account_file, self.file_path, self.publish_date)
 
     async def set_schedule_time(self, page, publish_date):
         kuaishou_logger.info("click schedule")
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M:%S")
         await page.locator("label:text('发布时间')").locator('xpath=following-sibling::div').locator(
             '.ant-radio-input').nth(1).click()
-        await asyncio.sleep(1)
+        date_input = page.locator('div.ant-picker-input input[placeholder="选择日期时间"]')
+        await wait_visible(date_input, timeout=2, replaces=1)
 
-        await page.locator('div.ant-picker-input input[placeholder="选择日期时间"]').click()
-        await asyncio.sleep(1)
+        await date_input.click()
+        await wait_visible(page.locator('div.ant-picker-dropdown'), timeout=2, replaces=1)
 
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
-        await asyncio.sleep(1)
+        await wait_hidden(page.locator('div.ant-picker-dropdown'), timeout=2, replaces=1)
@@ -5,12 +5,25 @@ from playwright.async_api import Playwright, async_playwright
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_TENCENT
+from utils.browser_pool import open_browser_context, close_browser_context
+from utils.browser_server import launch_or_connect
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.retry import circuit_breakers, PUBLISH_RETRY, TRANSFER_POLL, REUPLOAD_RETRY
+from utils.login_guard import ensure_logged_in
 from utils.files_times import get_absolute_path
+from utils.resource_policy import apply_validation_policy
+from utils.checkpoint import UploadCheckpoint, STEP_FILE_UPLOADED, STEP_METADATA_FILLED, STEP_SCHEDULE_SET, \
+    STEP_DRAFT_SAVED, STEP_PUBLISHED
+from utils.diagnostics import UploadDiagnostics
+from utils.tracing import UploadTracer
+from utils.upload_progress import UploadProgress
+from utils.wait import wait_until, wait_hidden, wait_visible, start_wait_stats, log_wait_stats
 from utils.log import tencent_logger
 
-
 def format_str_for_short_title(origin_title: str) -> str:
     # 定义允许的特殊字符
     allowed_special_chars = "《》“”:+?%°"
@@ -33,9 +46,10 @@ def format_str_for_short_title(origin_title: str) -> str:
 
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
+        browser = await launch_or_connect(playwright, {'headless': LOCAL_CHROME_HEADLESS})
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
+        context = await apply_validation_policy(context, SOCIAL_MEDIA_TENCENT)
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -51,14 +65,10 @@ async def cookie_auth(account_file):
 
 async def get_tencent_cookie(account_file):
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB'
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 扫码登录需要人工操作，无头模式仍按 LOCAL_CHROME_HEADLESS，其余参数取默认启动配置
+        options = get_launch_profile().launch_options(headless=LOCAL_CHROME_HEADLESS)
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
+        browser = await launch_or_connect(playwright, options, interactive=True)
         # Setup context however you like.
         context = await browser.new_context()  # Pass any options
         # Pause the page, and start recording manually.
@@ -82,16 +92,24 @@ async def weixin_setup(account_file, handle=False):
 
 
 class TencentVideo(object):
-    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, category=None, is_draft=False):
+    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, category=None, is_draft=False, browser_pool=None,
+                 launch_profile=None, checkpoint=None, allow_duplicate=False):
         self.title = title  # 视频标题
         self.file_path = file_path
         self.tags = tags
         self.publish_date = publish_date
         self.account_file = account_file
         self.category = category
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)  # 浏览器启动配置，见 utils/launch_profiles.py
+        self.headless = self.launch_profile.headless
         self.is_draft = is_draft  # 是否保存为草稿
-        self.local_executable_path = LOCAL_CHROME_PATH or None
+        self.local_executable_path = self.launch_profile.executable_path
+        self.browser_pool = browser_pool
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
+        self.progress = None
+        self.tracer = UploadTracer(SOCIAL_MEDIA_TENCENT, account_file, file_path)
+        self.diagnostics = UploadDiagnostics(self.tracer)  # 上传失败时保存现场截图和 DOM
+        self.checkpoint = checkpoint or UploadCheckpoint()  # 已完成的步骤，重试时从草稿继续，见 utils/checkpoint.py
 
     async def set_schedule_time_tencent(self, page, publish_date):
         label_element = page.locator("label").filter(has_text="定时").nth(1)
@@ -136,45 +154,121 @@ class TencentVideo(object):
         await file_input.set_input_files(self.file_path)
 
     async def upload(self, playwright: Playwright) -> None:
+        if self.checkpoint.done(STEP_PUBLISHED):
+            # 上一次执行已经发布成功，之后的步骤（保存 cookie 等）才失败，不重复发布
+            tencent_logger.info(f'[+]{self.title} 上次已发布，跳过')
+            return
+        self.tracer.phase("launch")
         # 使用 Chromium (这里使用系统内浏览器，用chromium 会造成h264错误
-        browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
+        launch_options = self.launch_profile.launch_options(self.headless, self.local_executable_path)
         # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        context = await set_init_script(context)
-
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://channels.weixin.qq.com/platform/post/create")
-        tencent_logger.info(f'[+]正在上传-------{self.title}.mp4')
-        # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-        await page.wait_for_url("https://channels.weixin.qq.com/platform/post/create")
-        # await page.wait_for_selector('input[type="file"]', timeout=10000)
-        file_input = page.locator('input[type="file"]')
-        await file_input.set_input_files(self.file_path)
-        # 填充标题和话题
-        await self.add_title_tags(page)
-        # 添加商品
-        # await self.add_product(page)
-        # 合集功能
-        await self.add_collection(page)
-        # 原创选择
-        await self.add_original(page)
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options,
+            **self.launch_profile.context_options(storage_state=f"{self.account_file}"))
+        try:
+            context = await set_init_script(context)
+
+            # 创建一个新的页面
+            page = await context.new_page()
+            self.diagnostics.attach(page)
+            start_wait_stats()
+            # 统计视频分片上传的字节数、耗时和吞吐量
+            self.progress = UploadProgress(page, SOCIAL_MEDIA_TENCENT, self.account_file, self.file_path)
+            # 访问指定的 URL
+            self.tracer.phase("navigate")
+            # 上次文件传完后失败并存了草稿时，从草稿继续，不再重新上传文件
+            resumed = self.checkpoint.resumable and await self.open_draft(page)
+            if not resumed:
+                await page.goto("https://channels.weixin.qq.com/platform/post/create")
+                tencent_logger.info(f'[+]正在上传-------{self.title}.mp4')
+                # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+                await ensure_logged_in(page, 'input[type="file"]', ['div.title-name:has-text("微信小店")'],
+                                       SOCIAL_MEDIA_TENCENT, self.account_file)
+                # await page.wait_for_selector('input[type="file"]', timeout=10000)
+                self.tracer.phase("file_input", size=self.progress.total_bytes)
+                file_input = page.locator('input[type="file"]')
+                await file_input.set_input_files(self.file_path)
+            try:
+                await self.fill_and_publish(page, resumed)
+            except Exception:
+                # 文件已经传完时存为草稿，重试时从草稿继续
+                if self.checkpoint.done(STEP_FILE_UPLOADED) and not self.checkpoint.done(STEP_PUBLISHED):
+                    await self.save_draft(page)
+                raise
+
+            self.tracer.phase("cleanup")
+            await context.storage_state(path=f"{self.account_file}")  # 保存cookie
+            tencent_logger.success('  [-]cookie更新完毕！')
+            log_wait_stats(tencent_logger, self.tracer)
+            if not self.headless:
+                await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+            self.progress.finish()
+        except BaseException as e:
+            # 先保存失败现场，关闭上下文后页面就没了
+            await self.diagnostics.failed(e)
+            raise
+        finally:
+            # 关闭浏览器上下文和浏览器实例（出错、被取消时也要归还浏览器池）
+            await close_browser_context(context, browser, self.browser_pool)
+        self.tracer.finish()
+
+    async def fill_and_publish(self, page, resumed: bool):
+        # 草稿里已经有标题和话题，再输入一遍会重复
+        if not (resumed and self.checkpoint.done(STEP_METADATA_FILLED)):
+            # 填充标题和话题
+            self.tracer.phase("form", tags=len(self.tags))
+            await self.add_title_tags(page)
+            # 添加商品
+            # await self.add_product(page)
+            # 合集功能
+            await self.add_collection(page)
+            # 原创选择
+            await self.add_original(page)
+            await self.checkpoint.mark(STEP_METADATA_FILLED)
         # 检测上传状态
+        self.tracer.phase("transcode")
         await self.detect_upload_status(page)
+        await self.checkpoint.mark(STEP_FILE_UPLOADED)
         if self.publish_date != 0:
+            self.tracer.phase("schedule")
             await self.set_schedule_time_tencent(page, self.publish_date)
+            await self.checkpoint.mark(STEP_SCHEDULE_SET)
         # 添加短标题
+        self.tracer.phase("form")
         await self.add_short_title(page)
 
+        self.tracer.phase("publish", draft=self.is_draft)
         await self.click_publish(page)
+        await self.checkpoint.mark(STEP_PUBLISHED)
 
-        await context.storage_state(path=f"{self.account_file}")  # 保存cookie
-        tencent_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+    async def save_draft(self, page):
+        """发布前的步骤失败时把已上传的视频存为草稿，记录草稿箱地址"""
+        try:
+            await self.diagnostics.snapshot("before_draft")
+            await page.locator('div.form-btns button:has-text("保存草稿")').click(timeout=5000)
+            await page.wait_for_url("**/post/list**", timeout=10000)
+            await self.checkpoint.mark(STEP_DRAFT_SAVED, draft_url=page.url)
+            tencent_logger.info(f"  [-] 已存为草稿，重试时从草稿继续: {page.url}")
+        except Exception as e:
+            tencent_logger.warning(f"  [-] 保存草稿失败，重试时需要重新上传: {e}")
+
+    async def open_draft(self, page) -> bool:
+        """打开草稿箱中标题相同的草稿进入编辑；草稿已不存在时清除记录并返回 False，按原流程上传"""
+        try:
+            await page.goto(self.checkpoint.draft_url)
+            draft = page.locator('div.post-feed-item').filter(has_text=self.title[:16]).first
+            if not await wait_visible(draft, timeout=15):
+                raise Exception("草稿箱中没有找到该视频")
+            await draft.hover()
+            await draft.get_by_text("编辑", exact=True).first.click()
+            if not await wait_visible(page.locator("div.input-editor"), timeout=15):
+                raise Exception("草稿编辑页没有打开")
+        except Exception as e:
+            tencent_logger.warning(f"  [-] 无法从草稿继续，重新上传: {e}")
+            await self.checkpoint.discard_draft()
+            return False
+        tencent_logger.info(f'[+]从草稿继续发布-------{self.title}.mp4')
+        return True
 
     async def add_short_title(self, page):
         short_title_element = page.get_by_text("短标题", exact=True).locator("..").locator(
@@ -185,6 +279,8 @@ class TencentVideo(object):
             await short_title_element.fill(short_title)
 
     async def click_publish(self, page):
+        # 超过 PUBLISH_RETRY_DEADLINE 仍未跳转时按失败处理：文件已传完时存为草稿，重试时从草稿继续
+        retry = PUBLISH_RETRY.start("保存草稿" if self.is_draft else "发表")
         while True:
             try:
                 if self.is_draft:
@@ -217,28 +313,37 @@ class TencentVideo(object):
                         break
                 tencent_logger.exception(f"  [-] Exception: {e}")
                 tencent_logger.info("  [-] 视频正在发布中...")
-                await asyncio.sleep(0.5)
+                await retry.backoff(e)
 
     async def detect_upload_status(self, page):
+        publish_button = page.get_by_role("button", name="发表")
+
+        async def upload_finished_or_failed():
+            # "发表"按钮可点击代表视频上传完毕；出现错误提示和删除按钮代表上传出错
+            if "weui-desktop-btn_disabled" not in await publish_button.get_attribute('class'):
+                return True
+            return await page.locator('div.status-msg.error').count() and await page.locator(
+                'div.media-status-content div.tag-inner:has-text("删除")').count()
+
+        retry = TRANSFER_POLL.start("等待视频上传")
+        reupload = REUPLOAD_RETRY.start("重新上传视频")
         while True:
-            # 匹配删除按钮，代表视频上传完毕，如果不存在，代表视频正在上传，则等待
+            if not await wait_until(upload_finished_or_failed, timeout=10, max_interval=2):
+                tencent_logger.info(f"  [-] 正在上传视频中... {self.progress.describe()}")
+                retry.failed()
+                continue
             try:
-                # 匹配删除按钮，代表视频上传完毕
-                if "weui-desktop-btn_disabled" not in await page.get_by_role("button", name="发表").get_attribute(
-                        'class'):
+                if "weui-desktop-btn_disabled" not in await publish_button.get_attribute('class'):
                     tencent_logger.info("  [-]视频上传完毕")
                     break
-                else:
-                    tencent_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-                    # 出错了视频出错
-                    if await page.locator('div.status-msg.error').count() and await page.locator(
-                            'div.media-status-content div.tag-inner:has-text("删除")').count():
-                        tencent_logger.error("  [-] 发现上传出错了...准备重试")
-                        await self.handle_upload_error(page)
-            except:
-                tencent_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
+            except Exception as e:
+                # 按钮状态读不到时条件已经为真，不等待会一直空转
+                await retry.backoff(e)
+                continue
+            tencent_logger.error("  [-] 发现上传出错了...准备重试")
+            retry.failed()
+            await reupload.backoff(Exception(f"视频号上传出错: {self.file_path}"))
+            await self.handle_upload_error(page)
 
     async def add_title_tags(self, page):
         await page.locator("div.input-editor").click()
@@ -276,10 +381,23 @@ class TencentVideo(object):
                 await page.locator('div.form-content:visible').click()  # 下拉菜单
                 await page.locator(
                     f'div.form-content:visible ul.weui-desktop-dropdown__list li.weui-desktop-dropdown__list-ele:has-text("{self.category}")').first.click()
-                await page.wait_for_timeout(1000)
+                await wait_hidden(page.locator('div.form-content ul.weui-desktop-dropdown__list'), timeout=1, replaces=1)
             if await page.locator('button:has-text("声明原创"):visible').count():
                 await page.locator('button:has-text("声明原创"):visible').click()
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        if await publish_log.already_published(SOCIAL_MEDIA_TENCENT, self.account_file, self.file_path,
+                                               self.allow_duplicate):
+            return
+        # 平台连续失败时熔断，不再启动浏览器（见 utils/retry.py）
+        with circuit_breakers.guard(SOCIAL_MEDIA_TENCENT):
+            await upload_rate_limiter.acquire(SOCIAL_MEDIA_TENCENT, self.account_file)
+            with self.tracer:
+                if self.browser_pool is not None:
+                    async with self.diagnostics:
+                        await self.upload(None)
+                else:
+                    async with async_playwright() as playwright, self.diagnostics:
+                        await self.upload(playwright)
+        if not self.is_draft:
+            await publish_log.record(SOCIAL_MEDIA_TENCENT, self.account_file, self.file_path, self.publish_date)
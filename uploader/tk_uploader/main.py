@@ -6,8 +6,13 @@ from playwright.async_api import Playwright, async_playwright
 import os
 import asyncio
 from uploader.tk_uploader.tk_config import Tk_Locator
-from utils.base_social_media import set_init_script
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_TIKTOK
+from utils.browser_pool import open_browser_context, close_browser_context
 from utils.files_times import get_absolute_path
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.retry import circuit_breakers, PUBLISH_RETRY, TRANSFER_POLL
 from utils.log import tiktok_logger
 from conf import LOCAL_CHROME_HEADLESS
 
@@ -50,12 +55,8 @@ async def tiktok_setup(account_file, handle=False):
 
 async def get_tiktok_cookie(account_file):
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB',
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 扫码登录需要人工操作，无头模式仍按 LOCAL_CHROME_HEADLESS；Firefox 不使用配置里的 Chromium 参数
+        options = get_launch_profile().launch_options(headless=LOCAL_CHROME_HEADLESS, browser_type='firefox')
         # Make sure to run headed.
         browser = await playwright.firefox.launch(**options)
         # Setup context however you like.
@@ -70,14 +71,18 @@ async def get_tiktok_cookie(account_file):
 
 
 class TiktokVideo(object):
-    def __init__(self, title, file_path, tags, publish_date, account_file):
+    def __init__(self, title, file_path, tags, publish_date, account_file, browser_pool=None, launch_profile=None,
+                 allow_duplicate=False):
         self.title = title
         self.file_path = file_path
         self.tags = tags
         self.publish_date = publish_date
         self.account_file = account_file
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)  # 浏览器启动配置，见 utils/launch_profiles.py
+        self.headless = self.launch_profile.headless
         self.locator_base = None
+        self.browser_pool = browser_pool
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
 
 
     async def set_schedule_time(self, page, publish_date):
@@ -142,47 +147,50 @@ class TiktokVideo(object):
         await file_chooser.set_files(self.file_path)
 
     async def upload(self, playwright: Playwright) -> None:
-        browser = await playwright.firefox.launch(headless=self.headless)
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        context = await set_init_script(context)
-        page = await context.new_page()
+        launch_options = self.launch_profile.launch_options(self.headless, browser_type='firefox')
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options, browser_type='firefox',
+            **self.launch_profile.context_options(storage_state=f"{self.account_file}"))
+        try:
+            context = await set_init_script(context)
+            page = await context.new_page()
 
-        await page.goto("https://www.tiktok.com/creator-center/upload")
-        tiktok_logger.info(f'[+]Uploading-------{self.title}.mp4')
+            await page.goto("https://www.tiktok.com/creator-center/upload")
+            tiktok_logger.info(f'[+]Uploading-------{self.title}.mp4')
 
-        await page.wait_for_url("https://www.tiktok.com/tiktokstudio/upload", timeout=10000)
+            await page.wait_for_url("https://www.tiktok.com/tiktokstudio/upload", timeout=10000)
 
-        try:
-            await page.wait_for_selector('iframe[data-tt="Upload_index_iframe"], div.upload-container', timeout=10000)
-            tiktok_logger.info("Either iframe or div appeared.")
-        except Exception as e:
-            tiktok_logger.error("Neither iframe nor div appeared within the timeout.")
+            try:
+                await page.wait_for_selector('iframe[data-tt="Upload_index_iframe"], div.upload-container', timeout=10000)
+                tiktok_logger.info("Either iframe or div appeared.")
+            except Exception as e:
+                tiktok_logger.error("Neither iframe nor div appeared within the timeout.")
 
-        await self.choose_base_locator(page)
+            await self.choose_base_locator(page)
 
-        upload_button = self.locator_base.locator(
-            'button:has-text("Select video"):visible')
-        await upload_button.wait_for(state='visible')  # 确保按钮可见
+            upload_button = self.locator_base.locator(
+                'button:has-text("Select video"):visible')
+            await upload_button.wait_for(state='visible')  # 确保按钮可见
 
-        async with page.expect_file_chooser() as fc_info:
-            await upload_button.click()
-        file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+            async with page.expect_file_chooser() as fc_info:
+                await upload_button.click()
+            file_chooser = await fc_info.value
+            await file_chooser.set_files(self.file_path)
 
-        await self.add_title_tags(page)
-        # detact upload status
-        await self.detect_upload_status(page)
-        if self.publish_date != 0:
-            await self.set_schedule_time(page, self.publish_date)
+            await self.add_title_tags(page)
+            # detact upload status
+            await self.detect_upload_status(page)
+            if self.publish_date != 0:
+                await self.set_schedule_time(page, self.publish_date)
 
-        await self.click_publish(page)
+            await self.click_publish(page)
 
-        await context.storage_state(path=f"{self.account_file}")  # save cookie
-        tiktok_logger.info('  [-] update cookie！')
-        await asyncio.sleep(2)  # close delay for look the video status
-        # close all
-        await context.close()
-        await browser.close()
+            await context.storage_state(path=f"{self.account_file}")  # save cookie
+            tiktok_logger.info('  [-] update cookie！')
+            await asyncio.sleep(2)  # close delay for look the video status
+        finally:
+            # 关闭浏览器上下文和浏览器实例（出错、被取消时也要归还浏览器池）
+            await close_browser_context(context, browser, self.browser_pool)
 
     async def add_title_tags(self, page):
 
@@ -219,6 +227,7 @@ class TiktokVideo(object):
 
     async def click_publish(self, page):
         success_flag_div = '#\\:r9\\:'
+        retry = PUBLISH_RETRY.start("click publish")
         while True:
             try:
                 publish_button = self.locator_base.locator('div.btn-post')
@@ -235,24 +244,22 @@ class TiktokVideo(object):
                 else:
                     tiktok_logger.exception(f"  [-] Exception: {e}")
                     tiktok_logger.info("  [-] video publishing")
-                    await page.screenshot(full_page=True)
-                    await asyncio.sleep(0.5)
+                    await retry.backoff(e)
 
     async def detect_upload_status(self, page):
+        retry = TRANSFER_POLL.start("video upload")
         while True:
             try:
                 if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
                     tiktok_logger.info("  [-]video uploaded.")
                     break
-                else:
-                    tiktok_logger.info("  [-] video uploading...")
-                    await asyncio.sleep(2)
-                    if await self.locator_base.locator('button[aria-label="Select file"]').count():
-                        tiktok_logger.info("  [-] found some error while uploading now retry...")
-                        await self.handle_upload_error(page)
-            except:
                 tiktok_logger.info("  [-] video uploading...")
-                await asyncio.sleep(2)
+                if await self.locator_base.locator('button[aria-label="Select file"]').count():
+                    tiktok_logger.info("  [-] found some error while uploading now retry...")
+                    await self.handle_upload_error(page)
+            except Exception:
+                tiktok_logger.info("  [-] video uploading...")
+            await retry.backoff()
 
     async def choose_base_locator(self, page):
         # await page.wait_for_selector('div.upload-container')
@@ -262,6 +269,16 @@ class TiktokVideo(object):
             self.locator_base = page.locator(Tk_Locator.default) 
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        if await publish_log.already_published(SOCIAL_MEDIA_TIKTOK, self.account_file, self.file_path,
+                                               self.allow_duplicate):
+            return
+        # 平台连续失败时熔断，不再启动浏览器（见 utils/retry.py）
+        with circuit_breakers.guard(SOCIAL_MEDIA_TIKTOK):
+            await upload_rate_limiter.acquire(SOCIAL_MEDIA_TIKTOK, self.account_file)
+            if self.browser_pool is not None:
+                await self.upload(None)
+            else:
+                async with async_playwright() as playwright:
+                    await self.upload(playwright)
+        await publish_log.record(SOCIAL_MEDIA_TIKTOK, self.account_file, self.file_path, self.publish_date)
 
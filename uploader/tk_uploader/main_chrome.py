@@ -6,16 +6,25 @@ from playwright.async_api import Playwright, async_playwright
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
+from conf import LOCAL_CHROME_HEADLESS
 from uploader.tk_uploader.tk_config import Tk_Locator
-from utils.base_social_media import set_init_script
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_TIKTOK
+from utils.browser_pool import open_browser_context, close_browser_context
+from utils.browser_server import launch_or_connect
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.retry import circuit_breakers, PUBLISH_RETRY, TRANSFER_POLL
+from utils.login_guard import ensure_logged_in
 from utils.files_times import get_absolute_path
+from utils.diagnostics import UploadDiagnostics
+from utils.tracing import UploadTracer
 from utils.log import tiktok_logger
 
 
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
+        browser = await launch_or_connect(playwright, {'headless': LOCAL_CHROME_HEADLESS})
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
         # 创建一个新的页面
@@ -51,14 +60,10 @@ async def tiktok_setup(account_file, handle=False):
 
 async def get_tiktok_cookie(account_file):
     async with async_playwright() as playwright:
-        options = {
-            'args': [
-                '--lang en-GB',
-            ],
-            'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
-        }
+        # 扫码登录需要人工操作，无头模式仍按 LOCAL_CHROME_HEADLESS，其余参数取默认启动配置
+        options = get_launch_profile().launch_options(headless=LOCAL_CHROME_HEADLESS)
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
+        browser = await launch_or_connect(playwright, options, interactive=True)
         # Setup context however you like.
         context = await browser.new_context()  # Pass any options
         context = await set_init_script(context)
@@ -71,16 +76,22 @@ async def get_tiktok_cookie(account_file):
 
 
 class TiktokVideo(object):
-    def __init__(self, title, file_path, tags, publish_date, account_file, thumbnail_path=None):
+    def __init__(self, title, file_path, tags, publish_date, account_file, thumbnail_path=None, browser_pool=None,
+                 launch_profile=None, allow_duplicate=False):
         self.title = title
         self.file_path = file_path
         self.tags = tags
         self.publish_date = publish_date
         self.thumbnail_path = thumbnail_path
         self.account_file = account_file
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)  # 浏览器启动配置，见 utils/launch_profiles.py
+        self.local_executable_path = self.launch_profile.executable_path
+        self.headless = self.launch_profile.headless
         self.locator_base = None
+        self.browser_pool = browser_pool
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
+        self.tracer = UploadTracer(SOCIAL_MEDIA_TIKTOK, account_file, file_path)
+        self.diagnostics = UploadDiagnostics(self.tracer)  # 上传失败时保存现场截图和 DOM
 
     async def set_schedule_time(self, page, publish_date):
         schedule_input_element = self.locator_base.get_by_label('Schedule')
@@ -147,54 +158,73 @@ class TiktokVideo(object):
         await file_chooser.set_files(self.file_path)
 
     async def upload(self, playwright: Playwright) -> None:
-        browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
-        context = await browser.new_context(storage_state=f"{self.account_file}")
-        # context = await set_init_script(context)
-        page = await context.new_page()
-
-        # change language to eng first
-        await self.change_language(page)
-        await page.goto("https://www.tiktok.com/tiktokstudio/upload")
-        tiktok_logger.info(f'[+]Uploading-------{self.title}.mp4')
-
-        await page.wait_for_url("https://www.tiktok.com/tiktokstudio/upload", timeout=10000)
-
+        self.tracer.phase("launch")
+        launch_options = self.launch_profile.launch_options(self.headless, self.local_executable_path)
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options,
+            **self.launch_profile.context_options(storage_state=f"{self.account_file}"))
         try:
-            await page.wait_for_selector('iframe[data-tt="Upload_index_iframe"], div.upload-container', timeout=10000)
-            tiktok_logger.info("Either iframe or div appeared.")
-        except Exception as e:
-            tiktok_logger.error("Neither iframe nor div appeared within the timeout.")
+            # context = await set_init_script(context)
+            page = await context.new_page()
+            self.diagnostics.attach(page)
 
-        await self.choose_base_locator(page)
+            # change language to eng first
+            self.tracer.phase("navigate")
+            await self.change_language(page)
+            await page.goto("https://www.tiktok.com/tiktokstudio/upload")
+            tiktok_logger.info(f'[+]Uploading-------{self.title}.mp4')
 
-        upload_button = self.locator_base.locator(
-            'button:has-text("Select video"):visible')
-        await upload_button.wait_for(state='visible')  # 确保按钮可见
-
-        async with page.expect_file_chooser() as fc_info:
-            await upload_button.click()
-        file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+            await ensure_logged_in(page, 'iframe[data-tt="Upload_index_iframe"], div.upload-container',
+                                   ['select[class*="SelectFormContainer"]'], SOCIAL_MEDIA_TIKTOK, self.account_file)
 
-        await self.add_title_tags(page)
-        # detect upload status
-        await self.detect_upload_status(page)
-        if self.thumbnail_path:
-            tiktok_logger.info(f'[+] Uploading thumbnail file {self.title}.png')
-            await self.upload_thumbnails(page)
+            try:
+                await page.wait_for_selector('iframe[data-tt="Upload_index_iframe"], div.upload-container', timeout=10000)
+                tiktok_logger.info("Either iframe or div appeared.")
+            except Exception as e:
+                tiktok_logger.error("Neither iframe nor div appeared within the timeout.")
 
-        if self.publish_date != 0:
-            await self.set_schedule_time(page, self.publish_date)
+            await self.choose_base_locator(page)
 
-        await self.click_publish(page)
-        tiktok_logger.success(f"video_id: {await self.get_last_video_id(page)}")
+            self.tracer.phase("file_input", size=os.path.getsize(self.file_path))
+            upload_button = self.locator_base.locator(
+                'button:has-text("Select video"):visible')
+            await upload_button.wait_for(state='visible')  # 确保按钮可见
 
-        await context.storage_state(path=f"{self.account_file}")  # save cookie
-        tiktok_logger.info('  [-] update cookie！')
-        await asyncio.sleep(2)  # close delay for look the video status
-        # close all
-        await context.close()
-        await browser.close()
+            async with page.expect_file_chooser() as fc_info:
+                await upload_button.click()
+            file_chooser = await fc_info.value
+            await file_chooser.set_files(self.file_path)
+
+            self.tracer.phase("form", tags=len(self.tags))
+            await self.add_title_tags(page)
+            # detect upload status
+            self.tracer.phase("transcode")
+            await self.detect_upload_status(page)
+            if self.thumbnail_path:
+                self.tracer.phase("form")
+                tiktok_logger.info(f'[+] Uploading thumbnail file {self.title}.png')
+                await self.upload_thumbnails(page)
+
+            if self.publish_date != 0:
+                self.tracer.phase("schedule")
+                await self.set_schedule_time(page, self.publish_date)
+
+            self.tracer.phase("publish")
+            await self.click_publish(page)
+            tiktok_logger.success(f"video_id: {await self.get_last_video_id(page)}")
+
+            self.tracer.phase("cleanup")
+            await context.storage_state(path=f"{self.account_file}")  # save cookie
+            tiktok_logger.info('  [-] update cookie！')
+            await asyncio.sleep(2)  # close delay for look the video status
+        except BaseException as e:
+            # 先保存失败现场，关闭上下文后页面就没了
+            await self.diagnostics.failed(e)
+            raise
+        finally:
+            # 关闭浏览器上下文和浏览器实例（出错、被取消时也要归还浏览器池）
+            await close_browser_context(context, browser, self.browser_pool)
+        self.tracer.finish()
 
     async def add_title_tags(self, page):
 
@@ -255,6 +285,7 @@ class TiktokVideo(object):
 
     async def click_publish(self, page):
         success_flag_div = 'div.common-modal-confirm-modal'
+        retry = PUBLISH_RETRY.start("click publish")
         while True:
             try:
                 publish_button = self.locator_base.locator('div.button-group button').nth(0)
@@ -267,7 +298,7 @@ class TiktokVideo(object):
             except Exception as e:
                 tiktok_logger.exception(f"  [-] Exception: {e}")
                 tiktok_logger.info("  [-] video publishing")
-                await asyncio.sleep(0.5)
+                await retry.backoff(e)
 
     async def get_last_video_id(self, page):
         await page.wait_for_selector('div[data-tt="components_PostTable_Container"]')
@@ -279,6 +310,7 @@ class TiktokVideo(object):
 
 
     async def detect_upload_status(self, page):
+        retry = TRANSFER_POLL.start("video upload")
         while True:
             try:
                 # if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
@@ -286,16 +318,14 @@ class TiktokVideo(object):
                         'div.button-group > button >> text=Post').get_attribute("disabled") is None:
                     tiktok_logger.info("  [-]video uploaded.")
                     break
-                else:
-                    tiktok_logger.info("  [-] video uploading...")
-                    await asyncio.sleep(2)
-                    if await self.locator_base.locator(
-                            'button[aria-label="Select file"]').count():
-                        tiktok_logger.info("  [-] found some error while uploading now retry...")
-                        await self.handle_upload_error(page)
-            except:
                 tiktok_logger.info("  [-] video uploading...")
-                await asyncio.sleep(2)
+                if await self.locator_base.locator(
+                        'button[aria-label="Select file"]').count():
+                    tiktok_logger.info("  [-] found some error while uploading now retry...")
+                    await self.handle_upload_error(page)
+            except Exception:
+                tiktok_logger.info("  [-] video uploading...")
+            await retry.backoff()
 
     async def choose_base_locator(self, page):
         # await page.wait_for_selector('div.upload-container')
@@ -305,5 +335,17 @@ class TiktokVideo(object):
             self.locator_base = page.locator(Tk_Locator.default) 
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        if await publish_log.already_published(SOCIAL_MEDIA_TIKTOK, self.account_file, self.file_path,
+                                               self.allow_duplicate):
+            return
+        # 平台连续失败时熔断，不再启动浏览器（见 utils/retry.py）
+        with circuit_breakers.guard(SOCIAL_MEDIA_TIKTOK):
+            await upload_rate_limiter.acquire(SOCIAL_MEDIA_TIKTOK, self.account_file)
+            with self.tracer:
+                if self.browser_pool is not None:
+                    async with self.diagnostics:
+                        await self.upload(None)
+                else:
+                    async with async_playwright() as playwright, self.diagnostics:
+                        await self.upload(playwright)
+        await publish_log.record(SOCIAL_MEDIA_TIKTOK, self.account_file, self.file_path, self.publish_date)
@@ -0,0 +1,52 @@
+"""
+小红书签名 HTTP 服务，供 uploader/xhs_uploader/main.sign() 通过 XHS_SERVER 调用
+
+    python -m uploader.xhs_uploader.sign_server            # 监听 XHS_SERVER 中的地址
+    python -m uploader.xhs_uploader.sign_server --port 11902
+
+POST /sign   {"uri": ..., "data": ..., "a1": ..., "web_session": ...} -> {"x-s": ..., "x-t": ...}
+GET  /health 签名 worker 的页面和计数
+"""
+import argparse
+from urllib.parse import urlsplit
+
+from flask import Flask, request, jsonify
+
+from conf import XHS_SERVER
+from uploader.xhs_uploader.sign_worker import get_sign_worker, SignQueueFull
+
+app = Flask(__name__)
+
+
+@app.route('/sign', methods=['POST'])
+def sign():
+    body = request.get_json(silent=True) or {}
+    if not body.get("uri"):
+        return jsonify({"code": 400, "msg": "缺少 uri", "data": None}), 400
+    try:
+        return jsonify(get_sign_worker().sign(body["uri"], body.get("data"), body.get("a1", ""),
+                                              body.get("web_session", "")))
+    except SignQueueFull as e:
+        return jsonify({"code": 503, "msg": str(e), "data": None}), 503
+    except Exception as e:
+        return jsonify({"code": 500, "msg": str(e), "data": None}), 500
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"code": 200, "msg": None, "data": get_sign_worker().snapshot()})
+
+
+def main():
+    server = urlsplit(XHS_SERVER)
+    parser = argparse.ArgumentParser(description="Serve XHS x-s/x-t signatures from warm browser pages.")
+    parser.add_argument("--host", default=server.hostname or "127.0.0.1")
+    parser.add_argument("--port", type=int, default=server.port or 11901)
+    args = parser.parse_args()
+    # 先启动 worker 线程，第一次签名时再启动浏览器
+    get_sign_worker().start()
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
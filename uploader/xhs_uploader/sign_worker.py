@@ -0,0 +1,264 @@
+"""
+小红书 x-s / x-t 签名 worker
+
+签名需要在加载了小红书首页的浏览器里调用 window._webmsxyw。原来每次签名都要冷启动 Chromium、打开首页、
+设置 a1 cookie、刷新再 sleep，一次发布带话题查询要在签名上花几十秒。
+
+这里在后台线程里常驻一个浏览器，每个 a1 保留一个已经就绪的页面（最多 XHS_SIGN_MAX_PAGES 个，超出时关闭最久未用的），
+同一页面上的签名排队依次执行。页面签名出错、关闭、使用次数超过 XHS_SIGN_PAGE_MAX_USES 或存活超过
+XHS_SIGN_PAGE_MAX_AGE 秒时重建；浏览器断开时重新启动。
+
+同步调用（XhsClient 的 sign 回调、Flask 线程都可以直接用）：
+    get_sign_worker().sign(uri, data, a1=a1)
+
+HTTP 服务见 uploader/xhs_uploader/sign_server.py。
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from playwright.async_api import async_playwright
+
+from conf import XHS_SIGN_MAX_PAGES, XHS_SIGN_PAGE_MAX_USES, XHS_SIGN_PAGE_MAX_AGE, XHS_SIGN_QUEUE_SIZE, \
+    XHS_SIGN_TIMEOUT
+from utils.base_social_media import get_stealth_script
+from utils.launch_profiles import get_launch_profile
+from utils.log import xhs_logger
+
+XHS_HOME = "https://www.xiaohongshu.com"
+# 单次签名出错后换一个新页面重试的次数
+SIGN_RETRIES = 3
+# 打开首页后等待签名函数就绪的时间（毫秒）
+SIGN_READY_TIMEOUT = 15000
+
+
+class SignQueueFull(Exception):
+    """等待签名的请求超过 XHS_SIGN_QUEUE_SIZE"""
+
+
+class _SignPage(object):
+    def __init__(self, a1: str, context, page):
+        self.a1 = a1
+        self.context = context
+        self.page = page
+        self.lock = asyncio.Lock()  # 同一页面上的签名依次执行
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+    def healthy(self, max_uses: int, max_age: float) -> bool:
+        return not self.page.is_closed() and self.uses < max_uses and time.monotonic() - self.created_at < max_age
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception:
+            pass
+
+
+class XhsSignWorker(object):
+    def __init__(self, max_pages: int = XHS_SIGN_MAX_PAGES, max_uses: int = XHS_SIGN_PAGE_MAX_USES,
+                 max_age: float = XHS_SIGN_PAGE_MAX_AGE, queue_size: int = XHS_SIGN_QUEUE_SIZE,
+                 timeout: float = XHS_SIGN_TIMEOUT, launch_profile=None):
+        self.max_pages = max(max_pages, 1)
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.launch_profile = get_launch_profile(launch_profile)
+        self.stats = {"signed": 0, "failed": 0, "pages_opened": 0, "pages_recycled": 0}
+        self._pages = OrderedDict()  # a1 -> _SignPage，按最近使用排序
+        self._opening = {}  # a1 -> 正在打开页面的 Task，同一个 a1 的并发请求共用
+        self._pending = 0
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """启动后台线程和事件循环（浏览器在第一次签名时才启动）"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ready = threading.Event()
+
+            def run():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                self._browser_lock = asyncio.Lock()
+                ready.set()
+                self._loop.run_forever()
+                self._loop.close()
+
+            self._thread = threading.Thread(target=run, name="xhs-sign-worker", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def sign(self, uri, data=None, a1: str = "", web_session: str = "") -> dict:
+        """同步签名，返回 {"x-s": ..., "x-t": ...}；web_session 不参与签名，保留参数与 sign() 一致"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self.sign_async(uri, data, a1), self._loop)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"小红书签名超过 {self.timeout} 秒未完成")
+
+    async def sign_async(self, uri, data=None, a1: str = "") -> dict:
+        """在 worker 的事件循环中执行"""
+        if self._pending >= self.queue_size:
+            raise SignQueueFull(f"等待签名的请求已达上限 {self.queue_size}")
+        self._pending += 1
+        try:
+            last_error = None
+            for _ in range(SIGN_RETRIES):
+                try:
+                    sign_page = await self._acquire(a1)
+                except Exception as e:
+                    last_error = e
+                    xhs_logger.warning(f"[sign] 打开签名页面失败: {e}")
+                    continue
+                async with sign_page.lock:
+                    if sign_page.page.is_closed():
+                        continue
+                    try:
+                        encrypt_params = await sign_page.page.evaluate(
+                            "([url, data]) => window._webmsxyw(url, data)", [uri, data])
+                    except Exception as e:
+                        # window._webmsxyw is not a function、页面跳转等，换一个新页面重试
+                        last_error = e
+                        xhs_logger.warning(f"[sign] 签名失败，重建页面后重试: {e}")
+                        await self._discard(sign_page)
+                        continue
+                    sign_page.uses += 1
+                    sign_page.last_used = time.monotonic()
+                self.stats["signed"] += 1
+                return {
+                    "x-s": encrypt_params["X-s"],
+                    "x-t": str(encrypt_params["X-t"])
+                }
+            self.stats["failed"] += 1
+            raise Exception(f"重试 {SIGN_RETRIES} 次仍无法签名: {last_error}")
+        finally:
+            self._pending -= 1
+
+    async def _acquire(self, a1: str) -> _SignPage:
+        sign_page = self._pages.get(a1)
+        if sign_page is not None and not sign_page.healthy(self.max_uses, self.max_age):
+            async with sign_page.lock:
+                await self._discard(sign_page)
+            sign_page = None
+        if sign_page is not None:
+            self._pages.move_to_end(a1)
+            return sign_page
+        task = self._opening.get(a1)
+        if task is None:
+            task = asyncio.ensure_future(self._open_page(a1))
+            self._opening[a1] = task
+            task.add_done_callback(lambda _: self._opening.pop(a1, None))
+        return await asyncio.shield(task)
+
+    async def _open_page(self, a1: str) -> _SignPage:
+        await self._evict(self.max_pages - 1)
+        browser = await self._ensure_browser()
+        context = await browser.new_context()
+        try:
+            await context.add_init_script(script=get_stealth_script())
+            page = await context.new_page()
+            await page.goto(XHS_HOME)
+            await context.add_cookies([{'name': 'a1', 'value': a1, 'domain': ".xiaohongshu.com", 'path': "/"}])
+            await page.reload()
+            # 设置 cookie 后签名函数要等页面脚本重新初始化，等它就绪而不是固定 sleep
+            await page.wait_for_function("typeof window._webmsxyw === 'function'", timeout=SIGN_READY_TIMEOUT)
+        except Exception:
+            await context.close()
+            raise
+        sign_page = _SignPage(a1, context, page)
+        self._pages[a1] = sign_page
+        self.stats["pages_opened"] += 1
+        # 几个 a1 同时打开页面时，打开前的检查都会通过，放进 _pages 之后再收一次
+        await self._evict(self.max_pages)
+        return sign_page
+
+    async def _evict(self, keep: int):
+        """页面数超过 keep 时关闭最久未用的页面，正在签名的页面等它签完"""
+        while len(self._pages) > keep:
+            a1, sign_page = next(iter(self._pages.items()))
+            async with sign_page.lock:
+                await self._discard(sign_page)
+
+    async def _discard(self, sign_page: _SignPage):
+        if self._pages.get(sign_page.a1) is sign_page:
+            del self._pages[sign_page.a1]
+            self.stats["pages_recycled"] += 1
+        await sign_page.close()
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                xhs_logger.warning("[sign] 签名浏览器已断开，重新启动")
+                self._pages.clear()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            # 签名页面不需要人看，headed-debug 等配置也不弹窗口
+            self._browser = await self._playwright.chromium.launch(**self.launch_profile.launch_options(headless=True))
+            xhs_logger.info(f"[sign] 签名浏览器已启动 ({self.launch_profile.name})")
+            return self._browser
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "pending": self._pending,
+            "browser_connected": self._browser is not None and self._browser.is_connected(),
+            "pages": [{
+                "a1": sign_page.a1[:6] + "...",
+                "uses": sign_page.uses,
+                "age_seconds": round(now - sign_page.created_at, 1),
+                "idle_seconds": round(now - sign_page.last_used, 1),
+            } for sign_page in list(self._pages.values())],
+        }
+
+    async def _close(self):
+        for sign_page in list(self._pages.values()):
+            await sign_page.close()
+        self._pages.clear()
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(10)
+        except Exception as e:
+            xhs_logger.warning(f"[sign] 关闭签名浏览器出错: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        self._thread = None
+
+
+_worker: Optional[XhsSignWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_sign_worker() -> XhsSignWorker:
+    """进程内共用的签名 worker，进程退出时自动关闭浏览器"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = XhsSignWorker()
+            atexit.register(_worker.close)
+        return _worker
@@ -13,8 +13,10 @@ import asyncio
 from pathlib import Path
 from typing import List, Optional
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_XIAOHONGSHU
+from utils.browser_pool import open_browser_context, close_browser_context
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
 from utils.log import xiaohongshu_logger
 
 
@@ -28,7 +30,9 @@ class XiaoHongShuImage:
         content: str,
         tags: List[str],
         publish_date: datetime,
-        account_file: str
+        account_file: str,
+        browser_pool=None,
+        launch_profile=None
     ):
         """
         初始化
@@ -40,6 +44,8 @@ class XiaoHongShuImage:
             tags: 话题标签列表 (不带#号)
             publish_date: 发布时间，0表示立即发布
             account_file: cookie 文件路径
+            browser_pool: 浏览器池，传入时从池中借用浏览器而不是单独启动
+            launch_profile: 浏览器启动配置名（见 utils/launch_profiles.py），默认取 conf.BROWSER_LAUNCH_PROFILE
         """
         self.title = title[:20] if title else ""  # 标题最多20字
         self.image_paths = image_paths[:18]  # 最多18张图
@@ -48,8 +54,10 @@ class XiaoHongShuImage:
         self.publish_date = publish_date
         self.account_file = account_file
         self.date_format = '%Y-%m-%d %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)
+        self.local_executable_path = self.launch_profile.executable_path
+        self.headless = self.launch_profile.headless
+        self.browser_pool = browser_pool
     
     async def set_schedule_time(self, page: Page, publish_date: datetime):
         """设置定时发布时间"""
@@ -78,19 +86,14 @@ class XiaoHongShuImage:
         Returns:
             是否上传成功
         """
-        # 启动浏览器
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                executable_path=self.local_executable_path
-            )
-        else:
-            browser = await playwright.chromium.launch(headless=self.headless)
+        # 启动浏览器（传入浏览器池时从池中借用）
+        launch_options = self.launch_profile.launch_options(self.headless, self.local_executable_path)
         
         # 创建浏览器上下文
-        context = await browser.new_context(
-            viewport={"width": 1600, "height": 900},
-            storage_state=self.account_file
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options,
+            **self.launch_profile.context_options(viewport={"width": 1600, "height": 900},
+                                                  storage_state=self.account_file)
         )
         context = await set_init_script(context)
         
@@ -159,8 +162,7 @@ class XiaoHongShuImage:
             return False
             
         finally:
-            await context.close()
-            await browser.close()
+            await close_browser_context(context, browser, self.browser_pool)
     
     async def _wait_for_upload_complete(self, page: Page, timeout: int = 60):
         """等待图片上传完成"""
@@ -267,6 +269,9 @@ class XiaoHongShuImage:
     
     async def main(self):
         """主入口"""
+        await upload_rate_limiter.acquire(SOCIAL_MEDIA_XIAOHONGSHU, self.account_file)
+        if self.browser_pool is not None:
+            return await self.upload(None)
         async with async_playwright() as playwright:
             return await self.upload(playwright)
 
@@ -5,16 +5,32 @@ from playwright.async_api import Playwright, async_playwright, Page
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS, BROWSER_PERSISTENT_PROFILES
+from utils.base_social_media import set_init_script, SOCIAL_MEDIA_XIAOHONGSHU
+from utils.browser_pool import open_browser_context, close_browser_context
+from utils.launch_profiles import get_launch_profile
+from utils.rate_limit import upload_rate_limiter
+from utils.publish_log import publish_log
+from utils.retry import circuit_breakers, PUBLISH_RETRY, TRANSFER_POLL
+from utils.resource_policy import apply_validation_policy
+from utils.checkpoint import UploadCheckpoint, STEP_FILE_UPLOADED, STEP_METADATA_FILLED, STEP_SCHEDULE_SET, \
+    STEP_DRAFT_SAVED, STEP_PUBLISHED
+from utils.diagnostics import UploadDiagnostics
+from utils.tracing import UploadTracer
+from utils.upload_progress import UploadProgress
+from utils.wait import wait_until, wait_visible, wait_hidden, wait_count_stable, start_wait_stats, \
+    log_wait_stats
 from utils.log import xiaohongshu_logger
 
+XHS_PUBLISH_URL = "https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video"
+
 
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
+        context = await apply_validation_policy(context, SOCIAL_MEDIA_XIAOHONGSHU)
         # 创建一个新的页面
         page = await context.new_page()
         # 访问指定的 URL
@@ -47,9 +63,8 @@ async def xiaohongshu_setup(account_file, handle=False):
 
 async def xiaohongshu_cookie_gen(account_file):
     async with async_playwright() as playwright:
-        options = {
-            'headless': LOCAL_CHROME_HEADLESS
-        }
+        # 扫码登录需要人工操作，无头模式仍按 LOCAL_CHROME_HEADLESS，其余参数取默认启动配置
+        options = get_launch_profile().launch_options(headless=LOCAL_CHROME_HEADLESS)
         # Make sure to run headed.
         browser = await playwright.chromium.launch(**options)
         # Setup context however you like.
@@ -64,16 +79,24 @@ async def xiaohongshu_cookie_gen(account_file):
 
 
 class XiaoHongShuVideo(object):
-    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, thumbnail_path=None):
+    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, thumbnail_path=None, browser_pool=None,
+                 launch_profile=None, checkpoint=None, allow_duplicate=False):
         self.title = title  # 视频标题
         self.file_path = file_path
         self.tags = tags
         self.publish_date = publish_date
         self.account_file = account_file
         self.date_format = '%Y年%m月%d日 %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
+        self.launch_profile = get_launch_profile(launch_profile)  # 浏览器启动配置，见 utils/launch_profiles.py
+        self.local_executable_path = self.launch_profile.executable_path
+        self.headless = self.launch_profile.headless
         self.thumbnail_path = thumbnail_path
+        self.browser_pool = browser_pool
+        self.allow_duplicate = allow_duplicate  # 为 True 时不检查是否发布过相同内容，见 utils/publish_log.py
+        self.progress = None
+        self.tracer = UploadTracer(SOCIAL_MEDIA_XIAOHONGSHU, account_file, file_path)
+        self.diagnostics = UploadDiagnostics(self.tracer)  # 上传失败时保存现场截图和 DOM
+        self.checkpoint = checkpoint or UploadCheckpoint()  # 已完成的步骤，重试时从草稿继续，见 utils/checkpoint.py
 
     async def set_schedule_time_xiaohongshu(self, page, publish_date):
         print("  [-] 正在设置定时发布时间...")
@@ -90,96 +113,120 @@ class XiaoHongShuVideo(object):
         label_element = page.locator("label:has-text('定时发布')")
         # # 在选中的 label 元素下点击 checkbox
         await label_element.click()
-        await asyncio.sleep(1)
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M")
         print(f"publish_date_hour: {publish_date_hour}")
 
-        await asyncio.sleep(1)
-        await page.locator('.el-input__inner[placeholder="选择日期和时间"]').click()
+        date_input = page.locator('.el-input__inner[placeholder="选择日期和时间"]')
+        await wait_visible(date_input, timeout=3, replaces=2)
+        await date_input.click()
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
 
-        await asyncio.sleep(1)
+        await wait_hidden(page.locator('.el-picker-panel'), timeout=1, replaces=1)
 
     async def handle_upload_error(self, page):
         xiaohongshu_logger.info('视频出错了，重新上传中')
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
     async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
-        else:
-            browser = await playwright.chromium.launch(headless=self.headless)
+        if self.checkpoint.done(STEP_PUBLISHED):
+            # 上一次执行已经发布成功，之后的步骤（保存 cookie 等）才失败，不重复发布
+            xiaohongshu_logger.info(f'[+]{self.title} 上次已发布，跳过')
+            return
+        self.tracer.phase("launch")
+        # 使用 Chromium 浏览器启动一个浏览器实例（传入浏览器池时从池中借用）
+        launch_options = self.launch_profile.launch_options(self.headless, self.local_executable_path)
         # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(
-            viewport={"width": 1600, "height": 900},
-            storage_state=f"{self.account_file}"
+        browser, context = await open_browser_context(
+            playwright, self.browser_pool, launch_options,
+            **self.launch_profile.context_options(viewport={"width": 1600, "height": 900},
+                                                  storage_state=f"{self.account_file}")
         )
-        context = await set_init_script(context)
+        try:
+            context = await set_init_script(context)
 
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
-        xiaohongshu_logger.info(f'[+]正在上传-------{self.title}.mp4')
-        # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
-        xiaohongshu_logger.info(f'[-] 正在打开主页...')
-        await page.wait_for_url("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
-        # 点击 "上传视频" 按钮
-        await page.locator("div[class^='upload-content'] input[class='upload-input']").set_input_files(self.file_path)
-
-        # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
-        while True:
+            # 创建一个新的页面
+            page = await context.new_page()
+            self.diagnostics.attach(page)
+            start_wait_stats()
+            # 统计视频分片上传的字节数、耗时和吞吐量
+            self.progress = UploadProgress(page, SOCIAL_MEDIA_XIAOHONGSHU, self.account_file, self.file_path)
+            # 访问指定的 URL
+            self.tracer.phase("navigate")
+            # 上次文件传完后失败并暂存了草稿时，从草稿继续，不再重新上传文件
+            resumed = self.checkpoint.resumable and await self.open_draft(page)
+            if not resumed:
+                await page.goto(XHS_PUBLISH_URL)
+                xiaohongshu_logger.info(f'[+]正在上传-------{self.title}.mp4')
+                # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
+                xiaohongshu_logger.info(f'[-] 正在打开主页...')
+                await page.wait_for_url(XHS_PUBLISH_URL)
+                # 点击 "上传视频" 按钮
+                self.tracer.phase("file_input", size=self.progress.total_bytes)
+                await page.locator("div[class^='upload-content'] input[class='upload-input']").set_input_files(self.file_path)
             try:
-                # 等待upload-input元素出现
-                upload_input = await page.wait_for_selector('input.upload-input', timeout=3000)
-                # 获取下一个兄弟元素
-                preview_new = await upload_input.query_selector(
-                    'xpath=following-sibling::div[contains(@class, "preview-new")]')
-                if preview_new:
-                    # 在preview-new元素中查找包含"上传成功"的stage元素
-                    stage_elements = await preview_new.query_selector_all('div.stage')
-                    upload_success = False
-                    for stage in stage_elements:
-                        text_content = await page.evaluate('(element) => element.textContent', stage)
-                        if '上传成功' in text_content:
-                            upload_success = True
-                            break
-                    if upload_success:
-                        xiaohongshu_logger.info("[+] 检测到上传成功标识!")
-                        break  # 成功检测到上传成功后跳出循环
-                    else:
-                        print("  [-] 未找到上传成功标识，继续等待...")
-                else:
-                    print("  [-] 未找到预览元素，继续等待...")
-                    await asyncio.sleep(1)
-            except Exception as e:
-                print(f"  [-] 检测过程出错: {str(e)}，重新尝试...")
-                await asyncio.sleep(0.5)  # 等待0.5秒后重新尝试
-
-        # 填充标题和话题
-        # 检查是否存在包含输入框的元素
-        # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
-        xiaohongshu_logger.info(f'  [-] 正在填充标题和话题...')
-        title_container = page.locator('div.plugin.title-container').locator('input.d-text')
-        if await title_container.count():
-            await title_container.fill(self.title[:30])
-        else:
-            titlecontainer = page.locator(".notranslate")
-            await titlecontainer.click()
-            await page.keyboard.press("Backspace")
-            await page.keyboard.press("Control+KeyA")
-            await page.keyboard.press("Delete")
-            await page.keyboard.type(self.title)
-            await page.keyboard.press("Enter")
-        css_selector = ".ql-editor" # 不能加上 .ql-blank 属性，这样只能获取第一次非空状态
-        for index, tag in enumerate(self.tags, start=1):
-            await page.type(css_selector, "#" + tag)
-            await page.press(css_selector, "Space")
-        xiaohongshu_logger.info(f'总共添加{len(self.tags)}个话题')
+                await self.fill_and_publish(page, resumed)
+            except Exception:
+                # 文件已经传完时暂存草稿，重试时从草稿继续
+                if self.checkpoint.done(STEP_FILE_UPLOADED) and not self.checkpoint.done(STEP_PUBLISHED):
+                    await self.save_draft(page)
+                raise
+
+            self.tracer.phase("cleanup")
+            await context.storage_state(path=self.account_file)  # 保存cookie
+            xiaohongshu_logger.success('  [-]cookie更新完毕！')
+            log_wait_stats(xiaohongshu_logger, self.tracer)
+            if not self.headless:
+                await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+            self.progress.finish()
+        except BaseException as e:
+            # 先保存失败现场，关闭上下文后页面就没了
+            await self.diagnostics.failed(e)
+            raise
+        finally:
+            # 关闭浏览器上下文和浏览器实例（出错、被取消时也要归还浏览器池）
+            await close_browser_context(context, browser, self.browser_pool)
+        self.tracer.finish()
+
+    async def fill_and_publish(self, page, resumed: bool):
+        # 草稿里的视频已经上传完成，不会再出现"上传成功"标识
+        if not resumed:
+            # 等待上传完成：upload-input 后面的预览区域出现"上传成功"
+            self.tracer.phase("transcode")
+            upload_success = page.locator('input.upload-input ~ div[class*="preview-new"] div.stage:has-text("上传成功")')
+            retry = TRANSFER_POLL.start("等待视频上传")
+            while not await wait_until(upload_success.count, timeout=10, max_interval=1):
+                print(f"  [-] 未找到上传成功标识，继续等待... {self.progress.describe()}")
+                retry.failed()
+            xiaohongshu_logger.info("[+] 检测到上传成功标识!")
+            await self.checkpoint.mark(STEP_FILE_UPLOADED)
+
+        # 草稿里已经有标题和话题，再输入一遍会重复
+        if not (resumed and self.checkpoint.done(STEP_METADATA_FILLED)):
+            # 填充标题和话题
+            # 检查是否存在包含输入框的元素
+            # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
+            self.tracer.phase("form", tags=len(self.tags))
+            xiaohongshu_logger.info(f'  [-] 正在填充标题和话题...')
+            title_container = page.locator('div.plugin.title-container').locator('input.d-text')
+            await wait_visible(title_container.or_(page.locator(".notranslate")), timeout=3, replaces=1)
+            if await title_container.count():
+                await title_container.fill(self.title[:30])
+            else:
+                titlecontainer = page.locator(".notranslate")
+                await titlecontainer.click()
+                await page.keyboard.press("Backspace")
+                await page.keyboard.press("Control+KeyA")
+                await page.keyboard.press("Delete")
+                await page.keyboard.type(self.title)
+                await page.keyboard.press("Enter")
+            css_selector = ".ql-editor" # 不能加上 .ql-blank 属性，这样只能获取第一次非空状态
+            for index, tag in enumerate(self.tags, start=1):
+                await page.type(css_selector, "#" + tag)
+                await page.press(css_selector, "Space")
+            xiaohongshu_logger.info(f'总共添加{len(self.tags)}个话题')
+            await self.checkpoint.mark(STEP_METADATA_FILLED)
 
         # while True:
         #     # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
@@ -215,9 +262,14 @@ class XiaoHongShuVideo(object):
         #         await page.locator(third_part_element).locator('input.semi-switch-native-control').click()
 
         if self.publish_date != 0:
+            self.tracer.phase("schedule")
             await self.set_schedule_time_xiaohongshu(page, self.publish_date)
+            await self.checkpoint.mark(STEP_SCHEDULE_SET)
 
         # 判断视频是否发布成功
+        self.tracer.phase("publish")
+        # 超过 PUBLISH_RETRY_DEADLINE 仍未跳转时按失败处理：文件已传完时暂存草稿，重试时从草稿继续
+        retry = PUBLISH_RETRY.start("点击发布")
         while True:
             try:
                 # 等待包含"定时发布"文本的button元素出现并点击
@@ -231,28 +283,59 @@ class XiaoHongShuVideo(object):
                 )  # 如果自动跳转到作品页面，则代表发布成功
                 xiaohongshu_logger.success("  [-]视频发布成功")
                 break
-            except:
+            except Exception as e:
                 xiaohongshu_logger.info("  [-] 视频正在发布中...")
-                await page.screenshot(full_page=True)
-                await asyncio.sleep(0.5)
-
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        xiaohongshu_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+                await retry.backoff(e)
+        await self.checkpoint.mark(STEP_PUBLISHED)
+
+    async def save_draft(self, page):
+        """
+        发布前的步骤失败时把已上传的视频暂存为草稿
+
+        小红书的草稿保存在浏览器本地存储里，只有开启 BROWSER_PERSISTENT_PROFILES（按账号复用浏览器 Profile）时
+        重试才能读到，否则不暂存，重试时重新上传
+        """
+        if not BROWSER_PERSISTENT_PROFILES:
+            return
+        try:
+            await self.diagnostics.snapshot("before_draft")
+            await page.locator('button:has-text("暂存离开")').click(timeout=5000)
+            await wait_hidden(page.locator('button:has-text("暂存离开")'), timeout=10)
+            await self.checkpoint.mark(STEP_DRAFT_SAVED, draft_url=XHS_PUBLISH_URL)
+            xiaohongshu_logger.info("  [-] 已暂存为草稿，重试时从草稿继续")
+        except Exception as e:
+            xiaohongshu_logger.warning(f"  [-] 暂存草稿失败，重试时需要重新上传: {e}")
+
+    async def open_draft(self, page) -> bool:
+        """打开草稿箱中标题相同的草稿进入编辑；草稿已不存在时清除记录并返回 False，按原流程上传"""
+        try:
+            await page.goto(self.checkpoint.draft_url)
+            await page.locator('div:text-is("草稿箱")').first.click(timeout=10000)
+            draft = page.locator('div.draft-item').filter(has_text=self.title[:20]).first
+            if not await wait_visible(draft, timeout=15):
+                raise Exception("草稿箱中没有找到该视频")
+            await draft.get_by_text("编辑", exact=True).first.click()
+            if not await wait_visible(page.locator(".ql-editor"), timeout=15):
+                raise Exception("草稿编辑页没有打开")
+        except Exception as e:
+            xiaohongshu_logger.warning(f"  [-] 无法从草稿继续，重新上传: {e}")
+            await self.checkpoint.discard_draft()
+            return False
+        xiaohongshu_logger.info(f'[+]从草稿继续发布-------{self.title}.mp4')
+        return True
     
     async def set_thumbnail(self, page: Page, thumbnail_path: str):
         if thumbnail_path:
             await page.click('text="选择封面"')
             await page.wait_for_selector("div.semi-modal-content:visible")
             await page.click('text="设置竖封面"')
-            await page.wait_for_timeout(2000)  # 等待2秒
             # 定位到上传区域并点击
-            await page.locator("div[class^='semi-upload upload'] >> input.semi-upload-hidden-input").set_input_files(thumbnail_path)
-            await page.wait_for_timeout(2000)  # 等待2秒
-            await page.locator("div[class^='extractFooter'] button:visible:has-text('完成')").click()
+            upload_input = page.locator("div[class^='semi-upload upload'] >> input.semi-upload-hidden-input")
+            await wait_until(upload_input.count, timeout=4, replaces=2)
+            await upload_input.set_input_files(thumbnail_path)
+            finish_button = page.locator("div[class^='extractFooter'] button:visible:has-text('完成')")
+            await wait_until(finish_button.is_enabled, timeout=4, replaces=2)
+            await finish_button.click()
             # finish_confirm_element = page.locator("div[class^='confirmBtn'] >> div:has-text('完成')")
             # if await finish_confirm_element.count():
             #     await finish_confirm_element.click()
@@ -269,24 +352,23 @@ class XiaoHongShuVideo(object):
         print("点击地点输入框完成")
         
         # 输入位置名称
-        print(f"等待1秒后输入位置名称: {location}")
-        await page.wait_for_timeout(1000)
+        print(f"等待输入框获得焦点后输入位置名称: {location}")
+        await wait_until(lambda: page.evaluate("document.activeElement && document.activeElement.tagName === 'INPUT'"),
+                         timeout=1, replaces=1)
         await page.keyboard.type(location)
         print(f"位置名称输入完成: {location}")
         
         # 等待下拉列表加载
         print("等待下拉列表加载...")
         dropdown_selector = 'div.d-popover.d-popover-default.d-dropdown.--size-min-width-large'
-        await page.wait_for_timeout(3000)
-        try:
-            await page.wait_for_selector(dropdown_selector, timeout=3000)
+        if await wait_visible(page.locator(dropdown_selector), timeout=6, replaces=3):
             print("下拉列表已加载")
-        except:
+        else:
             print("下拉列表未按预期显示，可能结构已变化")
         
-        # 增加等待时间以确保内容加载完成
-        print("额外等待1秒确保内容渲染完成...")
-        await page.wait_for_timeout(1000)
+        # 等待选项数量稳定，确保内容渲染完成
+        print("等待下拉选项渲染完成...")
+        await wait_count_stable(page.locator(f'{dropdown_selector} div.name'), timeout=2, replaces=1)
         
         # 尝试更灵活的XPath选择器
         print("尝试使用更灵活的XPath选择器...")
@@ -296,7 +378,6 @@ class XiaoHongShuVideo(object):
             f'//div[contains(@class, "d-grid") and contains(@class, "d-options")]'
             f'//div[contains(@class, "name") and text()="{location}"]'
         )
-        await page.wait_for_timeout(3000)
         
         # 尝试定位元素
         print(f"尝试定位包含'{location}'的选项...")
@@ -304,7 +385,7 @@ class XiaoHongShuVideo(object):
             # 先尝试使用更灵活的选择器
             location_option = await page.wait_for_selector(
                 flexible_xpath,
-                timeout=3000
+                timeout=6000
             )
             
             if location_option:
@@ -362,7 +443,19 @@ class XiaoHongShuVideo(object):
             return False
 
     async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        if await publish_log.already_published(SOCIAL_MEDIA_XIAOHONGSHU, self.account_file, self.file_path,
+                                               self.allow_duplicate):
+            return
+        # 平台连续失败时熔断，不再启动浏览器（见 utils/retry.py）
+        with circuit_breakers.guard(SOCIAL_MEDIA_XIAOHONGSHU):
+            await upload_rate_limiter.acquire(SOCIAL_MEDIA_XIAOHONGSHU, self.account_file)
+            with self.tracer:
+                if self.browser_pool is not None:
+                    async with self.diagnostics:
+                        await self.upload(None)
+                else:
+                    async with async_playwright() as playwright, self.diagnostics:
+                        await self.upload(playwright)
+        await publish_log.record(SOCIAL_MEDIA_XIAOHONGSHU, self.account_file, self.file_path, self.publish_date)
 
 
@@ -1,3 +1,5 @@
+import weakref
+from functools import lru_cache
 from pathlib import Path
 from typing import List
 
@@ -8,6 +10,8 @@ SOCIAL_MEDIA_TENCENT = "tencent"
 SOCIAL_MEDIA_TIKTOK = "tiktok"
 SOCIAL_MEDIA_BILIBILI = "bilibili"
 SOCIAL_MEDIA_KUAISHOU = "kuaishou"
+SOCIAL_MEDIA_XIAOHONGSHU = "xiaohongshu"
+SOCIAL_MEDIA_BAIJIAHAO = "baijiahao"
 
 
 def get_supported_social_media() -> List[str]:
@@ -18,7 +22,20 @@ def get_cli_action() -> List[str]:
     return ["upload", "login", "watch"]
 
 
-async def set_init_script(context):
+# 已注册过 stealth 脚本的上下文，常驻的上下文（如持久化 Profile）只需注册一次
+_stealth_registered = weakref.WeakSet()
+
+
+@lru_cache(maxsize=1)
+def get_stealth_script() -> str:
+    """读取 stealth.min.js 并缓存在内存中，整个进程只读一次磁盘"""
     stealth_js_path = Path(BASE_DIR / "utils/stealth.min.js")
-    await context.add_init_script(path=stealth_js_path)
+    return stealth_js_path.read_text(encoding="utf-8")
+
+
+async def set_init_script(context):
+    if context in _stealth_registered:
+        return context
+    await context.add_init_script(script=get_stealth_script())
+    _stealth_registered.add(context)
     return context
@@ -0,0 +1,270 @@
+"""
+Playwright 浏览器池
+
+进程内共享若干个常驻的浏览器实例，上传时只从池中借出一个隔离的 BrowserContext，
+避免每个视频都冷启动一次 Chromium。
+
+- 最大实例数：BROWSER_POOL_MAX_SIZE，超过后复用负载最小的实例或等待空闲实例
+- 空闲回收：实例没有活动上下文超过 BROWSER_POOL_IDLE_TIMEOUT 秒后关闭
+- 健康检查：借出前检查连接状态，断开或服务次数超过 BROWSER_POOL_MAX_USES 的实例会被替换
+
+开启 BROWSER_PERSISTENT_PROFILES 后，带 storage_state 的上下文改为按账号复用持久化 Profile，
+详见 utils/browser_profiles.py。
+
+池绑定在第一次使用它的事件循环上。同步代码（如 myUtils/postVideo.py）通过 pool.run()
+把协程提交到池自己的后台事件循环执行，这样多次调用之间浏览器可以保持常驻。
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import json
+import threading
+import time
+from typing import Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+from conf import BROWSER_POOL_MAX_SIZE, BROWSER_POOL_IDLE_TIMEOUT, BROWSER_POOL_MAX_USES, BROWSER_PERSISTENT_PROFILES
+from utils.browser_profiles import ProfileCache
+from utils.browser_server import launch_or_connect
+from utils.log import browser_logger
+
+
+class PooledBrowser(object):
+    def __init__(self, browser: Browser, key: str):
+        self.browser = browser
+        self.key = key
+        self.active = 0  # 当前未关闭的上下文数
+        self.uses = 0  # 累计创建过的上下文数
+        self.last_used = time.monotonic()
+
+    @property
+    def healthy(self) -> bool:
+        return self.browser.is_connected() and self.uses < BROWSER_POOL_MAX_USES
+
+
+class BrowserPool(object):
+    def __init__(self, max_size=BROWSER_POOL_MAX_SIZE, idle_timeout=BROWSER_POOL_IDLE_TIMEOUT,
+                 persistent_profiles=BROWSER_PERSISTENT_PROFILES):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.profiles = ProfileCache() if persistent_profiles else None
+        self._playwright: Optional[Playwright] = None
+        self._playwright_cm = None
+        self._browsers: list[PooledBrowser] = []
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._reaper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def make_key(browser_type: str, launch_options: dict) -> str:
+        return browser_type + json.dumps(launch_options, sort_keys=True, default=str)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError("BrowserPool 只能在创建它的事件循环中使用，同步代码请通过 pool.run() 调用")
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        if self._reaper is None:
+            self._reaper = loop.create_task(self._reap_forever())
+
+    def run(self, coro):
+        """在池的后台事件循环中执行协程，阻塞直到返回结果（供同步代码调用）"""
+        return self.submit(coro).result()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """在池的后台事件循环中执行协程，立即返回 Future（cancel() 会取消协程）"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+        elif self._thread is None:
+            raise RuntimeError("BrowserPool 已绑定到调用方的事件循环，请直接 await 使用")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def new_context(self, launch_options: dict = None, browser_type: str = "chromium",
+                          **context_options) -> BrowserContext:
+        """
+        从池中借出一个浏览器并创建隔离的上下文，用完后调用 release_context 归还
+
+        Args:
+            launch_options: 传给 browser_type.launch() 的参数，参数不同的浏览器互不复用
+            browser_type: chromium / firefox / webkit
+            context_options: 传给 browser.new_context() 的参数
+        """
+        self._bind_loop()
+        launch_options = launch_options or {}
+        if self.profiles is not None and context_options.get("storage_state"):
+            account_file = context_options.pop("storage_state")
+            return await self.profiles.get_context(await self._ensure_playwright(), account_file, launch_options,
+                                                   browser_type=browser_type, **context_options)
+        pooled = await self._acquire(browser_type, launch_options)
+        try:
+            context = await pooled.browser.new_context(**context_options)
+        except Exception:
+            await self._release(pooled)
+            raise
+        context.on("close", lambda _: asyncio.ensure_future(self._release(pooled)))
+        return context
+
+    async def release_context(self, context: BrowserContext):
+        """归还上下文：持久化 Profile 保持常驻，普通上下文直接关闭"""
+        if self.profiles is not None and self.profiles.owns(context):
+            await self.profiles.release(context)
+        else:
+            await context.close()
+
+    async def _acquire(self, browser_type: str, launch_options: dict) -> PooledBrowser:
+        key = self.make_key(browser_type, launch_options)
+        async with self._condition:
+            while True:
+                await self._drop_unhealthy()
+                candidates = [item for item in self._browsers if item.key == key]
+                idle = [item for item in candidates if item.active == 0]
+                if idle:
+                    pooled = idle[0]
+                elif len(self._browsers) < self.max_size:
+                    pooled = await self._launch(key, browser_type, launch_options)
+                elif candidates:
+                    pooled = min(candidates, key=lambda item: item.active)
+                else:
+                    # 池已满且没有同配置的实例：关闭一个其他配置的空闲实例腾出位置
+                    others = [item for item in self._browsers if item.active == 0]
+                    if not others:
+                        await self._condition.wait()
+                        continue
+                    await self._close(min(others, key=lambda item: item.last_used))
+                    continue
+                pooled.active += 1
+                pooled.uses += 1
+                pooled.last_used = time.monotonic()
+                return pooled
+
+    async def _release(self, pooled: PooledBrowser):
+        async with self._condition:
+            pooled.active = max(pooled.active - 1, 0)
+            pooled.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    async def _ensure_playwright(self) -> Playwright:
+        if self._playwright is None:
+            self._playwright_cm = async_playwright()
+            self._playwright = await self._playwright_cm.start()
+        return self._playwright
+
+    async def _launch(self, key: str, browser_type: str, launch_options: dict) -> PooledBrowser:
+        playwright = await self._ensure_playwright()
+        browser = await getattr(playwright, browser_type).launch(**launch_options)
+        pooled = PooledBrowser(browser, key)
+        self._browsers.append(pooled)
+        browser_logger.info(f"[+] 浏览器池启动新实例 {browser_type}，当前 {len(self._browsers)}/{self.max_size}")
+        return pooled
+
+    async def _close(self, pooled: PooledBrowser):
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            browser_logger.warning(f"[-] 关闭浏览器实例失败: {e}")
+
+    async def _drop_unhealthy(self):
+        for pooled in list(self._browsers):
+            if not pooled.browser.is_connected():
+                browser_logger.warning("[-] 浏览器实例已断开，移出浏览器池")
+                self._browsers.remove(pooled)
+            elif not pooled.healthy and pooled.active == 0:
+                browser_logger.info("[-] 浏览器实例达到最大服务次数，重启")
+                await self._close(pooled)
+
+    async def _reap_forever(self):
+        interval = max(min(self.idle_timeout / 2, 60), 1)
+        while True:
+            await asyncio.sleep(interval)
+            async with self._condition:
+                now = time.monotonic()
+                for pooled in list(self._browsers):
+                    if pooled.active == 0 and now - pooled.last_used > self.idle_timeout:
+                        browser_logger.info("[-] 浏览器实例空闲超时，已关闭")
+                        await self._close(pooled)
+                await self._drop_unhealthy()
+                self._condition.notify_all()
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for pooled in list(self._browsers):
+            await self._close(pooled)
+        if self.profiles is not None:
+            await self.profiles.close()
+        if self._playwright_cm is not None:
+            await self._playwright_cm.__aexit__(None, None, None)
+            self._playwright_cm = None
+            self._playwright = None
+
+    def shutdown(self):
+        """关闭池的后台事件循环（仅 run() 模式下有效）"""
+        if self._thread is None or not self._loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), self._loop).result(timeout=30)
+        except Exception as e:
+            browser_logger.warning(f"[-] 关闭浏览器池失败: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取进程内共享的浏览器池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+async def open_browser_context(playwright: Optional[Playwright], browser_pool: Optional[BrowserPool],
+                               launch_options: dict, browser_type: str = "chromium", **context_options):
+    """
+    为上传任务创建浏览器上下文
+
+    传入 browser_pool 时从池中借用浏览器，返回的 browser 为 None；
+    否则连接 serve-browser 启动的常驻浏览器（见 utils/browser_server.py），没有时独立启动浏览器。
+    两种情况都用 close_browser_context 收尾。
+
+    Returns:
+        (browser, context)
+    """
+    if browser_pool is not None:
+        context = await browser_pool.new_context(launch_options, browser_type=browser_type, **context_options)
+        return None, context
+    browser = await launch_or_connect(playwright, launch_options, browser_type)
+    context = await browser.new_context(**context_options)
+    return browser, context
+
+
+async def close_browser_context(context: BrowserContext, browser: Optional[Browser] = None,
+                                browser_pool: Optional[BrowserPool] = None):
+    """
+    关闭 open_browser_context 创建的上下文；来自浏览器池的上下文会被归还而不是销毁
+
+    上传器在 finally 里调用，关闭出错只记录日志，不掩盖上传本身的异常
+    """
+    try:
+        if browser_pool is not None:
+            await browser_pool.release_context(context)
+            return
+        await context.close()
+        if browser is not None:
+            await browser.close()
+    except Exception as e:
+        browser_logger.warning(f"[-] 关闭浏览器上下文失败: {e}")
@@ -0,0 +1,190 @@
+"""
+按账号持久化的浏览器 Profile
+
+每个账号（以 cookie 文件名，即 user_info.filePath 的 UUID 为键）使用独立的 user-data-dir，
+通过 launch_persistent_context 启动。HTTP 缓存、Service Worker、localStorage 在多次上传之间保留，
+平台 SPA 不必每次重新下载全部 JS 资源。
+
+已打开的 Profile 以 LRU 方式缓存：上传结束后只归还不关闭，超过 BROWSER_PROFILE_MAX_OPEN 个
+或总内存超过 BROWSER_PROFILE_MAX_MEMORY_MB 时关闭最久未使用的 Profile。
+同一账号同一时间只借给一个上传；借出超过 BROWSER_PROFILE_LEASE_TIMEOUT 秒仍未归还时视为泄漏，强制关闭后重新打开。
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import psutil
+from playwright.async_api import BrowserContext
+
+from conf import DATA_DIR, BROWSER_PROFILE_MAX_OPEN, BROWSER_PROFILE_MAX_MEMORY_MB, BROWSER_PROFILE_LEASE_TIMEOUT
+from utils.log import browser_logger
+
+PROFILE_DIR = Path(DATA_DIR / "browser_profiles")
+
+
+def profile_key(account_file) -> str:
+    """cookie 文件 cookiesFile/<uuid>.json -> <uuid>"""
+    return Path(str(account_file)).stem
+
+
+def profile_memory_mb(user_data_dir: Path) -> float:
+    """统计使用该 user-data-dir 的浏览器进程树占用的 RSS（MB）"""
+    marker = f"--user-data-dir={user_data_dir}"
+    total = 0
+    for proc in psutil.process_iter(['cmdline']):
+        try:
+            if marker not in (proc.info['cmdline'] or []):
+                continue
+            total += proc.memory_info().rss
+            for child in proc.children(recursive=True):
+                total += child.memory_info().rss
+            break
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total / (1024 * 1024)
+
+
+class ProfileEntry(object):
+    def __init__(self, key: str, context: BrowserContext, user_data_dir: Path):
+        self.key = key
+        self.context = context
+        self.user_data_dir = user_data_dir
+        self.leased = False
+        self.leased_at = 0.0
+        self.last_used = time.monotonic()
+
+
+class ProfileCache(object):
+    def __init__(self, max_open=BROWSER_PROFILE_MAX_OPEN, max_memory_mb=BROWSER_PROFILE_MAX_MEMORY_MB,
+                 lease_timeout=BROWSER_PROFILE_LEASE_TIMEOUT):
+        self.max_open = max_open
+        self.max_memory_mb = max_memory_mb
+        self.lease_timeout = lease_timeout
+        self._entries: "OrderedDict[str, ProfileEntry]" = OrderedDict()
+        self._condition: Optional[asyncio.Condition] = None
+
+    def owns(self, context: BrowserContext) -> bool:
+        return any(entry.context is context for entry in self._entries.values())
+
+    async def get_context(self, playwright, account_file, launch_options: dict, browser_type: str = "chromium",
+                          **context_options) -> BrowserContext:
+        """
+        借出账号对应的持久化上下文，同一账号同一时间只能被一个任务使用
+
+        Args:
+            account_file: cookie 文件路径，用于确定 Profile 目录并同步最新 cookie
+            launch_options / context_options: 同 BrowserPool.new_context，会合并传给 launch_persistent_context
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        key = profile_key(account_file)
+        async with self._condition:
+            await self._wait_unleased(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                await self._evict(reserve=1)
+                user_data_dir = PROFILE_DIR / key
+                user_data_dir.mkdir(parents=True, exist_ok=True)
+                options = {**launch_options, **context_options}
+                context = await getattr(playwright, browser_type).launch_persistent_context(str(user_data_dir), **options)
+                entry = ProfileEntry(key, context, user_data_dir)
+                self._entries[key] = entry
+                # 浏览器崩溃或被外部关闭时移出缓存
+                context.on("close", lambda _, closed=entry: self._forget(closed))
+                browser_logger.info(f"[+] 打开账号 Profile {key}，当前 {len(self._entries)}/{self.max_open}")
+            self._entries.move_to_end(key)
+            entry.leased = True
+            entry.leased_at = entry.last_used = time.monotonic()
+        # cookie 文件始终是账号登录态的权威来源（登录、上传后都会回写），每次借出时同步进 Profile
+        await self._sync_cookies(entry.context, account_file)
+        return entry.context
+
+    async def release(self, context: BrowserContext):
+        """归还上下文：关闭多余页面但保持浏览器常驻，随后按容量回收"""
+        async with self._condition:
+            for entry in self._entries.values():
+                if entry.context is context:
+                    break
+            else:
+                return
+            try:
+                pages = context.pages
+                for page in pages[1:]:
+                    await page.close()
+                if pages:
+                    await pages[0].goto("about:blank")
+            except Exception as e:
+                browser_logger.warning(f"[-] 归还 Profile {entry.key} 时出错，直接关闭: {e}")
+                await self._close(entry)
+            finally:
+                # 归还途中被取消也要解除借出，否则同一账号的上传会一直等待
+                entry.leased = False
+                entry.last_used = time.monotonic()
+                self._condition.notify_all()
+            await self._evict()
+
+    async def _wait_unleased(self, key: str):
+        """等到账号的 Profile 没有被借出；借出超过 lease_timeout 时强制关闭（调用方应先持有 _condition）"""
+        while True:
+            entry = self._entries.get(key)
+            if entry is None or not entry.leased:
+                return
+            held = time.monotonic() - entry.leased_at
+            if held >= self.lease_timeout:
+                browser_logger.warning(f"[-] 账号 Profile {key} 借出 {held:.0f} 秒仍未归还，强制关闭后重新打开")
+                await self._close(entry)
+                return
+            try:
+                await asyncio.wait_for(self._condition.wait(), self.lease_timeout - held)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        for entry in list(self._entries.values()):
+            await self._close(entry)
+
+    def _forget(self, entry: ProfileEntry):
+        if self._entries.get(entry.key) is entry:
+            self._entries.pop(entry.key)
+            # 借出中的 Profile 被关闭（浏览器崩溃）时唤醒等待同一账号的上传
+            if entry.leased and self._condition is not None:
+                asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    @staticmethod
+    async def _sync_cookies(context: BrowserContext, account_file):
+        try:
+            with open(account_file, "r", encoding="utf-8") as f:
+                cookies = json.load(f).get("cookies", [])
+        except (OSError, ValueError):
+            return
+        if cookies:
+            await context.add_cookies(cookies)
+
+    async def _evict(self, reserve: int = 0):
+        """关闭最久未使用且未被借出的 Profile，直到数量和内存都在上限内"""
+        for entry in list(self._entries.values()):
+            if entry.leased:
+                continue
+            over_count = len(self._entries) + reserve > self.max_open
+            over_memory = self.max_memory_mb and self._memory_mb() > self.max_memory_mb
+            if not over_count and not over_memory:
+                break
+            browser_logger.info(f"[-] 关闭最久未使用的账号 Profile {entry.key}")
+            await self._close(entry)
+
+    def _memory_mb(self) -> float:
+        return sum(profile_memory_mb(entry.user_data_dir) for entry in self._entries.values())
+
+    async def _close(self, entry: ProfileEntry):
+        self._entries.pop(entry.key, None)
+        try:
+            await entry.context.close()
+        except Exception as e:
+            browser_logger.warning(f"[-] 关闭账号 Profile {entry.key} 失败: {e}")
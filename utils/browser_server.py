@@ -0,0 +1,120 @@
+"""
+常驻浏览器服务
+
+`python cli_main.py serve-browser` 启动一个常驻的 Chromium，并把它的 CDP 地址写入 BROWSER_SERVER_FILE。
+之后的 upload / login 命令发现该文件后通过 connect_over_cdp 连接这个浏览器，只新建上下文，
+省去每次命令都冷启动 Chromium 的开销（适合 cron 驱动的大量短任务）。
+
+Python 版 Playwright 没有 launch_server()，所以这里直接用 --remote-debugging-port 启动浏览器并走 CDP，
+只支持 chromium。服务退出或进程不存在时会删除该文件，客户端自动回退到本地启动浏览器。
+"""
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Optional
+
+import psutil
+from playwright.async_api import Browser, Playwright
+
+from conf import DATA_DIR, LOCAL_CHROME_PATH
+from utils.launch_profiles import get_launch_profile
+from utils.log import browser_logger
+
+BROWSER_SERVER_FILE = Path(DATA_DIR / "browser_server.json")
+
+
+def read_endpoint() -> Optional[dict]:
+    """读取常驻浏览器的连接信息，文件不存在或进程已退出时返回 None"""
+    try:
+        with open(BROWSER_SERVER_FILE, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not psutil.pid_exists(info.get("pid", -1)):
+        browser_logger.warning("[-] 常驻浏览器进程已退出，删除过期的连接文件")
+        BROWSER_SERVER_FILE.unlink(missing_ok=True)
+        return None
+    return info
+
+
+async def launch_or_connect(playwright: Playwright, launch_options: dict, browser_type: str = "chromium",
+                            interactive: bool = False) -> Browser:
+    """
+    有常驻浏览器时连接它，否则按 launch_options 启动新浏览器
+
+    Args:
+        interactive: 需要人工操作的场景（扫码登录），常驻浏览器是无头模式时不连接
+    """
+    info = read_endpoint() if browser_type == "chromium" else None
+    if info and not (interactive and info.get("headless")):
+        try:
+            browser = await playwright.chromium.connect_over_cdp(info["endpoint"])
+            browser_logger.info(f"[+] 已连接常驻浏览器 {info['endpoint']}")
+            return browser
+        except Exception as e:
+            browser_logger.warning(f"[-] 连接常驻浏览器失败，改为本地启动: {e}")
+    return await getattr(playwright, browser_type).launch(**launch_options)
+
+
+def _wait_for_port(user_data_dir: str, proc: subprocess.Popen, timeout: float) -> int:
+    """Chromium 启动后会把实际监听的调试端口写入 user-data-dir/DevToolsActivePort"""
+    port_file = Path(user_data_dir) / "DevToolsActivePort"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"浏览器进程已退出，返回码 {proc.returncode}")
+        if port_file.exists():
+            lines = port_file.read_text().splitlines()
+            if lines and lines[0].isdigit():
+                return int(lines[0])
+        time.sleep(0.1)
+    raise TimeoutError("等待浏览器调试端口超时")
+
+
+async def serve_browser(playwright: Playwright, headless: bool = True, port: int = 0, startup_timeout: float = 30,
+                        launch_profile: str = None):
+    """启动常驻浏览器并阻塞到它退出（Ctrl+C 结束），退出时清理连接文件；launch_profile 的 Chromium 参数会追加到命令行"""
+    executable_path = LOCAL_CHROME_PATH if LOCAL_CHROME_PATH and os.path.exists(LOCAL_CHROME_PATH) \
+        else playwright.chromium.executable_path
+    user_data_dir = tempfile.mkdtemp(prefix="sau-browser-server-")
+    args = [
+        executable_path,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={user_data_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--lang=zh-CN",
+    ]
+    args.extend(arg for arg in get_launch_profile(launch_profile).args if arg not in args)
+    if headless:
+        args.append("--headless=new")
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        port = await asyncio.to_thread(_wait_for_port, user_data_dir, proc, startup_timeout)
+        endpoint = f"http://127.0.0.1:{port}"
+        with urllib.request.urlopen(f"{endpoint}/json/version", timeout=5) as response:
+            version = json.load(response).get("Browser", "")
+        BROWSER_SERVER_FILE.write_text(json.dumps({
+            "endpoint": endpoint,
+            "pid": proc.pid,
+            "headless": headless,
+            "browser": version,
+        }, ensure_ascii=False), encoding="utf-8")
+        browser_logger.success(f"[+] 常驻浏览器已启动 {version} {endpoint}，连接信息已写入 {BROWSER_SERVER_FILE}")
+        await asyncio.to_thread(proc.wait)
+        browser_logger.info(f"[-] 常驻浏览器已退出，返回码 {proc.returncode}")
+    finally:
+        BROWSER_SERVER_FILE.unlink(missing_ok=True)
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(user_data_dir, ignore_errors=True)
@@ -0,0 +1,66 @@
+"""
+上传步骤检查点
+
+视频号、小红书上传在文件传完之后失败（发布按钮超时、填写表单出错等）时，重试原来要重新打开发布页、把几百 MB 的文件再传一遍。
+上传器在每一步完成时调用 checkpoint.mark()，通过 save 回调持久化（上传任务队列里保存在 upload_jobs.checkpoint，
+见 myUtils/upload_jobs.py）：
+
+- file_uploaded：文件上传、转码完成
+- metadata_filled：标题、话题等已填写
+- schedule_set：定时发布时间已设置
+- draft_saved：后续步骤失败时已把作品存为平台草稿，draft_url 为打开草稿的页面
+- published：已发布成功
+
+重试时：已发布的直接跳过，不会重复发布；有草稿时从草稿继续，跳过文件上传和已经填写的表单；
+草稿打不开时清除草稿记录，按原流程完整上传。
+"""
+import asyncio
+from datetime import datetime
+from typing import Callable, Optional
+
+STEP_FILE_UPLOADED = "file_uploaded"
+STEP_METADATA_FILLED = "metadata_filled"
+STEP_SCHEDULE_SET = "schedule_set"
+STEP_DRAFT_SAVED = "draft_saved"
+STEP_PUBLISHED = "published"
+
+
+class UploadCheckpoint(object):
+    def __init__(self, data: dict = None, save: Optional[Callable[[dict], None]] = None):
+        """
+        Args:
+            data: 上一次执行保存的检查点（to_dict() 的结果），None 表示从头开始
+            save: 检查点变化时调用（在线程池中执行），参数为 to_dict()；None 时只保存在内存里
+        """
+        data = data or {}
+        self.steps = dict(data.get("steps") or {})  # 步骤 -> 完成时间
+        self.draft_url = data.get("draft_url")
+        self._save = save
+
+    def done(self, step: str) -> bool:
+        return step in self.steps
+
+    @property
+    def resumable(self) -> bool:
+        """文件已经传到平台草稿里、还没有发布，可以从草稿继续"""
+        return bool(self.draft_url) and self.done(STEP_DRAFT_SAVED) and not self.done(STEP_PUBLISHED)
+
+    async def mark(self, step: str, draft_url: str = None):
+        self.steps[step] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if draft_url is not None:
+            self.draft_url = draft_url
+        await self._persist()
+
+    async def discard_draft(self):
+        """草稿已经打不开（被删除、过期），之后完整重新上传"""
+        self.draft_url = None
+        for step in (STEP_DRAFT_SAVED, STEP_FILE_UPLOADED, STEP_METADATA_FILLED, STEP_SCHEDULE_SET):
+            self.steps.pop(step, None)
+        await self._persist()
+
+    async def _persist(self):
+        if self._save is not None:
+            await asyncio.to_thread(self._save, self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {"steps": dict(self.steps), "draft_url": self.draft_url}
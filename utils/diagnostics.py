@@ -0,0 +1,155 @@
+"""
+上传失败时的现场快照
+
+上传过程中只在阶段切换（UploadTracer.phase）时在后台截一张视口 JPEG，放进固定长度的环形缓冲区，不落盘、不阻塞上传；
+上传失败时再补一张失败瞬间的截图和页面 DOM，连同缓冲区里最近几个阶段的截图写到
+logs/diagnostics/<时间>_<平台>_<trace_id>/ 下。上传成功时不写任何文件，也不做整页截图。
+
+上传器中的用法：
+    self.diagnostics = UploadDiagnostics(self.tracer)      # __init__
+    async with async_playwright() as playwright, self.diagnostics:
+        await self.upload(playwright)                      # main()
+    self.diagnostics.attach(page)                          # upload() 创建页面之后
+    await self.diagnostics.failed(e)                       # upload() 出错后、关闭浏览器上下文之前
+"""
+import asyncio
+import json
+import shutil
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from playwright.async_api import Page
+
+from conf import BASE_DIR, UPLOAD_DIAGNOSTICS_SNAPSHOTS
+from utils.log import browser_logger
+from utils.login_guard import CookieInvalidError
+from utils.tracing import UploadTracer
+
+DIAGNOSTICS_DIR = Path(BASE_DIR / "logs" / "diagnostics")
+# 最多保留多少次失败的现场，超出时删除最早的
+DIAGNOSTICS_MAX_DUMPS = 50
+# 环形缓冲区里的截图质量，只用于看清页面状态
+SNAPSHOT_QUALITY = 50
+SNAPSHOT_TIMEOUT = 5000
+# 失败时保存现场最多用多少秒，超时放弃，不拖住上传的异常
+DUMP_TIMEOUT = 20
+
+
+class UploadDiagnostics(object):
+    def __init__(self, tracer: UploadTracer, size: int = UPLOAD_DIAGNOSTICS_SNAPSHOTS):
+        self.tracer = tracer
+        self.snapshots = deque(maxlen=max(size, 0))  # (阶段名, 时间, url, jpeg)
+        self.page: Optional[Page] = None
+        self._pending = set()
+        self._dumped = False
+        tracer.add_listener(self.capture)
+
+    async def __aenter__(self):
+        self.page = None
+        self.snapshots.clear()
+        self._dumped = False
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self.failed(exc)
+        finally:
+            for task in self._pending:
+                task.cancel()
+            self._pending.clear()
+            self.page = None
+        return False
+
+    async def failed(self, exc: Optional[BaseException]):
+        """
+        保存失败现场，每次上传最多保存一次
+
+        upload() 在 finally 里关闭浏览器上下文，等到 __aexit__ 时页面已经关闭，所以出错时先在 upload() 里调用
+        """
+        # cookie 失效是正常流程，由调用方重新登录，不算上传失败
+        if exc is None or self._dumped or isinstance(exc, CookieInvalidError):
+            return
+        self._dumped = True
+        try:
+            await asyncio.wait_for(self.dump(exc), DUMP_TIMEOUT)
+        except Exception as e:
+            browser_logger.warning(f"[diagnostics] 保存失败现场出错: {e}")
+
+    def attach(self, page: Page):
+        """记录上传使用的页面，之后的阶段切换会对它截图"""
+        self.page = page
+
+    def capture(self, step: str):
+        """阶段切换时调用：在后台截一张视口截图放进缓冲区，不等待截图完成"""
+        if self.page is None or self.page.is_closed() or not self.snapshots.maxlen:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._snapshot(self.page, step))
+        except RuntimeError:
+            return
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def snapshot(self, step: str):
+        """立即截一张放进缓冲区并等待完成（页面马上要跳转时用，例如失败后保存草稿）"""
+        if self.page is not None and not self.page.is_closed() and self.snapshots.maxlen:
+            await self._snapshot(self.page, step)
+
+    async def _snapshot(self, page: Page, step: str):
+        try:
+            image = await page.screenshot(type="jpeg", quality=SNAPSHOT_QUALITY, timeout=SNAPSHOT_TIMEOUT)
+        except Exception:
+            # 页面正在跳转或已关闭，跳过这一张
+            return
+        self.snapshots.append((step, time.time(), page.url, image))
+
+    async def dump(self, error: BaseException) -> Path:
+        """把缓冲区、失败瞬间的截图和 DOM 写到磁盘，返回保存目录"""
+        if self._pending:
+            await asyncio.wait(list(self._pending), timeout=SNAPSHOT_TIMEOUT / 1000)
+        trace_id = (self.tracer.trace_id or "")[:8]
+        path = DIAGNOSTICS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}_{self.tracer.platform}_{trace_id}"
+        path.mkdir(parents=True, exist_ok=True)
+        steps = []
+        for index, (step, taken_at, url, image) in enumerate(list(self.snapshots), start=1):
+            name = f"{index:02d}_{step}.jpg"
+            (path / name).write_bytes(image)
+            steps.append({"step": step, "time": taken_at, "url": url, "file": name})
+
+        url = None
+        page = self.page
+        if page is not None and not page.is_closed():
+            url = page.url
+            try:
+                (path / "failure.png").write_bytes(await page.screenshot(timeout=SNAPSHOT_TIMEOUT))
+            except Exception as e:
+                browser_logger.warning(f"[diagnostics] 失败截图出错: {e}")
+            try:
+                (path / "dom.html").write_text(await page.content(), encoding="utf-8")
+            except Exception as e:
+                browser_logger.warning(f"[diagnostics] 保存 DOM 出错: {e}")
+
+        (path / "info.json").write_text(json.dumps({
+            "platform": self.tracer.platform,
+            "account": self.tracer.account,
+            "file": self.tracer.file,
+            "trace_id": self.tracer.trace_id,
+            "error": f"{type(error).__name__}: {error}",
+            "url": url,
+            "steps": steps,
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+        prune_dumps()
+        browser_logger.error(f"[diagnostics] {self.tracer.platform} {self.tracer.file} 上传失败，现场已保存到 {path}")
+        return path
+
+
+def prune_dumps(keep: int = DIAGNOSTICS_MAX_DUMPS):
+    """目录名以时间开头，按名字排序删除最早的"""
+    if not DIAGNOSTICS_DIR.exists():
+        return
+    dumps = sorted(p for p in DIAGNOSTICS_DIR.iterdir() if p.is_dir())
+    for old in dumps[:max(len(dumps) - keep, 0)]:
+        shutil.rmtree(old, ignore_errors=True)
@@ -41,6 +41,8 @@ def get_title_and_hashtags(filename):
 def generate_schedule_time_next_day(total_videos, videos_per_day = 1, daily_times=None, timestamps=False, start_days=0):
     """
     Generate a schedule for video uploads, starting from the next day.
+    Only plans for a single account; the backend uses utils/slot_allocator.SlotAllocator,
+    which also avoids slots already booked by other batches and accounts.
 
     Args:
     - total_videos: Total number of videos to be uploaded.
@@ -0,0 +1,146 @@
+"""
+浏览器启动配置（launch profile）
+
+把 Chromium 启动参数、无头模式、是否使用 LOCAL_CHROME_PATH，以及上下文的 viewport / user_agent 打包成命名配置，
+上传器、扫码登录和常驻浏览器都通过 get_launch_profile() 取用，不再在各处硬编码启动参数。
+
+内置配置：
+- default：与原来的行为一致，按 LOCAL_CHROME_HEADLESS / LOCAL_CHROME_PATH 启动，不加额外参数
+- minimal-memory：无头运行，关闭 GPU、扩展、后台网络等，限制渲染进程数和 V8 堆大小，viewport 缩小到 1280x720，
+  适合一台机器同时跑多个浏览器
+- headless-shell：在 minimal-memory 的基础上改用 Playwright 自带的 chromium-headless-shell，不加载完整的浏览器界面，
+  单实例内存最小；不使用 LOCAL_CHROME_PATH，视频号等依赖 Chrome 编解码器的平台慎用
+- headed-debug：有界面运行，自动打开 DevTools 并放慢每一步操作，用于排查选择器问题
+
+conf.BROWSER_LAUNCH_PROFILES 可以新增或覆盖配置，"base" 指定继承的配置，"extra_args" 追加到继承的 args 后面，例如：
+    BROWSER_LAUNCH_PROFILES = {"small-window": {"base": "minimal-memory", "viewport": {"width": 1024, "height": 768}}}
+"""
+from typing import Optional, Union
+
+from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS, BROWSER_LAUNCH_PROFILE, BROWSER_LAUNCH_PROFILES
+
+# 降低单个浏览器常驻内存的参数。Playwright 启动时默认也会带上其中一部分，这里显式列出，
+# 是为了 serve-browser 直接启动 Chromium（不经过 Playwright）时同样生效
+MEMORY_SAVING_ARGS = [
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-breakpad",
+    "--disable-dev-shm-usage",
+    "--disable-site-isolation-trials",
+    "--renderer-process-limit=2",
+    "--js-flags=--max-old-space-size=512",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+LAUNCH_PROFILES = {
+    "default": {},
+    "minimal-memory": {
+        "args": MEMORY_SAVING_ARGS,
+        "headless": True,
+        "viewport": {"width": 1280, "height": 720},
+    },
+    "headless-shell": {
+        "base": "minimal-memory",
+        # 不传 executable_path / channel 时，Playwright 的无头模式使用 chromium-headless-shell
+        "use_local_chrome": False,
+    },
+    "headed-debug": {
+        "args": ["--auto-open-devtools-for-tabs"],
+        "headless": False,
+        "slow_mo": 200,
+    },
+}
+
+
+class LaunchProfile(object):
+    def __init__(self, name: str, args=(), headless: Optional[bool] = None, use_local_chrome: bool = True,
+                 viewport: Optional[dict] = None, user_agent: Optional[str] = None, slow_mo: float = 0):
+        self.name = name
+        self.args = list(args)
+        self._headless = headless  # None 表示跟随 LOCAL_CHROME_HEADLESS
+        self.use_local_chrome = use_local_chrome
+        self.viewport = viewport
+        self.user_agent = user_agent
+        self.slow_mo = slow_mo
+
+    @property
+    def headless(self) -> bool:
+        return LOCAL_CHROME_HEADLESS if self._headless is None else self._headless
+
+    @property
+    def executable_path(self) -> Optional[str]:
+        """使用本地 Chrome 时返回 LOCAL_CHROME_PATH，否则为 None（使用 Playwright 自带的浏览器）"""
+        return (LOCAL_CHROME_PATH or None) if self.use_local_chrome else None
+
+    def launch_options(self, headless: Optional[bool] = None, executable_path: Optional[str] = None,
+                       browser_type: str = "chromium", **options) -> dict:
+        """
+        生成 browser_type.launch() 的参数
+
+        Args:
+            headless: 覆盖配置里的无头模式（上传器传入自己的 self.headless）
+            executable_path: 浏览器可执行文件，为空时使用 Playwright 自带的浏览器
+            browser_type: 非 chromium 时不传 Chromium 专用的 args
+            **options: 其它 launch 参数（如 proxy），优先于配置
+        """
+        launch_options = {'headless': self.headless if headless is None else headless}
+        if self.args and browser_type == "chromium":
+            launch_options['args'] = list(self.args)
+        if executable_path:
+            launch_options['executable_path'] = executable_path
+        if self.slow_mo:
+            launch_options['slow_mo'] = self.slow_mo
+        launch_options.update(options)
+        return launch_options
+
+    def context_options(self, **options) -> dict:
+        """生成 new_context() 的参数：options 是调用方的默认值，配置里设置了 viewport / user_agent 时以配置为准"""
+        if self.viewport:
+            options['viewport'] = dict(self.viewport)
+        if self.user_agent:
+            options['user_agent'] = self.user_agent
+        return options
+
+    def __repr__(self):
+        return f"LaunchProfile({self.name!r}, headless={self.headless}, args={len(self.args)})"
+
+
+def _resolve(name: str, specs: dict, seen: tuple = ()) -> dict:
+    if name not in specs:
+        raise ValueError(f"未知的浏览器启动配置 {name}，可选: {', '.join(specs)}")
+    if name in seen:
+        raise ValueError(f"浏览器启动配置循环继承: {' -> '.join(seen + (name,))}")
+    spec = dict(specs[name])
+    base = spec.pop("base", None)
+    extra_args = spec.pop("extra_args", [])
+    resolved = _resolve(base, specs, seen + (name,)) if base else {}
+    resolved.update(spec)
+    resolved["args"] = list(resolved.get("args", [])) + list(extra_args)
+    return resolved
+
+
+def _all_specs() -> dict:
+    specs = dict(LAUNCH_PROFILES)
+    for name, spec in BROWSER_LAUNCH_PROFILES.items():
+        # 与内置配置同名且没有指定 base 时，只覆盖写出来的字段
+        specs[name] = {**LAUNCH_PROFILES[name], **spec} if name in LAUNCH_PROFILES and "base" not in spec else spec
+    return specs
+
+
+def profile_names() -> list:
+    return list(_all_specs())
+
+
+def get_launch_profile(profile: Union[str, LaunchProfile, None] = None) -> LaunchProfile:
+    """按名称取启动配置，None 时使用 conf.BROWSER_LAUNCH_PROFILE；传入 LaunchProfile 实例时原样返回"""
+    if isinstance(profile, LaunchProfile):
+        return profile
+    name = profile or BROWSER_LAUNCH_PROFILE
+    return LaunchProfile(name, **_resolve(name, _all_specs()))
@@ -0,0 +1,47 @@
+"""
+在上传会话中检测登录态
+
+上传页面打开后同时等待"上传控件就绪"和"登录页标记"，以先出现的为准。cookie 失效时直接抛出
+CookieInvalidError，这样上传前不必再单独启动一次浏览器做 cookie_auth，每次上传少一次浏览器冷启动和 SPA 加载。
+"""
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+
+# 被重定向到登录页时 URL 中会出现的关键字
+LOGIN_URL_MARKERS = ("login", "passport")
+
+
+class CookieInvalidError(Exception):
+    """上传页面被重定向到登录页，账号 cookie 已失效"""
+
+    def __init__(self, platform, account_file):
+        super().__init__(f"[{platform}] cookie 已失效，需要重新登录: {account_file}")
+        self.platform = platform
+        self.account_file = account_file
+
+
+def is_login_url(url: str) -> bool:
+    return any(marker in url for marker in LOGIN_URL_MARKERS)
+
+
+async def ensure_logged_in(page: Page, ready_selector: str, login_selectors: list, platform, account_file,
+                           timeout=30000):
+    """
+    等待上传页面就绪，发现登录页时抛出 CookieInvalidError
+
+    Args:
+        ready_selector: 已登录时上传页面上一定会出现的元素（如上传 input）
+        login_selectors: 登录页上的标记元素，任意一个出现即视为 cookie 失效
+        timeout: 两者都没有出现时的最长等待时间（毫秒）
+    """
+    ready = page.locator(ready_selector)
+    login = page.locator(login_selectors[0])
+    for selector in login_selectors[1:]:
+        login = login.or_(page.locator(selector))
+    try:
+        await ready.or_(login).first.wait_for(state="attached", timeout=timeout)
+    except PlaywrightTimeoutError:
+        if is_login_url(page.url):
+            raise CookieInvalidError(platform, account_file)
+        raise
+    if is_login_url(page.url) or await login.count():
+        raise CookieInvalidError(platform, account_file)
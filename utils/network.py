@@ -1,28 +1,20 @@
-import asyncio
-import time
 from functools import wraps
 
+from utils.retry import RetryPolicy
+
+
+def async_retry(timeout=60, max_retries=None, policy: RetryPolicy = None):
+    """
+    失败时按 utils/retry.py 的策略重试：指数退避加随机抖动，cookie 失效等致命错误不重试，
+    超过 max_retries 次或 timeout 秒后抛出 RetryExhausted（TimeoutError 的子类）
+    """
+    policy = policy or RetryPolicy(max_attempts=max_retries, deadline=timeout)
 
-def async_retry(timeout=60, max_retries=None):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            start_time = time.time()
-            attempts = 0
-            while True:
-                try:
-                    return await func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    if max_retries is not None and attempts >= max_retries:
-                        print(f"Reached maximum retries of {max_retries}.")
-                        raise Exception(f"Failed after {max_retries} retries.") from e
-                    if time.time() - start_time > timeout:
-                        print(f"Function timeout after {timeout} seconds.")
-                        raise TimeoutError(f"Function execution exceeded {timeout} seconds timeout.") from e
-                    print(f"Attempt {attempts} failed: {e}. Retrying...")
-                    await asyncio.sleep(1)  # Sleep to avoid tight loop or provide backoff logic here
+            return await policy.call(func, *args, **kwargs)
 
         return wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
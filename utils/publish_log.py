@@ -0,0 +1,173 @@
+"""
+按内容去重的发布记录
+
+同一个素材重复发到同一个账号（/postVideo 重试、界面上连点两次、重新运行 examples 里的脚本）既浪费上传带宽，
+也影响账号权重。素材在 /uploadSave 保存时边写边算 SHA-256，写入 file_records.content_hash；
+其它来源的文件（examples 脚本、AI 素材）第一次发布时流式计算，同一进程内按 路径 + 大小 + 修改时间 缓存。
+
+每次发布成功后在 publish_log 表中记录 (content_hash, account, platform)。上传器的 main() 开始前检查，
+已经发布过的直接跳过；构造上传器时传 allow_duplicate=True（接口参数 allowDuplicate）可以强制重新发布。
+上传任务队列在入队时也会检查（见 myUtils/upload_jobs.py），已发布或正在排队的 文件 × 账号 不会生成任务。
+
+    content_hash = publish_log.content_hash(file_path)
+    if await publish_log.already_published(SOCIAL_MEDIA_DOUYIN, account_file, file_path):
+        return
+    ...
+    await publish_log.record(SOCIAL_MEDIA_DOUYIN, account_file, file_path, publish_date)
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from conf import DATA_DIR
+from db.createTable import create_tables, migrate
+from utils.log import browser_logger
+
+DB_PATH = Path(DATA_DIR / "db" / "database.db")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# 流式计算哈希时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path) -> str:
+    """流式计算文件的 SHA-256，不会把几百 MB 的视频整个读进内存"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_stream(stream, path) -> tuple:
+    """把上传的文件流写入 path，同时计算 SHA-256，返回 (字节数, 哈希)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def account_key(account) -> str:
+    """账号 cookie 文件路径 -> 文件名，与 utils/rate_limit.py 一致"""
+    return Path(str(account)).name if account else ""
+
+
+class PublishLog(object):
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = db_path
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self._hashes = {}  # (路径, 大小, 修改时间) -> 哈希
+        self._hash_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            with self._ready_lock:
+                if not self._ready:
+                    # CLI 进程和 examples 脚本不一定执行过 init_db，这里补建表、补齐 content_hash 列
+                    self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(self.db_path, timeout=30)
+                    try:
+                        create_tables(conn.cursor())
+                        migrate(conn.cursor())
+                        conn.commit()
+                    finally:
+                        conn.close()
+                    self._ready = True
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def content_hash(self, file_path) -> str:
+        """素材的 SHA-256：优先读 file_records，否则流式计算（旧的素材记录顺便补上）"""
+        path = Path(str(file_path))
+        stat = path.stat()
+        key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._hash_lock:
+            cached = self._hashes.get(key)
+        if cached:
+            return cached
+        conn = self._connect()
+        try:
+            # /uploadSave 记录的是 videoFile 下的文件名，AI 素材记录的是完整路径
+            row = conn.execute("SELECT id, content_hash FROM file_records WHERE file_path IN (?, ?) LIMIT 1",
+                               (path.name, str(path))).fetchone()
+            if row and row["content_hash"]:
+                content_hash = row["content_hash"]
+            else:
+                content_hash = file_sha256(path)
+                if row:
+                    conn.execute("UPDATE file_records SET content_hash = ? WHERE id = ?", (content_hash, row["id"]))
+        finally:
+            conn.close()
+        with self._hash_lock:
+            self._hashes[key] = content_hash
+        return content_hash
+
+    def lookup(self, platform: str, account, file_path=None, content_hash: str = None) -> Optional[dict]:
+        """该素材发布到该账号的记录，没有发布过时返回 None"""
+        content_hash = content_hash or self.content_hash(file_path)
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM publish_log WHERE content_hash = ? AND account = ? AND platform = ?",
+                               (content_hash, account_key(account), platform)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    def already_published_sync(self, platform: str, account, file_path, allow_duplicate: bool = False) -> bool:
+        """已经发布过且不允许重复时记录日志并返回 True，调用方跳过本次上传"""
+        if allow_duplicate:
+            return False
+        try:
+            published = self.lookup(platform, account, file_path)
+        except (OSError, sqlite3.Error) as e:
+            # 去重只是保护措施，读不到记录时照常上传
+            browser_logger.warning(f"[publish-log] 读取发布记录失败，不做去重: {e}")
+            return False
+        if published is None:
+            return False
+        browser_logger.warning(f"[publish-log] {platform} {account_key(account)} 已于 {published['published_at']} "
+                               f"发布过相同内容（{published['file_path']}），跳过 {Path(str(file_path)).name}；"
+                               f"需要重新发布时传 allow_duplicate=True")
+        return True
+
+    async def already_published(self, platform: str, account, file_path, allow_duplicate: bool = False) -> bool:
+        return await asyncio.to_thread(self.already_published_sync, platform, account, file_path, allow_duplicate)
+
+    def record_sync(self, platform: str, account, file_path, publish_date=None):
+        """发布成功后调用；允许重复发布时累加 count"""
+        try:
+            content_hash = self.content_hash(file_path)
+            conn = self._connect()
+        except (OSError, sqlite3.Error) as e:
+            browser_logger.warning(f"[publish-log] 写入发布记录失败: {e}")
+            return
+        publish_date = publish_date.strftime(TIME_FORMAT) if isinstance(publish_date, datetime) else None
+        try:
+            conn.execute('''
+                INSERT INTO publish_log (content_hash, account, platform, file_path, publish_date, published_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(content_hash, account, platform) DO UPDATE SET
+                    file_path = excluded.file_path, publish_date = excluded.publish_date,
+                    published_at = excluded.published_at, count = count + 1
+            ''', (content_hash, account_key(account), platform, os.path.basename(str(file_path)), publish_date,
+                  datetime.now().strftime(TIME_FORMAT)))
+        except sqlite3.Error as e:
+            browser_logger.warning(f"[publish-log] 写入发布记录失败: {e}")
+        finally:
+            conn.close()
+
+    async def record(self, platform: str, account, file_path, publish_date=None):
+        await asyncio.to_thread(self.record_sync, platform, account, file_path, publish_date)
+
+
+publish_log = PublishLog()
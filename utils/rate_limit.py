@@ -0,0 +1,220 @@
+"""
+按平台、按账号的上传限速（令牌桶）
+
+每个上传器的 main() 开始前调用 upload_rate_limiter.acquire(平台, 账号)。额度在 conf 中配置：
+- UPLOAD_RATE_LIMITS：平台级额度，该平台所有账号共用
+- UPLOAD_ACCOUNT_RATE_LIMITS：账号级额度，每个账号单独计算
+格式为 {"douyin": {"rate": 每小时上传数, "burst": 可以连续上传的次数}}，未配置的平台不限速。
+
+令牌桶状态保存在 SQLite 的 rate_limit_buckets 表中（与后端共用 database.db），后端、上传任务 worker 和多个 CLI 进程
+共用同一份额度。取令牌采用预约方式：在 BEGIN IMMEDIATE 事务里补充令牌并扣掉一个，令牌不足时余额记为负数，
+调用方按欠下的令牌数计算需要等待的时间后再开始上传，后来的请求自然排在后面。等待中被取消时退还令牌。
+预计等待超过 UPLOAD_RATE_LIMIT_MAX_WAIT 秒时不预约，直接抛出 RateLimitExceeded。
+
+限速等待可能长达 UPLOAD_RATE_LIMIT_MAX_WAIT 秒，不能占着 utils/upload_fanout.py 的并发名额等。fan_out 和上传任务队列
+在占用名额之前用 prepaid() 先取令牌，块内上传器 main() 里的 acquire() 直接返回；没有用上的令牌（重复内容跳过、
+平台熔断）在离开 prepaid() 时退还。
+
+等待次数和时长累计在同一张表里，见 snapshot()、/getRateLimits 和 `python cli_main.py rate-limits`。
+"""
+import asyncio
+import contextvars
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+
+from conf import DATA_DIR, UPLOAD_RATE_LIMITS, UPLOAD_ACCOUNT_RATE_LIMITS, UPLOAD_RATE_LIMIT_MAX_WAIT
+from db.createTable import create_tables
+from utils.log import browser_logger
+
+DB_PATH = Path(DATA_DIR / "db" / "database.db")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 当前协程里已经预先取过令牌、还没被 acquire() 用掉的 (平台, 账号)，见 UploadRateLimiter.prepaid()
+_prepaid = contextvars.ContextVar("upload_rate_prepaid", default=frozenset())
+
+
+class RateLimitExceeded(Exception):
+    """预计等待时间超过 UPLOAD_RATE_LIMIT_MAX_WAIT"""
+
+
+def _bucket_spec(spec) -> tuple:
+    """{"rate": 每小时次数, "burst": 桶容量} -> (每秒补充的令牌数, 桶容量)，rate 为 0 时不限速"""
+    if not spec or not spec.get("rate"):
+        return None
+    return spec["rate"] / 3600, max(spec.get("burst") or 1, 1)
+
+
+class UploadRateLimiter(object):
+    def __init__(self, platform_limits: dict = None, account_limits: dict = None,
+                 max_wait: float = UPLOAD_RATE_LIMIT_MAX_WAIT, db_path: Path = DB_PATH):
+        self.platform_limits = UPLOAD_RATE_LIMITS if platform_limits is None else platform_limits
+        self.account_limits = UPLOAD_ACCOUNT_RATE_LIMITS if account_limits is None else account_limits
+        self.max_wait = max_wait
+        self.db_path = db_path
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            with self._ready_lock:
+                if not self._ready:
+                    # CLI 进程不一定执行过 init_db，这里补建表
+                    self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(self.db_path, timeout=30)
+                    try:
+                        create_tables(conn.cursor())
+                        conn.commit()
+                    finally:
+                        conn.close()
+                    self._ready = True
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def buckets(self, platform: str, account: str = "") -> list:
+        """本次上传要扣令牌的桶：[(key, platform, account, 每秒补充数, 容量)]"""
+        buckets = []
+        spec = _bucket_spec(self.platform_limits.get(platform))
+        if spec:
+            buckets.append((platform, platform, "", *spec))
+        spec = _bucket_spec(self.account_limits.get(platform))
+        if spec and account:
+            buckets.append((f"{platform}:{account}", platform, account, *spec))
+        return buckets
+
+    def reserve(self, platform: str, account: str = "") -> float:
+        """预约一次上传，返回需要等待的秒数（0 表示可以立即上传）"""
+        buckets = self.buckets(platform, Path(str(account)).name if account else "")
+        if not buckets:
+            return 0
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            balances = []
+            for key, _, _, rate, burst in buckets:
+                row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row["tokens"] + max(now - row["updated_at"], 0) * rate)
+                balances.append(tokens)
+            # 令牌不足时要等到每个桶都补回一个令牌
+            wait = max(max(1 - tokens, 0) / bucket[3] for bucket, tokens in zip(buckets, balances))
+            if wait > self.max_wait:
+                conn.execute("ROLLBACK")
+                raise RateLimitExceeded(f"{platform} {account} 需要等待 {wait:.0f} 秒，超过上限 {self.max_wait} 秒")
+            for (key, bucket_platform, bucket_account, _, _), tokens in zip(buckets, balances):
+                conn.execute('''
+                    INSERT INTO rate_limit_buckets (key, platform, account, tokens, updated_at, acquired, waited,
+                                                    wait_seconds, max_wait_seconds, last_acquired_at)
+                    VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        tokens = excluded.tokens, updated_at = excluded.updated_at, acquired = acquired + 1,
+                        waited = waited + excluded.waited, wait_seconds = wait_seconds + excluded.wait_seconds,
+                        max_wait_seconds = MAX(max_wait_seconds, excluded.max_wait_seconds),
+                        last_acquired_at = excluded.last_acquired_at
+                ''', (key, bucket_platform, bucket_account, tokens - 1, now, int(wait > 0), wait, wait,
+                      datetime.fromtimestamp(now + wait).strftime(TIME_FORMAT)))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return wait
+
+    def refund(self, platform: str, account: str = ""):
+        """预约后没有上传（等待中被取消）时退还令牌"""
+        keys = [bucket[0] for bucket in self.buckets(platform, Path(str(account)).name if account else "")]
+        if not keys:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany("UPDATE rate_limit_buckets SET tokens = tokens + 1 WHERE key = ?",
+                             [(key,) for key in keys])
+        finally:
+            conn.close()
+
+    async def acquire(self, platform: str, account: str = "") -> float:
+        """等到额度允许后返回，返回值为等待的秒数"""
+        key = (platform, Path(str(account)).name if account else "")
+        prepaid = _prepaid.get()
+        if key in prepaid:
+            # 占用并发名额之前已经取过令牌
+            _prepaid.set(prepaid - {key})
+            return 0
+        reserving = asyncio.ensure_future(asyncio.to_thread(self.reserve, platform, account))
+        try:
+            wait = await asyncio.shield(reserving)
+            if wait > 0:
+                browser_logger.info(f"[rate-limit] {platform} {Path(str(account)).name} 超出上传频率，等待 {wait:.0f} 秒")
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # 预约已经写入（或取消时正在写入）数据库的，退还令牌
+            await asyncio.wait([reserving])
+            if reserving.exception() is None:
+                await asyncio.to_thread(self.refund, platform, account)
+            raise
+        return wait
+
+    @asynccontextmanager
+    async def prepaid(self, platform: str, account: str = ""):
+        """先取令牌再进入块内，块内同一平台、账号的 acquire() 不再等待；令牌没有被用掉时退还"""
+        await self.acquire(platform, account)
+        key = (platform, Path(str(account)).name if account else "")
+        reset = _prepaid.set(_prepaid.get() | {key})
+        try:
+            yield
+        finally:
+            unused = key in _prepaid.get()
+            _prepaid.reset(reset)
+            if unused:
+                await asyncio.to_thread(self.refund, platform, account)
+
+    def acquire_sync(self, platform: str, account: str = "") -> float:
+        """同步版本，供 BilibiliUploader 等同步上传器使用"""
+        wait = self.reserve(platform, account)
+        if wait > 0:
+            browser_logger.info(f"[rate-limit] {platform} {Path(str(account)).name} 超出上传频率，等待 {wait:.0f} 秒")
+            time.sleep(wait)
+        return wait
+
+    def snapshot(self, platform: str = None) -> list:
+        """各个桶当前的令牌数和累计等待情况"""
+        conn = self._connect()
+        try:
+            if platform:
+                rows = conn.execute("SELECT * FROM rate_limit_buckets WHERE platform = ? ORDER BY key",
+                                    (platform,)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM rate_limit_buckets ORDER BY key").fetchall()
+        finally:
+            conn.close()
+        now = time.time()
+        result = []
+        for row in rows:
+            limits = self.account_limits if row["account"] else self.platform_limits
+            spec = _bucket_spec(limits.get(row["platform"]))
+            tokens = row["tokens"]
+            if spec:
+                tokens = min(spec[1], tokens + max(now - row["updated_at"], 0) * spec[0])
+            result.append({
+                "key": row["key"],
+                "platform": row["platform"],
+                "account": row["account"],
+                "rate_per_hour": round(spec[0] * 3600, 2) if spec else None,
+                "burst": spec[1] if spec else None,
+                "tokens": round(tokens, 2),
+                "acquired": row["acquired"],
+                "waited": row["waited"],
+                "wait_seconds": round(row["wait_seconds"], 1),
+                "avg_wait_seconds": round(row["wait_seconds"] / row["waited"], 1) if row["waited"] else 0,
+                "max_wait_seconds": round(row["max_wait_seconds"], 1),
+                "last_acquired_at": row["last_acquired_at"],
+            })
+        return result
+
+
+upload_rate_limiter = UploadRateLimiter()
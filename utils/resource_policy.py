@@ -0,0 +1,82 @@
+"""
+校验 cookie 用的精简加载策略
+
+cookie 校验只需要判断页面上的某个登录标记，不需要图片、视频、字体和埋点上报。
+通过 context.route 拦截这些请求并直接 abort，可以明显减少校验耗时和流量。
+
+注意：Playwright 开启路由后会禁用该上下文的 HTTP 缓存，所以只用于一次性的校验上下文，
+不要用在上传上下文（尤其是持久化 Profile）上。
+"""
+from urllib.parse import urlsplit
+
+from conf import VALIDATION_BLOCK_RESOURCES
+from utils.base_social_media import SOCIAL_MEDIA_DOUYIN, SOCIAL_MEDIA_TENCENT, SOCIAL_MEDIA_KUAISHOU, \
+    SOCIAL_MEDIA_XIAOHONGSHU
+
+# 所有平台默认拦截的资源类型（Playwright request.resource_type）
+DEFAULT_BLOCK_TYPES = ["image", "media", "font"]
+
+# 所有平台默认拦截的第三方统计/监控域名（按域名后缀匹配）
+DEFAULT_BLOCK_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "hm.baidu.com",
+]
+
+# 各平台的拦截策略，block_types / block_hosts 会与默认值合并；enabled=False 可单独关闭某个平台
+VALIDATION_RESOURCE_POLICIES = {
+    SOCIAL_MEDIA_DOUYIN: {
+        "enabled": True,
+        "block_types": [],
+        "block_hosts": ["mcs.zijieapi.com", "mon.zijieapi.com", "mon.snssdk.com"],
+    },
+    SOCIAL_MEDIA_TENCENT: {
+        "enabled": True,
+        "block_types": [],
+        "block_hosts": ["aegis.qq.com", "beacon.qq.com", "report.url.cn"],
+    },
+    SOCIAL_MEDIA_KUAISHOU: {
+        "enabled": True,
+        "block_types": [],
+        "block_hosts": ["log-sdk.ksapisrv.com", "wlog.kuaishou.com"],
+    },
+    SOCIAL_MEDIA_XIAOHONGSHU: {
+        "enabled": True,
+        "block_types": [],
+        "block_hosts": ["apm-fe.xiaohongshu.com", "t2.xiaohongshu.com"],
+    },
+}
+
+
+def _host_blocked(host: str, block_hosts) -> bool:
+    return any(host == blocked or host.endswith("." + blocked) for blocked in block_hosts)
+
+
+async def apply_validation_policy(context, platform: str, enabled: bool = None):
+    """
+    为校验用的上下文开启资源拦截
+
+    Args:
+        context: BrowserContext
+        platform: 平台标识，见 utils.base_social_media.SOCIAL_MEDIA_*
+        enabled: 是否开启，默认取 conf.VALIDATION_BLOCK_RESOURCES
+    """
+    policy = VALIDATION_RESOURCE_POLICIES.get(platform, {})
+    if enabled is None:
+        enabled = VALIDATION_BLOCK_RESOURCES and policy.get("enabled", True)
+    if not enabled:
+        return context
+
+    block_types = set(DEFAULT_BLOCK_TYPES) | set(policy.get("block_types", []))
+    block_hosts = DEFAULT_BLOCK_HOSTS + policy.get("block_hosts", [])
+
+    async def handle(route):
+        request = route.request
+        host = urlsplit(request.url).hostname or ""
+        if request.resource_type in block_types or _host_blocked(host, block_hosts):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+    return context
@@ -0,0 +1,252 @@
+"""
+重试策略和平台熔断
+
+上传器里点击发布、等待进入发布页、等待文件上传的 `while True` 循环原来没有上限，页面结构一变就会一直卡住；
+utils/network.async_retry 固定每秒重试一次。这里统一成 RetryPolicy：
+- 失败后按指数退避等待（base_delay × multiplier^(n-1)，最多 max_delay），并加随机抖动，多个上传不会同时重试
+- 区分可重试和致命错误：cookie 失效、超出限速、文件不存在等重试也不会成功，直接抛出
+- 超过 max_attempts 次或 deadline 秒仍未成功时抛出 RetryExhausted（TimeoutError 的子类）
+
+    retry = PUBLISH_RETRY.start("点击发布")
+    while True:
+        try:
+            ...
+            break
+        except Exception as e:
+            await retry.backoff(e)  # 致命错误或重试用尽时抛出，否则等待退避时间
+
+轮询类的循环（本身已经带等待）用 retry.failed() 只计数、检查截止时间。
+
+平台熔断：选择器变化、平台故障时同一平台的上传会接连失败，继续启动浏览器只是浪费资源。上传器 main() 用
+circuit_breakers.guard(平台) 包住整个上传：连续 CIRCUIT_BREAKER_FAILURE_THRESHOLD 次失败后熔断，之后的上传直接抛出
+CircuitOpenError，不再启动浏览器；CIRCUIT_BREAKER_COOL_DOWN 秒后半开，放行一个上传试探，成功则恢复，失败则重新计时。
+熔断状态只保存在当前进程内，见 snapshot()、/getCircuitBreakers。
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from conf import RETRY_BASE_DELAY, RETRY_MAX_DELAY, PUBLISH_RETRY_DEADLINE, UPLOAD_TRANSFER_TIMEOUT, \
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_COOL_DOWN
+from utils.log import browser_logger
+from utils.login_guard import CookieInvalidError
+from utils.rate_limit import RateLimitExceeded
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 账号自身的问题：重试也不会成功，也不说明平台出了问题，不计入熔断
+ACCOUNT_ERRORS = (CookieInvalidError, RateLimitExceeded)
+# 重试也不会成功的错误
+FATAL_ERRORS = ACCOUNT_ERRORS + (FileNotFoundError, PermissionError, NotImplementedError)
+
+
+class RetryExhausted(TimeoutError):
+    """超过最大次数或截止时间仍未成功，__cause__ 为最后一次的错误"""
+
+
+class CircuitOpenError(Exception):
+    """平台已熔断，本次上传没有启动浏览器"""
+
+    def __init__(self, platform: str, retry_at: float):
+        retry_time = datetime.fromtimestamp(retry_at).strftime(TIME_FORMAT)
+        super().__init__(f"[{platform}] 连续上传失败已熔断，{retry_time} 后再试")
+        self.platform = platform
+        self.retry_at = retry_at
+
+
+def is_retryable(error: BaseException) -> bool:
+    return not isinstance(error, FATAL_ERRORS + (CircuitOpenError,))
+
+
+class RetryPolicy(object):
+    def __init__(self, max_attempts: int = None, deadline: float = None, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, multiplier: float = 2, jitter: float = 1):
+        """
+        Args:
+            max_attempts: 最多失败几次，None 表示不限
+            deadline: 从 start() 开始最多重试多少秒，None 表示不限
+            base_delay / max_delay / multiplier: 第一次失败后的等待秒数、等待上限和增长倍数
+            jitter: 等待时间中随机的比例，1 为在 [0, 上限] 内随机（full jitter），0 为不随机
+        """
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.base_delay = max(base_delay, 0)
+        self.max_delay = max(max_delay, self.base_delay)
+        self.multiplier = max(multiplier, 1)
+        self.jitter = min(max(jitter, 0), 1)
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次失败后应等待的秒数"""
+        # 轮询类的循环会失败上千次，指数不设上限时 float 会溢出
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** min(max(attempt - 1, 0), 64))
+        return ceiling - random.uniform(0, ceiling * self.jitter)
+
+    def start(self, name: str = "") -> "Retry":
+        return Retry(self, name)
+
+    async def call(self, func, *args, name: str = "", **kwargs):
+        """执行异步函数 func，失败时按策略重试"""
+        retry = self.start(name or getattr(func, "__name__", ""))
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                await retry.backoff(e)
+
+
+class Retry(object):
+    """一次重试过程：失败次数和开始时间"""
+
+    def __init__(self, policy: RetryPolicy, name: str = ""):
+        self.policy = policy
+        self.name = name
+        self.attempts = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def failed(self, error: Exception = None) -> float:
+        """记一次失败，返回下一次重试前应等待的秒数；致命错误原样抛出，重试用尽时抛出 RetryExhausted"""
+        self.attempts += 1
+        if error is not None and not is_retryable(error):
+            raise error
+        policy = self.policy
+        if policy.max_attempts is not None and self.attempts >= policy.max_attempts:
+            raise RetryExhausted(f"{self.name} 失败 {self.attempts} 次，不再重试: {error}") from error
+        delay = policy.delay(self.attempts)
+        if policy.deadline is not None:
+            remaining = policy.deadline - self.elapsed
+            if remaining <= 0:
+                raise RetryExhausted(f"{self.name} {policy.deadline:.0f} 秒内未成功（{self.attempts} 次）: {error}") \
+                    from error
+            delay = min(delay, remaining)
+        return delay
+
+    async def backoff(self, error: Exception = None):
+        await asyncio.sleep(self.failed(error))
+
+
+# 点击发布：最多重试 PUBLISH_RETRY_DEADLINE 秒
+PUBLISH_RETRY = RetryPolicy(deadline=PUBLISH_RETRY_DEADLINE)
+# 等待进入发布页等页面跳转
+PAGE_RETRY = RetryPolicy(max_attempts=20, deadline=60)
+# 等待文件上传、转码：只限制总时长，固定间隔检查
+TRANSFER_POLL = RetryPolicy(deadline=UPLOAD_TRANSFER_TIMEOUT, base_delay=2, max_delay=2, jitter=0)
+# 平台提示上传出错后重新选择文件：平台一直拒绝的文件不会无限重传
+REUPLOAD_RETRY = RetryPolicy(max_attempts=3)
+
+
+class CircuitBreaker(object):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, platform: str, failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 cool_down: float = CIRCUIT_BREAKER_COOL_DOWN):
+        self.platform = platform
+        self.failure_threshold = max(failure_threshold, 1)
+        self.cool_down = cool_down
+        self.state = self.CLOSED
+        self.failures = 0  # 连续失败次数
+        self.opened_at = 0.0
+        self.last_error = None
+        self.stats = {"opened": 0, "rejected": 0}
+        self._trial = False  # 半开状态下是否已经放行了一个试探
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """熔断中抛出 CircuitOpenError；冷却结束后放行一个试探"""
+        with self._lock:
+            now = time.time()
+            if self.state == self.OPEN and now - self.opened_at >= self.cool_down:
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                browser_logger.info(f"[circuit] {self.platform} 冷却结束，放行一个上传试探")
+                return
+            if self.state != self.CLOSED:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.platform, max(self.opened_at + self.cool_down, now))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                browser_logger.success(f"[circuit] {self.platform} 上传恢复正常，解除熔断")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            if isinstance(error, FATAL_ERRORS) or not isinstance(error, Exception):
+                # 账号、本地文件的问题或被取消，不能说明平台是否恢复，让下一个上传继续试探
+                self._trial = False
+                return
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == self.OPEN:
+                # 熔断前已经开始的上传陆续失败，不重新计时
+                return
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self._trial = False
+                self.stats["opened"] += 1
+                browser_logger.error(f"[circuit] {self.platform} 连续失败 {self.failures} 次，"
+                                     f"{self.cool_down} 秒内不再启动浏览器。最后一次错误: {self.last_error}")
+
+    @contextmanager
+    def guard(self):
+        self.before_call()
+        try:
+            yield
+        except BaseException as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "platform": self.platform,
+                "state": self.state,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "retry_at": datetime.fromtimestamp(self.opened_at + self.cool_down).strftime(TIME_FORMAT)
+                if self.state != self.CLOSED else None,
+            }
+
+
+class CircuitBreakers(object):
+    """按平台分别熔断"""
+
+    def __init__(self, failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 cool_down: float = CIRCUIT_BREAKER_COOL_DOWN):
+        self.failure_threshold = failure_threshold
+        self.cool_down = cool_down
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, platform: str) -> CircuitBreaker:
+        with self._lock:
+            if platform not in self._breakers:
+                self._breakers[platform] = CircuitBreaker(platform, self.failure_threshold, self.cool_down)
+            return self._breakers[platform]
+
+    def guard(self, platform: str):
+        return self.get(platform).guard()
+
+    def snapshot(self) -> list:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
+
+
+circuit_breakers = CircuitBreakers()
@@ -0,0 +1,169 @@
+"""
+多账号定时发布时间分配
+
+generate_schedule_time_next_day 只按 daily_times 给一个账号排出一串时间，不知道其它批次已经占用的时间，
+网页上分批提交的定时任务会堆在同一个整点。SlotAllocator 先把已经预定的发布时间按 平台 × 账号 建立有序索引，
+再为新视频逐个找最早的空闲时间：
+- 每个候选时间来自 daily_times（整数小时或 "HH:MM"），从 start_days 之后的第二天开始
+- 同一账号两次发布至少间隔 min_spacing；候选时间与已预定时间冲突时在本时段（slot_width）内顺延，时段内放不下换下一个时段
+- 每个账号每天最多 per_day 个，每个平台每天最多 platform_daily_caps[平台] 个（所有账号合计）
+
+每个账号从上一次分配的位置继续向后找，分配 n 个时间的总耗时约为 O(n log n)，一个月几千个视频也在毫秒级。
+
+    allocator = SlotAllocator(daily_times=["10:00", 18], per_day=2)
+    allocator.book("douyin", "a.json", datetime(...))           # 已有的预定
+    allocator.allocate_batch("douyin", ["a.json", "b.json"], 3)  # [[a 的时间, b 的时间], ...] 每个视频发到所有账号
+    allocator.allocate_batch("douyin", accounts, 1000, spread=True)  # [(账号, 时间), ...] 每个视频只发一个账号
+"""
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, date
+from typing import Optional
+
+from conf import SCHEDULE_MIN_SPACING_MINUTES, SCHEDULE_PLATFORM_DAILY_CAPS, SCHEDULE_MAX_DAYS
+
+# 默认的每日发布时间，与 generate_schedule_time_next_day 一致
+DEFAULT_DAILY_TIMES = [6, 11, 14, 16, 22]
+
+
+def parse_daily_time(value) -> timedelta:
+    """16、"16"、"16:30" -> 当天的时间偏移"""
+    if isinstance(value, (int, float)):
+        return timedelta(hours=value)
+    hour, _, minute = str(value).strip().partition(":")
+    return timedelta(hours=int(hour), minutes=int(minute or 0))
+
+
+class BookingIndex(object):
+    """按 key 保存有序的预定时间（时间戳），用于查询某个时间附近是否已有预定，以及按天计数"""
+
+    def __init__(self):
+        self._times = defaultdict(list)
+        self._per_day = defaultdict(Counter)
+
+    def add(self, key, when: datetime):
+        insort(self._times[key], when.timestamp())
+        self._per_day[key][when.date()] += 1
+
+    def count(self, key, day: date) -> int:
+        return self._per_day[key][day]
+
+    def conflict(self, key, when: datetime, spacing: float) -> Optional[float]:
+        """返回与 when 间隔小于 spacing 秒的最晚一个预定时间，没有冲突时返回 None"""
+        times = self._times.get(key)
+        if not times or spacing <= 0:
+            return None
+        timestamp = when.timestamp()
+        index = bisect_left(times, timestamp + spacing)
+        if index and times[index - 1] > timestamp - spacing:
+            return times[index - 1]
+        return None
+
+    def __len__(self):
+        return sum(len(times) for times in self._times.values())
+
+
+class SlotAllocator(object):
+    def __init__(self, daily_times=None, per_day: int = 1, start_days: int = 0,
+                 min_spacing: float = SCHEDULE_MIN_SPACING_MINUTES * 60, platform_daily_caps: dict = None,
+                 slot_width: float = 3600, max_days: int = SCHEDULE_MAX_DAYS, now: datetime = None):
+        """
+        Args:
+            daily_times: 每天的发布时间，整数小时或 "HH:MM"，默认 DEFAULT_DAILY_TIMES
+            per_day: 每个账号每天最多发布几个
+            start_days: 从 start_days 天之后的第二天开始（0 表示明天）
+            min_spacing: 同一账号两次发布的最小间隔（秒）
+            platform_daily_caps: {平台: 每天最多发布几个}，所有账号合计
+            slot_width: 冲突时在一个发布时间之后最多顺延多少秒
+            max_days: 最多往后排多少天，排不下时抛出 ValueError
+        """
+        if per_day <= 0:
+            raise ValueError("per_day should be a positive integer")
+        self.offsets = sorted(parse_daily_time(value) for value in (daily_times or DEFAULT_DAILY_TIMES))
+        self.per_day = per_day
+        self.min_spacing = max(min_spacing, 0)
+        self.platform_daily_caps = SCHEDULE_PLATFORM_DAILY_CAPS if platform_daily_caps is None else platform_daily_caps
+        self.slot_width = max(slot_width, self.min_spacing)
+        self.max_days = max_days
+        now = now or datetime.now()
+        self.now = now
+        self.first_day = datetime.combine(now.date(), datetime.min.time()) + timedelta(days=start_days + 1)
+        self.index = BookingIndex()
+        self._cursor = {}  # (平台, 账号) -> 下一次从第几个候选时段开始找
+
+    def book(self, platform: str, account: str, when: datetime):
+        """登记已经预定的发布时间（来自数据库或本次分配）"""
+        self.index.add((platform, account), when)
+        self.index.add(platform, when)
+
+    def _candidate(self, position: int) -> datetime:
+        day, slot = divmod(position, len(self.offsets))
+        return self.first_day + timedelta(days=day) + self.offsets[slot]
+
+    def _fits(self, platform: str, account: str, when: datetime) -> Optional[datetime]:
+        """在 when 所在的时段内找不与本账号冲突的最早时间，放不下时返回 None"""
+        key = (platform, account)
+        slot_end = when + timedelta(seconds=self.slot_width)
+        while when < slot_end:
+            if when <= self.now:
+                return None
+            booked = self.index.conflict(key, when, self.min_spacing)
+            if booked is None:
+                return when
+            when = datetime.fromtimestamp(booked + self.min_spacing)
+        return None
+
+    def next_slot(self, platform: str, account: str) -> tuple:
+        """找账号下一个空闲时间，返回 (候选时段位置, 时间)，不登记"""
+        key = (platform, account)
+        position = self._cursor.get(key, 0)
+        cap = self.platform_daily_caps.get(platform)
+        limit = self.max_days * len(self.offsets)
+        while position < limit:
+            candidate = self._candidate(position)
+            day = candidate.date()
+            if self.index.count(key, day) >= self.per_day or (cap and self.index.count(platform, day) >= cap):
+                # 这一天已经排满，直接跳到下一天的第一个时段
+                position = (position // len(self.offsets) + 1) * len(self.offsets)
+                continue
+            when = self._fits(platform, account, candidate)
+            if when is not None:
+                return position, when
+            position += 1
+        raise ValueError(f"{platform} {account} 在 {self.max_days} 天内没有空闲的发布时间")
+
+    def allocate(self, platform: str, account: str) -> datetime:
+        """为账号分配下一个空闲时间并登记"""
+        position, when = self.next_slot(platform, account)
+        self.book(platform, account, when)
+        # 与 generate_schedule_time_next_day 一致，同一账号的下一个视频排到下一个发布时间，不在本时段内顺延
+        self._cursor[(platform, account)] = position + 1
+        return when
+
+    def allocate_batch(self, platform: str, accounts: list, total_videos: int, spread: bool = False) -> list:
+        """
+        为一批视频分配发布时间
+
+        Args:
+            spread: False 时每个视频发到所有账号，返回 [[每个账号的时间, ...], ...]；
+                    True 时每个视频只发一个账号，按各账号最早的空闲时间轮流分配，返回 [(账号, 时间), ...]
+        """
+        if not spread:
+            return [[self.allocate(platform, account) for account in accounts] for _ in range(total_videos)]
+        heap = []
+        for order, account in enumerate(accounts):
+            heapq.heappush(heap, (self.next_slot(platform, account)[1], order, account))
+        result = []
+        while heap and len(result) < total_videos:
+            when, order, account = heapq.heappop(heap)
+            position, actual = self.next_slot(platform, account)
+            if actual != when:
+                # 平台每日上限被其它账号占满后，这个账号的空闲时间往后推了，放回去重新比较
+                heapq.heappush(heap, (actual, order, account))
+                continue
+            self.book(platform, account, when)
+            self._cursor[(platform, account)] = position + 1
+            result.append((account, when))
+            heapq.heappush(heap, (self.next_slot(platform, account)[1], order, account))
+        return result
@@ -0,0 +1,241 @@
+"""
+上传流程分阶段耗时追踪
+
+每个上传器持有一个 UploadTracer，main() 里用 `with self.tracer:` 包住整次上传，upload() 在进入各阶段时调用
+`self.tracer.phase(name)`：新阶段开始即结束上一个阶段。阶段名统一使用 PHASES 中的名字，便于跨平台对比；
+同一次上传中重复进入的阶段（例如抖音上传完成后继续填写表单）在汇总时按次上传累加。
+需要单独计时的子步骤可以用 `with self.tracer.span(name):`。
+
+每个 span 结束时写一行 JSON 到 TRACE_FILE，上传成功结束时把各阶段耗时交给进程内的 phase_stats 汇总：
+
+    {"trace_id": "...", "kind": "phase", "name": "transcode", "platform": "douyin", "account": "<cookie 文件名>",
+     "file": "a.mp4", "start": 1760000000.0, "end": 1760000012.3, "duration_ms": 12300.0, "status": "ok", "meta": {}}
+
+kind 为 upload 的记录是整次上传的汇总。`python cli_main.py trace-report` 从文件中统计各平台各阶段的 p50 / p95。
+"""
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+from conf import BASE_DIR, UPLOAD_TRACE_FILE_ENABLED
+from utils.log import browser_logger
+
+TRACE_FILE = Path(BASE_DIR / "logs" / "upload_trace.jsonl")
+# 超过这个大小时把当前文件改名为 upload_trace.jsonl.1 再重新写
+TRACE_FILE_MAX_BYTES = 10 * 1024 * 1024
+
+PHASES = (
+    "launch",  # 启动 / 借用浏览器、创建上下文
+    "navigate",  # 打开上传页并确认登录态
+    "file_input",  # 选择视频文件直到进入发布表单
+    "transcode",  # 等待视频上传、转码完成
+    "form",  # 填写标题、话题、封面、位置等
+    "schedule",  # 设置定时发布
+    "publish",  # 点击发布直到确认发布成功
+    "cleanup",  # 保存 cookie、关闭上下文
+)
+
+_write_lock = threading.Lock()
+
+
+def write_span(record: dict):
+    if not UPLOAD_TRACE_FILE_ENABLED:
+        return
+    line = json.dumps(record, ensure_ascii=False)
+    with _write_lock:
+        try:
+            TRACE_FILE.parent.mkdir(exist_ok=True)
+            if TRACE_FILE.exists() and TRACE_FILE.stat().st_size > TRACE_FILE_MAX_BYTES:
+                TRACE_FILE.replace(TRACE_FILE.with_suffix(".jsonl.1"))
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            browser_logger.warning(f"[-] 写入上传追踪文件失败: {e}")
+
+
+def percentile(values: list, q: float) -> float:
+    """线性插值的分位数，values 需已排序"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples: dict) -> list:
+    """把 {(平台, 阶段): [耗时 ms, ...]} 汇总成按平台、PHASES 顺序排列的 p50 / p95"""
+    def order(key):
+        platform, name = key
+        return platform, PHASES.index(name) if name in PHASES else len(PHASES), name
+
+    result = []
+    for platform, name in sorted(samples, key=order):
+        values = sorted(samples[(platform, name)])
+        result.append({
+            "platform": platform,
+            "phase": name,
+            "count": len(values),
+            "p50_ms": round(percentile(values, 0.5), 1),
+            "p95_ms": round(percentile(values, 0.95), 1),
+        })
+    return result
+
+
+class PhaseAggregator(object):
+    """进程内按 (平台, 阶段) 保存最近 max_samples 次上传的耗时"""
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def add(self, platform: str, name: str, duration_ms: float):
+        with self._lock:
+            self._samples.setdefault((platform, name), deque(maxlen=self.max_samples)).append(duration_ms)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            samples = {key: list(values) for key, values in self._samples.items()}
+        return summarize(samples)
+
+
+phase_stats = PhaseAggregator()
+
+
+class UploadTracer(object):
+    def __init__(self, platform: str, account_file, file_path):
+        self.platform = platform
+        self.account = Path(str(account_file)).name
+        self.file = Path(str(file_path)).name
+        self.trace_id = None
+        self.started_at = None
+        self._current = None  # 当前阶段 (名字, 开始时间, meta)
+        self._totals = {}  # 阶段名 -> 本次上传累计耗时 ms
+        self._listeners = []  # 进入新阶段时回调，参数为阶段名（见 utils/diagnostics.py）
+        self._notes = {}  # 写进整次上传汇总记录 meta 的附加信息
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+    def start(self):
+        """开始一次新的上传追踪（同一个上传器对象重试时会重新开始）"""
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self._current = None
+        self._totals = {}
+        self._notes = {}
+
+    def phase(self, name: str, **meta):
+        """结束上一个阶段并进入新阶段"""
+        if self.trace_id is None:
+            self.start()
+        self._close_phase()
+        self._current = (name, time.time(), meta)
+        for listener in self._listeners:
+            listener(name)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def annotate(self, **meta):
+        """附加到本次上传汇总记录（kind 为 upload）meta 中的信息，例如条件等待统计"""
+        self._notes.update(meta)
+
+    @contextmanager
+    def span(self, name: str, **meta):
+        """单独计时的子步骤，不计入阶段汇总"""
+        if self.trace_id is None:
+            self.start()
+        start = time.time()
+        try:
+            yield
+        except BaseException as e:
+            self._record("span", name, start, meta, e)
+            raise
+        self._record("span", name, start, meta)
+
+    def finish(self, error: Optional[BaseException] = None):
+        """结束当前阶段并写入整次上传的汇总，重复调用无效果"""
+        if self.trace_id is None:
+            return
+        self._close_phase(error)
+        self._record("upload", "upload", self.started_at,
+                     {"phases": {k: round(v, 1) for k, v in self._totals.items()}, **self._notes}, error)
+        if error is None:
+            for name, duration_ms in self._totals.items():
+                phase_stats.add(self.platform, name, duration_ms)
+        browser_logger.info(f"[trace] {self.platform} {self.file} " +
+                            " | ".join(f"{name} {duration_ms / 1000:.1f}s" for name, duration_ms in self._totals.items()))
+        self.trace_id = None
+
+    def _close_phase(self, error: Optional[BaseException] = None):
+        if self._current is None:
+            return
+        name, start, meta = self._current
+        self._current = None
+        duration_ms = self._record("phase", name, start, meta, error)
+        self._totals[name] = self._totals.get(name, 0.0) + duration_ms
+
+    def _record(self, kind: str, name: str, start: float, meta: dict, error: Optional[BaseException] = None) -> float:
+        end = time.time()
+        duration_ms = (end - start) * 1000
+        record = {
+            "trace_id": self.trace_id,
+            "kind": kind,
+            "name": name,
+            "platform": self.platform,
+            "account": self.account,
+            "file": self.file,
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "duration_ms": round(duration_ms, 1),
+            "status": "ok" if error is None else "error",
+            "meta": meta,
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        write_span(record)
+        return duration_ms
+
+
+def load_spans(paths: Iterable[Path]) -> list:
+    spans = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return spans
+
+
+def phase_report(spans: list, platform: Optional[str] = None, include_failed: bool = False) -> list:
+    """按次上传累加各阶段耗时后统计 p50 / p95；默认只统计成功的上传"""
+    failed = {span["trace_id"] for span in spans if span.get("kind") == "upload" and span.get("status") != "ok"}
+    per_trace = {}
+    for span in spans:
+        if span.get("kind") != "phase" or (platform and span.get("platform") != platform):
+            continue
+        if not include_failed and span.get("trace_id") in failed:
+            continue
+        key = (span["trace_id"], span["platform"], span["name"])
+        per_trace[key] = per_trace.get(key, 0.0) + span["duration_ms"]
+    samples = {}
+    for (_, span_platform, name), duration_ms in per_trace.items():
+        samples.setdefault((span_platform, name), []).append(duration_ms)
+    return summarize(samples)
@@ -0,0 +1,104 @@
+"""
+文件 × 账号 的并发上传
+
+原来 post_video_* 按 文件 -> 账号 两层循环逐个上传，每次还新建一个事件循环，一个视频发 10 个账号要花 10 倍时间。
+fan_out() 在同一个事件循环里（使用浏览器池时是池的后台循环）并发执行所有上传器的 main()，
+同时运行的上传数受 UPLOAD_MAX_CONCURRENCY 和 UPLOAD_PLATFORM_CONCURRENCY 中对应平台的上限约束，
+每个 文件 × 账号 单独记录成功或失败，一个失败不影响其它上传。
+
+上传任务队列（myUtils/upload_jobs.py）也通过同一个 upload_limiter 执行，两边加起来不会超过上限。
+占用名额之前先取限速令牌（utils/rate_limit.py 的 prepaid()），等待限速时不占着名额，不耽误其它平台、账号的上传。
+
+    results = browser_pool.run(fan_out(apps))
+    # [{"platform": "douyin", "file": "a.mp4", "account": "xxx.json", "ok": True, "error": None, "seconds": 42.1,
+    #   "skipped": False}, ...]
+"""
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from conf import UPLOAD_MAX_CONCURRENCY, UPLOAD_PLATFORM_CONCURRENCY
+from utils.log import browser_logger
+from utils.rate_limit import upload_rate_limiter
+
+
+class UploadLimiter(object):
+    """
+    全局和按平台的并发上限
+
+    asyncio.Semaphore 只能在一个事件循环里使用，这里按事件循环分别创建：浏览器池的后台循环里共享同一组信号量，
+    不使用浏览器池时 asyncio.run() 新建的循环各自计数。
+    """
+
+    def __init__(self, max_concurrency: int = UPLOAD_MAX_CONCURRENCY, platform_limits: dict = None):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.platform_limits = dict(UPLOAD_PLATFORM_CONCURRENCY if platform_limits is None else platform_limits)
+        self._semaphores = weakref.WeakKeyDictionary()  # 事件循环 -> {None: 全局信号量, 平台: 信号量}
+
+    def _semaphore(self, platform=None) -> asyncio.Semaphore:
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if platform not in semaphores:
+            limit = self.max_concurrency if platform is None else self.platform_limits.get(platform,
+                                                                                             self.max_concurrency)
+            semaphores[platform] = asyncio.Semaphore(max(limit, 1))
+        return semaphores[platform]
+
+    @asynccontextmanager
+    async def slot(self, platform: str, account: str = None):
+        """
+        占用一个上传名额；先等平台名额再等全局名额，避免排队中的平台占着全局名额
+
+        传入 account 时先按 utils/rate_limit.py 取该平台、账号的令牌再排队，限速等待期间不占名额
+        """
+        if account is None:
+            async with self._semaphore(platform), self._semaphore():
+                yield
+            return
+        async with upload_rate_limiter.prepaid(platform, account), self._semaphore(platform), self._semaphore():
+            yield
+
+
+upload_limiter = UploadLimiter()
+
+
+async def fan_out(apps: list, limiter: UploadLimiter = None) -> list:
+    """
+    并发执行上传器的 main()
+
+    Args:
+        apps: 上传器实例列表（DouYinVideo、KSVideo 等，需要有 tracer 属性）
+        limiter: 并发上限，默认使用进程内共用的 upload_limiter
+
+    Returns:
+        与 apps 顺序一致的结果列表，每项为 {"platform", "file", "account", "ok", "error", "seconds", "skipped"}
+    """
+    limiter = limiter or upload_limiter
+
+    async def run(app):
+        tracer = app.tracer
+        result = {"platform": tracer.platform, "file": tracer.file, "account": tracer.account, "ok": False,
+                  "error": None, "seconds": 0, "skipped": False}
+        start = time.monotonic()
+        try:
+            async with limiter.slot(tracer.platform, tracer.account):
+                start = time.monotonic()
+                await app.main()
+            result["ok"] = True
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            browser_logger.error(f"[fan-out] {result['platform']} {result['file']} -> {result['account']} 上传失败: {e}")
+        result["seconds"] = round(time.monotonic() - start, 1)
+        return result
+
+    results = await asyncio.gather(*(run(app) for app in apps))
+    succeeded = sum(1 for result in results if result["ok"])
+    browser_logger.info(f"[fan-out] 共 {len(results)} 个上传，成功 {succeeded}，失败 {len(results) - succeeded}")
+    return list(results)
+
+
+def run_fan_out(apps: list, browser_pool=None) -> list:
+    """同步调用 fan_out()：使用浏览器池时在池的事件循环中运行，否则新建一个事件循环"""
+    if browser_pool is not None:
+        return browser_pool.run(fan_out(apps))
+    return asyncio.run(fan_out(apps))
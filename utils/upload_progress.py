@@ -0,0 +1,225 @@
+"""
+上传吞吐量统计
+
+UploadProgress 挂在上传页面的 request / requestfinished / requestfailed 事件上，识别视频分片上传请求，
+统计已发送字节数、分片耗时和吞吐量，每完成一个分片发布一条进度事件：
+
+    {"event": "upload_progress", "upload_id": "...", "platform": "douyin", "account": "<cookie 文件名>",
+     "file": "a.mp4", "bytes_sent": 12582912, "total_bytes": 33554432, "percent": 37.5, "chunks": 3,
+     "chunk_latency_ms": 820.3, "throughput_bps": 2097152.0, "elapsed": 6.0}
+
+另外还有 upload_chunk_failed（分片请求失败）和 upload_finished（上传流程结束时的汇总）两种事件。
+
+通过 subscribe() 订阅事件：sau_backend.py 的 /uploadProgress 以 SSE 推送给前端，upload_metrics 按平台和账号汇总。
+回调在浏览器所在的线程中同步执行，不要在回调里做耗时操作。
+"""
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+from playwright.async_api import Page, Request
+
+from utils.base_social_media import SOCIAL_MEDIA_DOUYIN, SOCIAL_MEDIA_TENCENT, SOCIAL_MEDIA_KUAISHOU, \
+    SOCIAL_MEDIA_XIAOHONGSHU, SOCIAL_MEDIA_TIKTOK
+from utils.log import browser_logger
+
+# 各平台视频分片上传请求的 URL 特征
+UPLOAD_URL_PATTERNS = {
+    SOCIAL_MEDIA_DOUYIN: re.compile(r"/upload/v1/|[?&]uploadid=|[?&]part_number="),
+    SOCIAL_MEDIA_TENCENT: re.compile(r"/snsuploadbig/|uploadpartdfs"),
+    SOCIAL_MEDIA_KUAISHOU: re.compile(r"/api/upload/fragment|upload\.kuaishouzt\.com"),
+    SOCIAL_MEDIA_XIAOHONGSHU: re.compile(r"ros-upload|[?&]uploadId=|[?&]partNumber="),
+    SOCIAL_MEDIA_TIKTOK: re.compile(r"/upload/v1/|[?&]uploadid=|[?&]part_number="),
+}
+
+# 没有匹配到 URL 特征时，请求体超过这个大小的 POST / PUT 也视为视频分片
+MIN_CHUNK_BYTES = 256 * 1024
+
+_listeners: list = []
+_listeners_lock = threading.Lock()
+
+
+def subscribe(listener: Callable[[dict], None]):
+    with _listeners_lock:
+        _listeners.append(listener)
+
+
+def unsubscribe(listener: Callable[[dict], None]):
+    with _listeners_lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def publish(event: dict):
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception as e:
+            browser_logger.warning(f"[-] 上传进度回调出错: {e}")
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+class UploadProgress(object):
+    def __init__(self, page: Page, platform: str, account_file, file_path):
+        self.page = page
+        self.upload_id = uuid.uuid4().hex
+        self.platform = platform
+        self.account = Path(str(account_file)).name
+        self.file = Path(str(file_path)).name
+        try:
+            self.total_bytes = Path(str(file_path)).stat().st_size
+        except OSError:
+            self.total_bytes = 0
+        self.pattern = UPLOAD_URL_PATTERNS.get(platform)
+        self.bytes_sent = 0
+        self.chunks = 0
+        self.failed_chunks = 0
+        self.last_latency_ms = 0.0
+        self.started_at = None
+        self._pending = {}  # request -> (发出时间, 字节数)
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_request_finished)
+        page.on("requestfailed", self._on_request_failed)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at if self.started_at else 0.0
+
+    @property
+    def throughput_bps(self) -> float:
+        return self.bytes_sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def percent(self) -> float:
+        if not self.total_bytes:
+            return 0.0
+        return round(min(self.bytes_sent / self.total_bytes * 100, 100.0), 1)
+
+    def describe(self) -> str:
+        """日志里使用的简短进度描述"""
+        if not self.chunks:
+            return ""
+        return (f"{self.percent}% {format_bytes(self.bytes_sent)}/{format_bytes(self.total_bytes)} "
+                f"{format_bytes(self.throughput_bps)}/s")
+
+    def finish(self):
+        """上传流程结束时调用：解除监听并发布汇总事件"""
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_request_finished)
+        self.page.remove_listener("requestfailed", self._on_request_failed)
+        publish(self._event("upload_finished", failed_chunks=self.failed_chunks))
+
+    def _event(self, name: str, **extra) -> dict:
+        event = {
+            "event": name,
+            "upload_id": self.upload_id,
+            "platform": self.platform,
+            "account": self.account,
+            "file": self.file,
+            "bytes_sent": self.bytes_sent,
+            "total_bytes": self.total_bytes,
+            "percent": self.percent,
+            "chunks": self.chunks,
+            "chunk_latency_ms": round(self.last_latency_ms, 1),
+            "throughput_bps": round(self.throughput_bps, 1),
+            "elapsed": round(self.elapsed, 2),
+        }
+        event.update(extra)
+        return event
+
+    @staticmethod
+    def _body_size(request: Request) -> int:
+        length = request.headers.get("content-length")
+        if length and length.isdigit():
+            return int(length)
+        return len(request.post_data_buffer or b"")
+
+    def _on_request(self, request: Request):
+        if request.method not in ("POST", "PUT"):
+            return
+        matched = self.pattern is not None and self.pattern.search(request.url)
+        size = self._body_size(request)
+        if not size or (not matched and size < MIN_CHUNK_BYTES):
+            return
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now
+        self._pending[request] = (now, size)
+
+    def _on_request_finished(self, request: Request):
+        pending = self._pending.pop(request, None)
+        if pending is None:
+            return
+        sent_at, size = pending
+        self.bytes_sent += size
+        self.chunks += 1
+        self.last_latency_ms = (time.monotonic() - sent_at) * 1000
+        publish(self._event("upload_progress"))
+
+    def _on_request_failed(self, request: Request):
+        if self._pending.pop(request, None) is None:
+            return
+        self.failed_chunks += 1
+        publish(self._event("upload_chunk_failed", error=request.failure))
+
+
+class UploadMetrics(object):
+    """按 (平台, 账号) 汇总上传进度事件"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._uploads = {}  # upload_id -> 最近一次事件
+        self._failed_chunks = {}  # (平台, 账号) -> 失败分片数
+        self._latency = {}  # (平台, 账号) -> [分片数, 总耗时 ms]
+
+    def __call__(self, event: dict):
+        key = (event["platform"], event["account"])
+        with self._lock:
+            if event["event"] == "upload_chunk_failed":
+                self._failed_chunks[key] = self._failed_chunks.get(key, 0) + 1
+                return
+            if event["event"] == "upload_progress":
+                stats = self._latency.setdefault(key, [0, 0.0])
+                stats[0] += 1
+                stats[1] += event["chunk_latency_ms"]
+            self._uploads[event["upload_id"]] = event
+
+    def snapshot(self) -> list:
+        with self._lock:
+            grouped = {}
+            for event in self._uploads.values():
+                key = (event["platform"], event["account"])
+                item = grouped.setdefault(key, {"uploads": 0, "bytes_sent": 0, "elapsed": 0.0})
+                item["uploads"] += 1
+                item["bytes_sent"] += event["bytes_sent"]
+                item["elapsed"] += event["elapsed"]
+            result = []
+            for (platform, account), item in grouped.items():
+                chunks, latency = self._latency.get((platform, account), (0, 0.0))
+                result.append({
+                    "platform": platform,
+                    "account": account,
+                    "uploads": item["uploads"],
+                    "bytes_sent": item["bytes_sent"],
+                    "chunks": chunks,
+                    "failed_chunks": self._failed_chunks.get((platform, account), 0),
+                    "avg_chunk_latency_ms": round(latency / chunks, 1) if chunks else 0.0,
+                    "throughput_bps": round(item["bytes_sent"] / item["elapsed"], 1) if item["elapsed"] else 0.0,
+                })
+            return result
+
+
+upload_metrics = UploadMetrics()
+subscribe(upload_metrics)
@@ -0,0 +1,118 @@
+"""
+基于条件的等待
+
+用轮询具体的页面条件代替固定的 asyncio.sleep / wait_for_timeout：条件满足立即返回，
+轮询间隔从 interval 开始按 backoff 倍数递增到 max_interval，总时长不超过 timeout。
+超时不抛异常而是返回 False，调用方可以和原来固定等待之后一样继续往下执行。
+
+传入 replaces（被替换的固定等待秒数）时，实际耗时会记到当前上传的 WaitStats 里，
+上传结束时 log_wait_stats() 输出"条件等待用时 / 原固定等待 / 节省"的对比，传入 tracer 时同时写进
+上传追踪文件，benchmarks/adaptive_waits.py 从追踪文件汇总真实上传中的节省。
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+from playwright.async_api import Locator
+
+
+class WaitStats(object):
+    def __init__(self):
+        self.waited = 0.0  # 条件等待实际耗时
+        self.replaced = 0.0  # 被替换掉的固定等待时长
+        self.count = 0
+        self.timeouts = 0  # 条件一直没满足、等到超时的次数
+
+    def record(self, elapsed: float, replaces: float, met: bool = True):
+        self.waited += elapsed
+        self.replaced += replaces
+        self.count += 1
+        if not met:
+            self.timeouts += 1
+
+    @property
+    def saved(self) -> float:
+        return self.replaced - self.waited
+
+
+_wait_stats: ContextVar[Optional[WaitStats]] = ContextVar("wait_stats", default=None)
+
+
+def start_wait_stats() -> WaitStats:
+    """开始统计当前任务（一次上传）中的条件等待"""
+    stats = WaitStats()
+    _wait_stats.set(stats)
+    return stats
+
+
+def log_wait_stats(logger, tracer=None):
+    """输出本次上传的条件等待统计；tracer 为上传器的 UploadTracer 时同时记入上传追踪"""
+    stats = _wait_stats.get()
+    if stats is None or not stats.count:
+        return
+    logger.info(f"  [-] 条件等待 {stats.count} 次（超时 {stats.timeouts} 次），用时 {stats.waited:.1f}s，"
+                f"原固定等待 {stats.replaced:.1f}s，节省 {stats.saved:.1f}s")
+    if tracer is not None:
+        tracer.annotate(waits={"count": stats.count, "timeouts": stats.timeouts,
+                               "waited_ms": round(stats.waited * 1000, 1),
+                               "replaced_ms": round(stats.replaced * 1000, 1)})
+
+
+async def wait_until(condition: Callable[[], Awaitable[bool]], timeout: float = 5, interval: float = 0.05,
+                     max_interval: float = 0.5, backoff: float = 1.5, replaces: float = 0) -> bool:
+    """
+    轮询 condition 直到返回真值
+
+    Args:
+        condition: 无参的异步函数，返回真值表示条件满足；抛出的异常视为条件不满足
+        timeout: 最长等待秒数
+        interval / max_interval / backoff: 首次轮询间隔、间隔上限和递增倍数
+        replaces: 被替换的固定等待秒数，仅用于统计
+
+    Returns:
+        条件是否在超时前满足
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    met = False
+    while True:
+        try:
+            met = bool(await condition())
+        except Exception:
+            met = False
+        now = time.monotonic()
+        if met or now >= deadline:
+            break
+        await asyncio.sleep(min(interval, deadline - now))
+        interval = min(interval * backoff, max_interval)
+    stats = _wait_stats.get()
+    if stats is not None and replaces:
+        stats.record(time.monotonic() - start, replaces, met)
+    return met
+
+
+async def wait_visible(locator: Locator, timeout: float = 5, **kwargs) -> bool:
+    """等待元素可见"""
+    return await wait_until(lambda: locator.first.is_visible(), timeout=timeout, **kwargs)
+
+
+async def wait_hidden(locator: Locator, timeout: float = 5, **kwargs) -> bool:
+    """等待元素消失或不可见"""
+    async def hidden():
+        return not await locator.count() or not await locator.first.is_visible()
+    return await wait_until(hidden, timeout=timeout, **kwargs)
+
+
+async def wait_count_stable(locator: Locator, timeout: float = 5, settle: float = 0.3, **kwargs) -> bool:
+    """等待元素数量大于 0 且在 settle 秒内不再变化（用于虚拟列表、下拉选项渲染完成）"""
+    last = {"count": -1, "since": time.monotonic()}
+
+    async def stable():
+        count = await locator.count()
+        now = time.monotonic()
+        if count != last["count"]:
+            last["count"], last["since"] = count, now
+            return False
+        return count > 0 and now - last["since"] >= settle
+    return await wait_until(stable, timeout=timeout, **kwargs)